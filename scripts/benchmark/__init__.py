@@ -6,8 +6,23 @@ A modular benchmarking framework for testing LLM-based character analysis workfl
 Submodules:
 - models: Model loaders for LiteRT-LM, llama-server, and GGUF models
 - workflows: 2-pass, 3-pass, and 5-pass workflow implementations
-- prompts: Prompt builders for character extraction, dialog analysis, voice profiling
+- prompts: Prompt builders (full and compact templates) for every pass
 - utils: PDF extraction, text splitting, JSON validation utilities
+- page_store: Persistent memory-mapped cache of extracted PDF text
+- normalize: Header/footer, page-number, hyphenation and reflow cleanup of page text
+- jsonparse: Single-pass JSON extraction engine (streaming and one-shot) for LLM output
+- decode: Fast JSON decode backends (msgspec/orjson/json) and typed pass-schema records
+- json_bench: Corpus benchmark and parity check for the JSON parsers
+- results: Columnar dialog table (interned speakers, text spans) behind WorkflowResult
+- writer: Streaming result writer (chunked JSON or JSON Lines, characters as they finish)
+- merge: Hierarchical map-reduce merging of chapter-level partial results
+- batch: Multi-book batch runner sharing one warm model pool
+- planner: Dry-run planner predicting calls, tokens and wall time from throughput profiles
+- dialog_match: Indexed extracted-vs-expected dialog matching with speaker accuracy
+- history: SQLite benchmark history (indexed by model, prompt version, mode, time) and query CLI
+- gate: Performance regression gate (per-pass latency, tok/s, calls, memory) against the history
+- stats: Repeated-run latency distributions (p50/p90/p99, bootstrap CIs) and configuration comparison
+- prompt_diet: Prompt template overhead per pass and model type; compact-prompt F1 A/B check
 
 Usage:
     from benchmark import run_benchmark
@@ -0,0 +1,238 @@
+"""
+Multi-book batch runner sharing one warm model (or model pool).
+
+Every book runs its workflow in its own thread, but all model calls go through
+a FairScheduler: a round-robin queue over books, drained by one worker per
+model in the pool. A long book therefore cannot starve short ones, and model
+load cost (LiteRT cache copy, GGUF load) is paid once per batch.
+
+Usage:
+    python -m benchmark.run_benchmark --batch books/ --output-dir results/ --workflow 3pass
+    python -m benchmark.run_benchmark --batch manifest.json --model gguf --model-path m.gguf
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from .models import BaseModel
+from .utils import count_pdf_pages
+from .workflows import BaseWorkflow, WorkflowResult
+from .writer import ResultWriter
+
+
+class FairScheduler:
+    """Round-robin request queue over books, executed by a pool of models."""
+
+    def __init__(self, models: list[BaseModel]):
+        """Start one worker thread per model.
+
+        Args:
+            models: Loaded model instances; each serves one request at a time
+        """
+        self._queues: dict[str, deque] = {}
+        self._ready: deque[str] = deque()  # books with pending requests, in turn order
+        self._cond = threading.Condition()
+        self._closed = False
+        self.calls: dict[str, int] = {}
+        self._workers = [
+            threading.Thread(target=self._serve, args=(model,), daemon=True)
+            for model in models
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, book_id: str, prompt: str, max_tokens: int, temperature: float) -> Future:
+        """Queue a generation request for a book and return its future."""
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("FairScheduler is closed")
+            queue = self._queues.setdefault(book_id, deque())
+            if not queue:
+                self._ready.append(book_id)
+            queue.append((future, prompt, max_tokens, temperature))
+            self.calls[book_id] = self.calls.get(book_id, 0) + 1
+            self._cond.notify()
+        return future
+
+    def _next_request(self) -> Optional[tuple]:
+        """Pop the next request, taking one from each waiting book in turn."""
+        with self._cond:
+            while not self._ready and not self._closed:
+                self._cond.wait()
+            if not self._ready:
+                return None
+            book_id = self._ready.popleft()
+            queue = self._queues[book_id]
+            request = queue.popleft()
+            if queue:
+                self._ready.append(book_id)
+            return request
+
+    def _serve(self, model: BaseModel) -> None:
+        """Worker loop: run queued requests on one model until closed."""
+        while True:
+            request = self._next_request()
+            if request is None:
+                return
+            future, prompt, max_tokens, temperature = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                response = model.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+                future.set_result((response, model.pop_usage()))
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self) -> None:
+        """Stop workers once the queue is drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+
+class ScheduledModel(BaseModel):
+    """Per-book model handle that routes generate() through a FairScheduler."""
+
+    def __init__(self, scheduler: FairScheduler, book_id: str):
+        self.scheduler = scheduler
+        self.book_id = book_id
+
+    def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
+        """Queue the request behind other books' requests and wait for it."""
+        future = self.scheduler.submit(self.book_id, prompt, max_tokens, temperature)
+        response, usage = future.result()
+        if usage:
+            # Usage was recorded on the worker thread; hand it to the caller's thread
+            self._record_usage(usage["prompt_tokens"], usage["completion_tokens"])
+        return response
+
+    def close(self) -> None:
+        """The shared models are owned by the batch, nothing to release."""
+        pass
+
+
+def load_books(source: str) -> list[dict]:
+    """Resolve a batch source into book entries.
+
+    Args:
+        source: Directory of PDFs, a JSON manifest (list of paths or of
+            {"pdf": ..., **run_kwargs} objects), or a text file with one path
+            per line. Relative paths are resolved against the manifest.
+
+    Returns:
+        List of dicts with a 'pdf' key plus optional per-book run kwargs
+    """
+    path = Path(source)
+    if path.is_dir():
+        return [{"pdf": str(p)} for p in sorted(path.glob("*.pdf"))]
+    if not path.is_file():
+        raise FileNotFoundError(f"Batch source not found: {source}")
+
+    if path.suffix.lower() == ".json":
+        entries = json.loads(path.read_text(encoding="utf-8"))
+        books = [e if isinstance(e, dict) else {"pdf": e} for e in entries]
+    else:
+        lines = path.read_text(encoding="utf-8").splitlines()
+        books = [{"pdf": l.strip()} for l in lines if l.strip() and not l.strip().startswith("#")]
+
+    for book in books:
+        pdf = Path(book["pdf"])
+        if not pdf.is_absolute():
+            book["pdf"] = str(path.parent / pdf)
+    return books
+
+
+def run_batch(
+    books: list[dict],
+    models: list[BaseModel],
+    workflow_factory: Callable[[BaseModel], BaseWorkflow],
+    output_dir: str,
+    run_kwargs: Optional[dict] = None,
+    max_active_books: Optional[int] = None,
+    verbose: bool = False,
+    output_format: str = "json",
+) -> dict:
+    """Run a workflow over many books with one shared model pool.
+
+    Args:
+        books: Entries from load_books()
+        models: Warm model pool shared by every book
+        workflow_factory: Builds a workflow around a (scheduled) model
+        output_dir: Directory for one result file per book plus batch_report.json
+        run_kwargs: Keyword arguments passed to every workflow.run()
+        max_active_books: Books analyzed concurrently (default: all)
+        verbose: Print per-book progress
+        output_format: Per-book result format, "json" or "jsonl" (see writer.py)
+
+    Returns:
+        Aggregate report dict (also written to batch_report.json)
+    """
+    out_dir = Path(output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    run_kwargs = run_kwargs or {}
+    scheduler = FairScheduler(models)
+
+    def run_book(index: int, book: dict) -> dict:
+        pdf = book["pdf"]
+        book_id = f"{index:03d}_{Path(pdf).stem}"
+        kwargs = {**run_kwargs, **{k: v for k, v in book.items() if k != "pdf"}}
+        output_path = out_dir / f"{book_id}.{output_format}"
+        t0 = time.perf_counter()
+        with ResultWriter.to_file(str(output_path), output_format) as writer:
+            try:
+                workflow = workflow_factory(ScheduledModel(scheduler, book_id))
+                workflow.on_character = writer.add_character
+                result: WorkflowResult = workflow.run(pdf, **kwargs)
+            except Exception as e:
+                print(f"[batch] {pdf} failed: {e}")
+                return {"pdf": pdf, "error": str(e), "seconds": time.perf_counter() - t0}
+
+            result.timing["total"] = time.perf_counter() - t0
+            result.metadata["pdf"] = pdf
+            writer.finish(result)
+        pages = result.metadata.get("num_pages") or count_pdf_pages(pdf)
+        if verbose:
+            print(f"[batch] {pdf}: {pages} pages in {result.timing['total']:.1f}s -> {output_path}")
+        return {
+            "pdf": pdf,
+            "output": str(output_path),
+            "pages": pages,
+            "characters": len(result.characters),
+            "dialogs": len(result.dialogs),
+            "calls": scheduler.calls.get(book_id, 0),
+            "seconds": result.timing["total"],
+        }
+
+    t_start = time.perf_counter()
+    workers = max(1, min(max_active_books or len(books), len(books)))
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            book_reports = list(pool.map(run_book, range(len(books)), books))
+    finally:
+        scheduler.close()
+    wall = time.perf_counter() - t_start
+
+    done = [b for b in book_reports if "error" not in b]
+    total_pages = sum(b["pages"] for b in done)
+    report = {
+        "books": len(books),
+        "completed": len(done),
+        "failed": len(books) - len(done),
+        "model_pool_size": len(models),
+        "wall_seconds": wall,
+        "total_pages": total_pages,
+        "total_calls": sum(b["calls"] for b in done),
+        "books_per_hour": len(done) / wall * 3600 if wall > 0 else 0.0,
+        "pages_per_min": total_pages / wall * 60 if wall > 0 else 0.0,
+        "per_book": book_reports,
+    }
+    (out_dir / "batch_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return report
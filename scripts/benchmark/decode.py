@@ -0,0 +1,262 @@
+"""
+Fast, schema-aware decoding of LLM JSON values.
+
+loads() decodes with the fastest installed backend (msgspec, then orjson) and
+falls back to the stdlib json module. A value the fast backend rejects (NaN,
+integers beyond 64 bits, lone surrogate escapes) is retried with json, so
+results never depend on which backend is installed.
+
+decode_character_entry() turns one decoded batched-analysis entry into a
+slotted CharacterEntry record. Key aliases (D/d/dialogs, T/t/traits,
+V/v/voice, ...) are resolved with a single dict lookup per key while the
+record is built, instead of a separate normalization pass.
+
+The other pass schemas decode the same way, with PassRecord.decode():
+CharacterNames (pass 1), DialogList (dialog extraction), CharacterTraits
+(traits), CharacterPersonality (personality) and VoiceSuggestion (traits and
+voice profile). A field of the wrong type keeps its empty default, so callers
+never type-check what the model returned.
+
+Usage:
+    from benchmark.decode import loads, decode_character_entry, DialogList
+    entry = decode_character_entry(loads('{"D": ["Hi"], "T": ["brave"], "V": "male"}'))
+    entry.dialogs  # ['Hi']
+    DialogList.decode(loads('{"Dialogues": [{"speaker": "Jax", "text": "Hi"}]}')).dialogs
+"""
+
+import json
+from typing import Any, Optional
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# -----------------------------------------------------------------------------
+# Backends
+# -----------------------------------------------------------------------------
+
+def available_backends() -> list[str]:
+    """Installed decode backends, fastest first ("json" is always last)."""
+    backends = []
+    if msgspec is not None:
+        backends.append("msgspec")
+    if orjson is not None:
+        backends.append("orjson")
+    backends.append("json")
+    return backends
+
+
+def _backend_loads(name: str):
+    """(decode function, error types) of a backend; None for plain json."""
+    if name == "msgspec":
+        return msgspec.json.Decoder().decode, (msgspec.DecodeError,)
+    if name == "orjson":
+        return orjson.loads, (orjson.JSONDecodeError,)
+    return None, ()
+
+
+BACKEND = available_backends()[0]
+_fast_loads, _fast_errors = _backend_loads(BACKEND)
+
+
+def set_backend(name: Optional[str] = None) -> str:
+    """Select the decode backend (None picks the fastest installed one).
+
+    Returns:
+        The name of the previously selected backend
+    """
+    global BACKEND, _fast_loads, _fast_errors
+    backends = available_backends()
+    name = name or backends[0]
+    if name not in backends:
+        raise ValueError(f"JSON backend {name!r} is not installed (available: {', '.join(backends)})")
+    previous = BACKEND
+    BACKEND = name
+    _fast_loads, _fast_errors = _backend_loads(name)
+    return previous
+
+
+def loads(raw) -> Any:
+    """Decode one JSON document (str or bytes).
+
+    Raises:
+        json.JSONDecodeError: The text is not valid JSON for the stdlib either
+    """
+    if _fast_loads is not None:
+        try:
+            return _fast_loads(raw)
+        except _fast_errors:
+            pass
+    return json.loads(raw)
+
+
+# -----------------------------------------------------------------------------
+# Pass schemas
+# -----------------------------------------------------------------------------
+
+class CharacterEntry:
+    """One character of a batched analysis response ({"D": [...], "T": [...], "V": "..."})."""
+
+    __slots__ = ("dialogs", "traits", "voice")
+
+    def __init__(self, dialogs: Optional[list] = None, traits: Optional[list] = None, voice: str = ""):
+        self.dialogs = dialogs if dialogs is not None else []
+        self.traits = traits if traits is not None else []
+        self.voice = voice
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CharacterEntry):
+            return NotImplemented
+        return (self.dialogs, self.traits, self.voice) == (other.dialogs, other.traits, other.voice)
+
+    def __repr__(self) -> str:
+        return f"CharacterEntry(dialogs={self.dialogs!r}, traits={self.traits!r}, voice={self.voice!r})"
+
+    def to_dict(self) -> dict:
+        return {"dialogs": self.dialogs, "traits": self.traits, "voice": self.voice}
+
+
+def _alias_table(fields: tuple) -> dict[str, tuple[str, type]]:
+    """Alias -> (field, expected type) for (field, type, aliases) specs.
+
+    Exact-case hits cover what models emit; anything else is looked up
+    again lowercased.
+    """
+    table: dict[str, tuple[str, type]] = {}
+    for field_name, field_type, aliases in fields:
+        for alias in aliases:
+            for variant in (alias, alias.upper(), alias.capitalize()):
+                table[variant] = (field_name, field_type)
+    return table
+
+
+def _fill(record, table: dict[str, tuple[str, type]], value: dict):
+    """Set the fields of record from the aliased keys of value, checking types."""
+    for key, field_value in value.items():
+        spec = table.get(key)
+        if spec is None:
+            spec = table.get(key.lower())
+            if spec is None:
+                continue
+        if isinstance(field_value, spec[1]):
+            setattr(record, spec[0], field_value)
+    return record
+
+
+_CHARACTER_FIELDS = _alias_table((
+    ("dialogs", list, ("d", "dialogs", "dialogue", "dialogues")),
+    ("traits", list, ("t", "traits", "trait")),
+    ("voice", str, ("v", "voice", "voice_profile")),
+))
+
+
+def decode_character_entry(value: Any) -> Optional[CharacterEntry]:
+    """Build a CharacterEntry from a decoded entry (None if it is not an object).
+
+    Unknown keys and values of the wrong type are ignored; for repeated
+    aliases of one field the last valid value wins.
+    """
+    if not isinstance(value, dict):
+        return None
+    # _fill() inlined: this runs once per entry of every batched response
+    entry = CharacterEntry()
+    for key, field_value in value.items():
+        spec = _CHARACTER_FIELDS.get(key)
+        if spec is None:
+            spec = _CHARACTER_FIELDS.get(key.lower())
+            if spec is None:
+                continue
+        if isinstance(field_value, spec[1]):
+            setattr(entry, spec[0], field_value)
+    return entry
+
+
+class PassRecord:
+    """Slotted record of one per-pass response object.
+
+    Subclasses list their fields in FIELDS as (name, type, aliases); a field
+    is empty (type()) until a key with one of its aliases holds a value of
+    that type.
+    """
+
+    __slots__ = ()
+    FIELDS: tuple = ()
+    _TABLE: dict[str, tuple[str, type]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._TABLE = _alias_table(cls.FIELDS)
+
+    def __init__(self, **values):
+        for name, field_type, _ in self.FIELDS:
+            setattr(self, name, values.get(name, field_type()))
+
+    @classmethod
+    def decode(cls, value: Any) -> "PassRecord":
+        """Build a record from a decoded response (all fields empty if it is not an object)."""
+        record = cls()
+        return _fill(record, cls._TABLE, value) if isinstance(value, dict) else record
+
+    def __eq__(self, other) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, _, _ in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name, _, _ in self.FIELDS}
+
+
+class CharacterNames(PassRecord):
+    """Pass 1: {"characters": ["Name", ...]}."""
+
+    __slots__ = ("characters",)
+    FIELDS = (("characters", list, ("characters", "character_names", "names")),)
+
+
+class DialogList(PassRecord):
+    """Dialog extraction: {"dialogs": [{"speaker", "text", "emotion", "intensity"}, ...]}."""
+
+    __slots__ = ("dialogs",)
+    FIELDS = (("dialogs", list, ("dialogs", "dialog", "dialogue", "dialogues")),)
+
+
+class CharacterTraits(PassRecord):
+    """Trait extraction: {"character": "Name", "traits": [...]}."""
+
+    __slots__ = ("character", "traits")
+    FIELDS = (
+        ("character", str, ("character", "name")),
+        ("traits", list, ("traits", "trait")),
+    )
+
+
+class CharacterPersonality(PassRecord):
+    """Personality inference: {"character": "Name", "personality": [...]}."""
+
+    __slots__ = ("character", "personality")
+    FIELDS = (
+        ("character", str, ("character", "name")),
+        ("personality", list, ("personality", "personality_traits")),
+    )
+
+
+class VoiceSuggestion(PassRecord):
+    """Voice profile, optionally with traits: {"character", "traits", "voice_profile": {...}}."""
+
+    __slots__ = ("character", "traits", "voice_profile")
+    FIELDS = (
+        ("character", str, ("character", "name")),
+        ("traits", list, ("traits", "trait")),
+        ("voice_profile", dict, ("voice_profile", "voiceprofile", "voice")),
+    )
@@ -0,0 +1,183 @@
+"""
+Indexed matching of extracted dialogs against expected dialogs.
+
+Scoring a full book compares thousands of extracted dialogs with thousands
+of expected ones. Instead of testing every pair, every text is normalized
+once and expected dialogs are indexed two ways:
+
+- by their first words, for the "same opening words" rule (truncated quotes)
+- by character n-grams, for the substring rule: a text contained in another
+  shares all of its n-grams with it, so its rarest n-gram finds every text
+  that can contain it, and the first n-gram of each expected text finds
+  those an extracted text can contain
+
+Only the candidates from the indexes are verified and scored, and pairs are assigned
+greedily by score (exact > containment > same opening words, closer lengths
+first, same speaker on ties), each dialog used once.
+
+The match rule is the one prompt_tester's Evaluator has always used: equal,
+one contained in the other, or the same first 5 words (at least 3).
+"""
+
+import re
+from dataclasses import dataclass, field
+
+# Opening words compared by the truncation rule, and the minimum for it to apply
+PREFIX_WORDS = 5
+MIN_PREFIX_WORDS = 3
+
+# Characters per n-gram of the substring index
+GRAM = 8
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_dialog(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return _SPACE_RE.sub(" ", _PUNCT_RE.sub("", text.lower().strip()))
+
+
+def normalize_speaker(name: str) -> str:
+    return (name or "").lower().strip()
+
+
+def _ratio(a: str, b: str) -> float:
+    longest = max(len(a), len(b))
+    return min(len(a), len(b)) / longest if longest else 1.0
+
+
+def match_score(a: str, b: str) -> float:
+    """How well two normalized dialogs match; 0.0 if they don't.
+
+    Exact matches score 3, containment 1-2 and same opening words 0.5-1,
+    higher within a kind the closer the two lengths are.
+    """
+    if a == b:
+        return 3.0
+    if a in b or b in a:
+        return 1.0 + _ratio(a, b)
+    words_a, words_b = a.split()[:PREFIX_WORDS], b.split()[:PREFIX_WORDS]
+    if words_a == words_b and len(words_a) >= MIN_PREFIX_WORDS:
+        return 0.5 + 0.5 * _ratio(a, b)
+    return 0.0
+
+
+@dataclass
+class DialogMatchResult:
+    """Assigned (extracted, expected) pairs and the counts metrics are computed from."""
+    pairs: list[tuple[int, int]] = field(default_factory=list)  # (extracted index, expected index)
+    extracted: int = 0
+    expected: int = 0
+    speaker_matches: int = 0  # matched pairs attributed to the same speaker
+
+    @property
+    def matches(self) -> int:
+        return len(self.pairs)
+
+    @property
+    def precision(self) -> float:
+        return self.matches / self.extracted if self.extracted else 0.0
+
+    @property
+    def recall(self) -> float:
+        return self.matches / self.expected if self.expected else 0.0
+
+    @property
+    def f1(self) -> float:
+        p, r = self.precision, self.recall
+        return 2 * p * r / (p + r) if p + r > 0 else 0.0
+
+    @property
+    def speaker_accuracy(self) -> float:
+        """Share of matched dialogs whose speaker is also right."""
+        return self.speaker_matches / self.matches if self.matches else 0.0
+
+
+class DialogMatcher:
+    """Expected dialogs, normalized and indexed once, matched against extraction results."""
+
+    def __init__(self, expected: list[tuple[str, str]], gram: int = GRAM):
+        """
+        Args:
+            expected: (speaker, text) of every expected dialog
+            gram: Characters per n-gram of the substring index
+        """
+        self.gram = gram
+        self.speakers = [normalize_speaker(s) for s, _ in expected]
+        self.texts = [normalize_dialog(t) for _, t in expected]
+
+        self._prefix: dict[tuple[str, ...], list[int]] = {}  # opening words -> texts
+        self._grams: dict[str, list[int]] = {}  # every n-gram -> texts containing it
+        self._heads: dict[str, list[int]] = {}  # first n-gram -> texts starting with it
+        self._short: list[int] = []  # shorter than one n-gram: compared directly
+        for j, text in enumerate(self.texts):
+            words = tuple(text.split()[:PREFIX_WORDS])
+            if len(words) >= MIN_PREFIX_WORDS:
+                self._prefix.setdefault(words, []).append(j)
+            if len(text) < gram:
+                self._short.append(j)
+                continue
+            self._heads.setdefault(text[:gram], []).append(j)
+            for g in {text[k:k + gram] for k in range(len(text) - gram + 1)}:
+                self._grams.setdefault(g, []).append(j)
+
+    def scores(self, text: str) -> dict[int, float]:
+        """match_score() of a normalized text against every expected dialog it matches."""
+        texts = self.texts
+        if len(text) < self.gram:
+            # Any text can contain a short one
+            return {j: score for j in range(len(texts)) if (score := match_score(text, texts[j])) > 0}
+
+        scores: dict[int, float] = {}
+        for j in self._short:
+            if texts[j] in text:
+                scores[j] = 3.0 if texts[j] == text else 1.0 + _ratio(text, texts[j])
+
+        grams = [text[k:k + self.gram] for k in range(len(text) - self.gram + 1)]
+        # Texts containing this one hold every one of its n-grams: the rarest bounds them
+        for j in min((self._grams.get(g, ()) for g in grams), key=len):
+            if j not in scores and len(texts[j]) >= len(text) and text in texts[j]:
+                scores[j] = 3.0 if texts[j] == text else 1.0 + _ratio(text, texts[j])
+        # Texts this one contains start with one of its n-grams
+        for g in set(grams):
+            for j in self._heads.get(g, ()):
+                if j not in scores and len(texts[j]) < len(text) and texts[j] in text:
+                    scores[j] = 1.0 + _ratio(text, texts[j])
+
+        words = tuple(text.split()[:PREFIX_WORDS])
+        if len(words) >= MIN_PREFIX_WORDS:
+            for j in self._prefix.get(words, ()):
+                if j not in scores:
+                    scores[j] = 0.5 + 0.5 * _ratio(text, texts[j])
+        return scores
+
+    def match(self, extracted: list[tuple[str, str]]) -> DialogMatchResult:
+        """Assign extracted (speaker, text) dialogs to expected ones, best pairs first."""
+        scored = []
+        for i, (speaker, text) in enumerate(extracted):
+            text = normalize_dialog(text)
+            speaker = normalize_speaker(speaker)
+            for j, score in self.scores(text).items():
+                scored.append((-score, speaker != self.speakers[j], i, j))
+        scored.sort()
+
+        result = DialogMatchResult(extracted=len(extracted), expected=len(self.texts))
+        used_extracted: set[int] = set()
+        used_expected: set[int] = set()
+        for _, other_speaker, i, j in scored:
+            if i in used_extracted or j in used_expected:
+                continue
+            used_extracted.add(i)
+            used_expected.add(j)
+            result.pairs.append((i, j))
+            result.speaker_matches += not other_speaker
+        result.pairs.sort()
+        return result
+
+
+def match_dialogs(
+    extracted: list[tuple[str, str]], expected: list[tuple[str, str]]
+) -> DialogMatchResult:
+    """Match extracted against expected (speaker, text) dialogs."""
+    return DialogMatcher(expected).match(extracted)
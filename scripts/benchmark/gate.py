@@ -0,0 +1,219 @@
+"""
+Performance regression gate against the benchmark history.
+
+A run's performance record ("perf" in its history record) holds its
+total and per-pass wall time, model call count, output tokens per second
+and peak memory of this process. The gate compares it with the median
+of the last N runs of the same model, PDF and mode whose settings
+(prompts, temperature, page limits, packing, normalization, workers...)
+have the same config_fingerprint(); runs with other settings, or recorded
+before fingerprints were, are not part of the baseline.
+
+A metric regresses only if it is worse than that median by more than the
+tolerance (relative) and by more than `sigmas` robust standard deviations
+of the baseline runs (1.4826 x the median absolute deviation). The second
+condition keeps run-to-run noise on a busy machine from failing the gate,
+and latencies must also be worse by at least MIN_LATENCY_DELTA_S.
+Every regression is reported with the pass it belongs to.
+
+Usage:
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --gate
+    python prompt_tester/prompt_tester.py --server http://127.0.0.1:8080 --gate
+"""
+
+import hashlib
+import json
+import statistics
+import sys
+from dataclasses import dataclass, field
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_GATE_RUNS = 5
+DEFAULT_GATE_TOLERANCE = 0.10
+DEFAULT_GATE_SIGMAS = 3.0
+# Fewer baseline runs than this and a metric is not gated
+MIN_BASELINE_RUNS = 3
+# Latency changes smaller than this are never regressions (millisecond passes
+# such as cached extraction would otherwise fail on scheduler noise)
+MIN_LATENCY_DELTA_S = 0.05
+
+# MAD -> standard deviation for normally distributed noise
+_MAD_SCALE = 1.4826
+
+# Metrics where larger is better; every other metric is a cost
+_HIGHER_IS_BETTER = {"tokens_per_sec"}
+
+_UNITS = {"calls": "", "tokens_per_sec": " tok/s", "peak_memory_mb": " MB"}
+
+
+def peak_memory_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB (None if it can't be read).
+
+    With llama-server the model lives in the server process, so this is the
+    client's own memory (PDF text, prompts, results).
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB elsewhere
+    try:
+        import psutil
+    except ImportError:
+        return None
+    peak = getattr(psutil.Process().memory_info(), "peak_wset", None)  # Windows
+    return peak / (1024 * 1024) if peak else None
+
+
+def config_fingerprint(config: dict) -> str:
+    """Short stable hash of the settings a run's performance depends on (the baseline key)."""
+    blob = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def run_perf(
+    total_s: float,
+    passes: dict[str, float],
+    calls: int,
+    output_tokens: int,
+    llm_seconds: float,
+) -> dict:
+    """Performance record of one run, stored as "perf" in its history record.
+
+    Args:
+        total_s: Wall time of the run
+        passes: Wall time of each pass (not summed call time: calls may overlap)
+        calls: Model calls made
+        output_tokens: Tokens generated over all calls
+        llm_seconds: Time spent in model calls
+    """
+    return {
+        "total_s": total_s,
+        "passes": dict(passes),
+        "calls": calls,
+        "tokens_per_sec": output_tokens / llm_seconds if llm_seconds > 0 else None,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def flatten_perf(perf: dict) -> dict[str, float]:
+    """Gated metrics of a perf record: pass latencies become "pass:<name>"."""
+    metrics = {f"pass:{name}": seconds for name, seconds in (perf.get("passes") or {}).items()}
+    for key in ("total_s", "calls", "tokens_per_sec", "peak_memory_mb"):
+        if perf.get(key) is not None:
+            metrics[key] = perf[key]
+    return metrics
+
+
+@dataclass
+class MetricCheck:
+    """One metric of the run against its baseline."""
+    metric: str
+    current: float
+    median: float
+    sigma: float  # robust standard deviation of the baseline runs
+    runs: int
+    regressed: bool
+
+    @property
+    def change_pct(self) -> float:
+        return 100 * (self.current - self.median) / self.median if self.median else 0.0
+
+    def describe(self, tolerance: float) -> str:
+        name = self.metric
+        label = f"{name[5:]} latency" if name.startswith("pass:") else name
+        unit = _UNITS.get(name, " s")
+        return (
+            f"{label}: {self.current:.4g}{unit} vs median {self.median:.4g}{unit} of {self.runs} runs"
+            f" ({self.change_pct:+.1f}%; tolerance {tolerance:.0%}, noise +/-{self.sigma:.2g}{unit})"
+        )
+
+
+@dataclass
+class GateReport:
+    """Result of gating one run."""
+    baseline_runs: int
+    tolerance: float
+    sigmas: float
+    checks: list[MetricCheck] = field(default_factory=list)
+
+    @property
+    def regressions(self) -> list[MetricCheck]:
+        return [c for c in self.checks if c.regressed]
+
+    @property
+    def passed(self) -> bool:
+        return not self.regressions
+
+    def to_dict(self) -> dict:
+        return {
+            "passed": self.passed,
+            "baseline_runs": self.baseline_runs,
+            "tolerance": self.tolerance,
+            "sigmas": self.sigmas,
+            "checks": [
+                {
+                    "metric": c.metric, "current": c.current, "median": c.median, "sigma": c.sigma,
+                    "runs": c.runs, "change_pct": round(c.change_pct, 2), "regressed": c.regressed,
+                }
+                for c in self.checks
+            ],
+        }
+
+
+def check_regressions(
+    perf: dict,
+    baseline_records: list[dict],
+    tolerance: float = DEFAULT_GATE_TOLERANCE,
+    sigmas: float = DEFAULT_GATE_SIGMAS,
+    min_runs: int = MIN_BASELINE_RUNS,
+) -> GateReport:
+    """Gate a run's perf record against earlier runs.
+
+    Args:
+        perf: run_perf() record of this run
+        baseline_records: History records of the earlier runs (with "perf")
+        tolerance: Allowed relative slowdown (0.10 = 10% worse than the median)
+        sigmas: Robust standard deviations a change must also exceed
+        min_runs: Baseline runs a metric needs before it is gated
+
+    Returns:
+        Report with one check per gated metric
+    """
+    baselines = [flatten_perf(r["perf"]) for r in baseline_records if r.get("perf")]
+    report = GateReport(baseline_runs=len(baselines), tolerance=tolerance, sigmas=sigmas)
+    for metric, current in flatten_perf(perf).items():
+        values = [b[metric] for b in baselines if b.get(metric) is not None]
+        if len(values) < min_runs:
+            continue
+        median = statistics.median(values)
+        sigma = _MAD_SCALE * statistics.median(abs(v - median) for v in values)
+        worse = median - current if metric in _HIGHER_IS_BETTER else current - median
+        regressed = worse > tolerance * abs(median) and worse > sigmas * sigma
+        if metric.startswith("pass:") or metric == "total_s":
+            regressed = regressed and worse > MIN_LATENCY_DELTA_S
+        report.checks.append(MetricCheck(metric, current, median, sigma, len(values), regressed))
+    return report
+
+
+def format_gate(report: GateReport) -> str:
+    """Gate verdict with one line per regressed metric."""
+    if not report.checks:
+        return (
+            f"GATE SKIPPED: {report.baseline_runs} earlier runs of this model, PDF, mode and settings"
+            f" (need {MIN_BASELINE_RUNS})"
+        )
+    lines = [f"REGRESSION {c.describe(report.tolerance)}" for c in report.regressions]
+    if report.passed:
+        lines.append(
+            f"GATE PASS: no significant regression in {len(report.checks)} metrics"
+            f" vs the median of {report.baseline_runs} runs"
+        )
+    else:
+        passes = sorted({c.metric[5:] for c in report.regressions if c.metric.startswith("pass:")})
+        where = f" (regressed passes: {', '.join(passes)})" if passes else ""
+        lines.append(f"GATE FAIL: {len(report.regressions)} of {len(report.checks)} metrics regressed{where}")
+    return "\n".join(lines)
@@ -0,0 +1,354 @@
+"""
+Benchmark history store: one SQLite row per run, indexed for trend queries.
+
+prompt_tester used to keep its history in benchmark_history.json and
+rewrote the whole file on every run, which costs O(history) I/O per run
+and loses records when two runs save at once. Here each run is a single
+INSERT into a WAL-mode database. Concurrent writers, whether threads or
+processes, queue on SQLite's lock instead of overwriting each other, and
+readers never block them.
+
+The headline numbers (F1, speaker accuracy, latency, tokens) are columns,
+and model, prompt version, mode and timestamp are indexed, plus
+model + PDF + mode + settings fingerprint for the regression gate's
+baseline lookup (benchmark.gate). The full result dict is kept as JSON next to them.
+
+Usage:
+    python -m benchmark.history list --model Qwen2.5-1.5B --limit 20
+    python -m benchmark.history trend --prompt-version v5.0 --metric dialog_f1
+    python -m benchmark.history best --metric char_f1
+    python -m benchmark.history migrate benchmark_history.json
+"""
+
+import argparse
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_HISTORY_DB = "benchmark_history.db"
+
+# Seconds a writer waits for another process's transaction before failing
+BUSY_TIMEOUT_S = 30.0
+
+# Summary columns, filled from a BenchmarkResult.to_dict() record
+METRICS = ("char_f1", "dialog_f1", "speaker_accuracy", "total_ms", "prompt_tokens", "completion_tokens")
+COLUMNS = ("id", "timestamp", "model_name", "prompt_version", "mode", "pdf", "config_hash", "temperature") + METRICS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    pdf TEXT,
+    config_hash TEXT,
+    temperature REAL,
+    char_f1 REAL,
+    dialog_f1 REAL,
+    speaker_accuracy REAL,
+    total_ms REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    source TEXT PRIMARY KEY,
+    records INTEGER NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model_name, timestamp);
+CREATE INDEX IF NOT EXISTS runs_prompt_version ON runs (prompt_version, timestamp);
+CREATE INDEX IF NOT EXISTS runs_mode ON runs (mode, timestamp);
+CREATE INDEX IF NOT EXISTS runs_timestamp ON runs (timestamp);
+DROP INDEX IF EXISTS runs_baseline;
+CREATE INDEX IF NOT EXISTS runs_config_baseline ON runs (model_name, pdf, mode, config_hash, timestamp);
+"""
+
+
+def _summary(record: dict) -> tuple:
+    """Column values of a result record, in COLUMNS order (without id)."""
+    chars = record.get("character_metrics") or {}
+    dialogs = record.get("dialog_metrics") or {}
+    tokens = record.get("tokens") or {}
+    return (
+        record.get("timestamp", ""),
+        record.get("model_name", ""),
+        record.get("prompt_version", ""),
+        record.get("mode") or "batched",  # records from before modes were stored
+        record.get("pdf"),
+        record.get("config_hash"),
+        record.get("temperature"),
+        chars.get("f1"),
+        dialogs.get("f1"),
+        dialogs.get("speaker_accuracy"),
+        (record.get("timing_ms") or {}).get("total"),
+        tokens.get("prompt_tokens"),
+        tokens.get("completion_tokens"),
+    )
+
+
+class HistoryStore:
+    """Append-only store of benchmark results in a SQLite database."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_DB):
+        """
+        Args:
+            path: Database file, created with its schema if missing
+        """
+        self.path = Path(path)
+        # One connection shared by the threads of a run; the lock serializes them
+        self._conn = sqlite3.connect(str(self.path), timeout=BUSY_TIMEOUT_S, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            # Databases created before runs recorded their PDF / settings fingerprint
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+            for column in ("pdf", "config_hash"):
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE runs ADD COLUMN {column} TEXT")
+            self._conn.executescript(_INDEXES)
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def append(self, record: dict) -> int:
+        """Store one BenchmarkResult.to_dict() record; returns its row id."""
+        return self.extend([record])[-1]
+
+    def extend(self, records: list[dict]) -> list[int]:
+        """Store several records in one transaction; returns their row ids."""
+        with self._lock, self._conn:
+            return self._insert(records)
+
+    def _insert(self, records: list[dict]) -> list[int]:
+        """INSERT the records in the caller's transaction."""
+        placeholders = ", ".join("?" * len(COLUMNS))
+        ids = []
+        for record in records:
+            cursor = self._conn.execute(
+                f"INSERT INTO runs ({', '.join(COLUMNS[1:])}, record) VALUES ({placeholders})",
+                _summary(record) + (json.dumps(record),),
+            )
+            ids.append(cursor.lastrowid)
+        return ids
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def query(
+        self,
+        model: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        mode: Optional[str] = None,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        oldest_first: bool = False,
+        pdf: Optional[str] = None,
+        full: bool = False,
+        config_hash: Optional[str] = None,
+    ) -> list[dict]:
+        """Runs matching every given filter, newest first.
+
+        Args:
+            model: Exact model name
+            prompt_version: Exact prompt version
+            mode: Analysis mode ("batched", "two_pass") or benchmark workflow ("3pass", ...)
+            since: Earliest timestamp ("2026-01-31" or "2026-01-31 12:00:00")
+            limit: Most recent runs to return
+            oldest_first: Return the selected runs in chronological order
+            full: Return the full stored records instead of the summary columns
+            pdf: Exact PDF path as recorded
+            config_hash: Settings fingerprint (benchmark.gate.config_fingerprint)
+
+        Returns:
+            Summary dicts (COLUMNS), or the stored records with their "id"
+        """
+        where, params = [], []
+        filters = (
+            ("model_name", model), ("prompt_version", prompt_version), ("mode", mode), ("pdf", pdf),
+            ("config_hash", config_hash),
+        )
+        for column, value in filters:
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("timestamp >= ?")
+            params.append(since)
+        sql = f"SELECT {', '.join(COLUMNS)}{', record' if full else ''} FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY timestamp DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if oldest_first:
+            rows.reverse()
+        if full:
+            return [{**json.loads(row["record"]), "id": row["id"]} for row in rows]
+        return [dict(row) for row in rows]
+
+    def best_per_model(self, metric: str = "dialog_f1", mode: Optional[str] = None) -> list[dict]:
+        """Best run of every model by one metric (ties: the most recent), best model first."""
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric!r}; expected one of {', '.join(METRICS)}")
+        # Latency and tokens are better when lower
+        order = "ASC" if metric in ("total_ms", "prompt_tokens", "completion_tokens") else "DESC"
+        sql = f"""
+            SELECT {', '.join(COLUMNS)} FROM (
+                SELECT *, ROW_NUMBER() OVER (
+                    PARTITION BY model_name ORDER BY {metric} {order}, timestamp DESC, id DESC
+                ) AS rank
+                FROM runs WHERE {metric} IS NOT NULL{' AND mode = ?' if mode else ''}
+            ) WHERE rank = 1 ORDER BY {metric} {order}
+        """
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, (mode,) if mode else ())]
+
+    def import_json(self, path: str) -> int:
+        """Append the records of a legacy benchmark_history.json once.
+
+        The file is marked as imported in the same transaction as its
+        records: a run that crashes mid-import leaves neither, and a second
+        import of the same file (e.g. a concurrent first run) adds nothing.
+
+        Returns:
+            Records imported (0 if the file was imported before)
+        """
+        source = str(Path(path).resolve())
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        with self._lock:
+            try:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT INTO migrations (source, records) VALUES (?, ?)", (source, len(records))
+                    )
+                    self._insert(records)
+            except sqlite3.IntegrityError:
+                return 0
+        return len(records)
+
+
+def migrate_json_history(store: HistoryStore, path: str) -> int:
+    """Import a legacy JSON history once, then rename it to <name>.migrated.
+
+    Safe to run from several processes at once: HistoryStore.import_json
+    imports a file only once, and the rename that loses the race is a no-op.
+
+    Returns:
+        Records imported (0 if there was no legacy file)
+    """
+    legacy = Path(path)
+    try:
+        count = store.import_json(str(legacy))
+    except FileNotFoundError:
+        return 0
+    try:
+        legacy.replace(legacy.with_name(legacy.name + ".migrated"))
+    except FileNotFoundError:
+        pass  # renamed by a concurrent run
+    return count
+
+
+# -----------------------------------------------------------------------------
+# CLI
+# -----------------------------------------------------------------------------
+
+def _pct(value: Optional[float]) -> str:
+    return "" if value is None else f"{value:.1%}"
+
+
+def _format_runs(rows: list[dict]) -> str:
+    lines = [
+        f"{'id':>5} {'timestamp':<19} {'model':<28} {'prompts':<14} {'mode':<9} {'temp':>5}"
+        f" {'char F1':>8} {'dialog F1':>10} {'speaker':>8} {'total s':>8} {'tokens':>8}"
+    ]
+    for r in rows:
+        temp = "auto" if r["temperature"] is None else f"{r['temperature']:g}"
+        total = "" if r["total_ms"] is None else f"{r['total_ms'] / 1000:.1f}"
+        tokens = (r["prompt_tokens"] or 0) + (r["completion_tokens"] or 0)
+        lines.append(
+            f"{r['id']:>5} {r['timestamp']:<19} {r['model_name'][:28]:<28} {r['prompt_version'][:14]:<14}"
+            f" {r['mode']:<9} {temp:>5} {_pct(r['char_f1']):>8} {_pct(r['dialog_f1']):>10}"
+            f" {_pct(r['speaker_accuracy']):>8} {total:>8} {tokens or '':>8}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    """Query and migrate the benchmark history."""
+    parser = argparse.ArgumentParser(description="Query the benchmark history database")
+    parser.add_argument("--db", default=DEFAULT_HISTORY_DB, help=f"History database (default: {DEFAULT_HISTORY_DB})")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--json", action="store_true", help="Print rows as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("list", "Most recent runs"), ("trend", "Runs in chronological order")):
+        sub = commands.add_parser(name, help=help_text, parents=[output])
+        sub.add_argument("--model", help="Model name")
+        sub.add_argument("--prompt-version", help="Prompt version")
+        sub.add_argument("--mode", help="Analysis mode or benchmark workflow (batched, two_pass, 3pass, ...)")
+        sub.add_argument("--pdf", help="PDF path as recorded")
+        sub.add_argument("--since", help="Earliest timestamp (e.g. 2026-01-31)")
+        sub.add_argument("--limit", type=int, default=20 if name == "list" else None, help="Most recent runs")
+        if name == "trend":
+            sub.add_argument("--metric", choices=METRICS, default="dialog_f1", help="Metric to chart")
+
+    best = commands.add_parser("best", help="Best run per model", parents=[output])
+    best.add_argument("--metric", choices=METRICS, default="dialog_f1")
+    best.add_argument("--mode", help="Analysis mode or benchmark workflow")
+
+    migrate = commands.add_parser("migrate", help="Import a legacy benchmark_history.json")
+    migrate.add_argument("json_file", nargs="?", default="benchmark_history.json")
+    args = parser.parse_args()
+
+    with HistoryStore(args.db) as store:
+        if args.command == "migrate":
+            count = migrate_json_history(store, args.json_file)
+            print(f"Imported {count} runs into {args.db}" if count else f"Nothing to import: {args.json_file} not found")
+            return
+        if args.command == "best":
+            rows = store.best_per_model(args.metric, args.mode)
+        else:
+            rows = store.query(
+                args.model, args.prompt_version, args.mode, args.since, args.limit,
+                oldest_first=args.command == "trend", pdf=args.pdf,
+            )
+
+    if getattr(args, "json", False):
+        print(json.dumps(rows, indent=2))
+    elif args.command == "trend":
+        # One bar per run; the value column keeps exact numbers visible
+        values = [r[args.metric] for r in rows if r[args.metric] is not None]
+        top = max(values, default=0) or 1
+        for r in rows:
+            value = r[args.metric]
+            bar = "" if value is None else "#" * round(40 * value / top)
+            shown = "-" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)
+            print(f"{r['timestamp']:<19} {r['prompt_version'][:14]:<14} {r['mode']:<9} {shown:>10} {bar}")
+    else:
+        print(_format_runs(rows))
+
+
+if __name__ == "__main__":
+    main()
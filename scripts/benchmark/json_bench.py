@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+"""
+Corpus benchmark and parity check for LLM JSON parsing.
+
+The checked-in raw_llm_output*.txt captures (one response per
+"=== Segment i/N ===" block) are the corpus. The script:
+
+- checks parity between the benchmark parser (BatchedWorkflow) and the
+  prompt_tester parser (JSONParser), between whole and chunk-fed streaming
+  parsing, and against the legacy parsers wherever those produced valid data;
+- times the shared engine against the legacy implementations it replaced;
+- times the decode step of batched responses per backend (benchmark.decode):
+  generic json.loads dicts normalized key by key vs. typed CharacterEntry
+  records.
+
+With --robustness it instead runs every parser the two packages use
+(extract_json_from_text, JSONParser.parse_batched_response,
+JSONParser.parse_dialog_list, parse_characters_from_output) over mutations
+of the captures:
+- truncated at every offset
+- with a repeated entry
+- wrapped in code fences, prose or a think block
+- megabyte-sized runaway output: a looping list, unclosed braces
+
+It reports throughput, worst-case call latency and recovery rate per
+mutation kind, and fails when a call costs more per input character than
+--max-us-per-char. Super-linear behavior such as regex backtracking shows
+up there first.
+
+Usage:
+    python -m benchmark.json_bench
+    python -m benchmark.json_bench --repeat 50 --chunk 4
+    python -m benchmark.json_bench --robustness --truncate-step 1
+
+Exits with status 1 when a parity check (or a robustness limit) fails.
+"""
+
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from .decode import available_backends, decode_character_entry, loads, set_backend
+from .jsonparse import StreamingJSONParser, parse_llm_json
+from .utils import extract_json_from_text, parse_characters_from_output
+
+CORPUS_DIR = Path(__file__).parent
+CORPUS_GLOB = "raw_llm_output*.txt"
+_SEGMENT_HEADER_RE = re.compile(r"^=== Segment \d+/\d+ ===$", re.MULTILINE)
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> list[tuple[str, str]]:
+    """Return (label, response) pairs from the raw output captures."""
+    corpus = []
+    for path in sorted(corpus_dir.glob(CORPUS_GLOB)):
+        text = path.read_text(encoding="utf-8")
+        responses = [r.strip("\n") for r in _SEGMENT_HEADER_RE.split(text) if r.strip()]
+        corpus.extend((f"{path.name}#{i + 1}", r) for i, r in enumerate(responses))
+    return corpus
+
+
+# ---------------------------------------------------------------------------
+# Legacy reference implementations (replaced by jsonparse; kept for timing/parity)
+# ---------------------------------------------------------------------------
+
+def _legacy_extract_json_from_text(text: str) -> str:
+    """benchmark.utils.extract_json_from_text before the shared engine."""
+    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+    text = re.sub(r'<think>.*', '', text, flags=re.DOTALL)
+    text = text.replace('/no_think', '').strip()
+    code_block_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', text)
+    if code_block_match:
+        text = code_block_match.group(1).strip()
+    start_idx = text.find('{')
+    if start_idx == -1:
+        return ""
+    depth = 0
+    in_string = False
+    escape_next = False
+    last_valid_end = -1
+    for i in range(start_idx, len(text)):
+        char = text[i]
+        if escape_next:
+            escape_next = False
+            continue
+        if char == '\\' and in_string:
+            escape_next = True
+            continue
+        if char == '"':
+            in_string = not in_string
+            continue
+        if not in_string:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+                if depth == 0:
+                    return text[start_idx:i + 1]
+                elif depth == 1:
+                    last_valid_end = i
+    if last_valid_end != -1 and depth > 0:
+        return text[start_idx:last_valid_end + 1] + "\n}"
+    return ""
+
+
+def _legacy_benchmark_parse(response: str) -> dict:
+    """Legacy benchmark path: extract, then json.loads the whole object."""
+    json_str = _legacy_extract_json_from_text(response)
+    try:
+        data = json.loads(json_str) if json_str else {}
+    except json.JSONDecodeError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _legacy_normalize_character_entry(char_data) -> Optional[dict]:
+    """BatchedWorkflow._normalize_character_entry before typed decoding."""
+    if not isinstance(char_data, dict):
+        return None
+    normalized = {"dialogs": [], "traits": [], "voice": ""}
+    for key, value in char_data.items():
+        key_lower = key.lower()
+        if key_lower in ('d', 'dialogs', 'dialogue', 'dialogues'):
+            if isinstance(value, list):
+                normalized["dialogs"] = value
+        elif key_lower in ('t', 'traits', 'trait'):
+            if isinstance(value, list):
+                normalized["traits"] = value
+        elif key_lower in ('v', 'voice', 'voice_profile'):
+            if isinstance(value, str):
+                normalized["voice"] = value
+    return normalized
+
+
+def _legacy_batched_decode(response: str) -> dict:
+    """Batched parsing before typed decoding: generic dicts, then a normalization pass."""
+    return _legacy_normalize_entries(StreamingJSONParser.parse(response).entries)
+
+
+def _legacy_normalize_entries(entries: dict) -> dict:
+    normalized = {}
+    for name, char_data in entries.items():
+        entry = _legacy_normalize_character_entry(char_data)
+        if entry is not None:
+            normalized[name] = entry
+    return normalized
+
+
+def _typed_batched_decode(response: str) -> dict:
+    """BatchedWorkflow._parse_batched_response: typed records built while decoding."""
+    return StreamingJSONParser.parse(response, decode_entry=decode_character_entry).entries
+
+
+def _legacy_scan(json_str: str, on_char: Callable[[int, str, int], bool]) -> int:
+    """Character loop shared by the legacy prompt_tester helpers."""
+    depth = 0
+    in_string = False
+    escape_next = False
+    for i, char in enumerate(json_str):
+        if escape_next:
+            escape_next = False
+            continue
+        if char == '\\':
+            escape_next = True
+            continue
+        if char == '"':
+            in_string = not in_string
+            continue
+        if in_string:
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+        if on_char(i, char, depth):
+            return i
+    return -1
+
+
+def _legacy_prompt_tester_parse(response: str) -> dict:
+    """Legacy prompt_tester JSONParser.parse_batched_response (four passes + regex fallback)."""
+    text = response.strip()
+    match = re.search(r'```(?:json)?\s*([\s\S]*?)```', text)
+    if match:
+        text = match.group(1).strip()
+    start = text.find('{')
+    json_str = None
+    if start != -1:
+        end = _legacy_scan(text[start:], lambda i, c, d: c == '}' and d == 0)
+        if end != -1:
+            json_str = text[start:start + end + 1]
+        else:
+            json_str = _legacy_repair(text[start:])
+    if not json_str:
+        json_str = _legacy_repair(response)
+        if not json_str:
+            return {}
+    json_str = _legacy_truncate_at_duplicate_key(json_str)
+    try:
+        data = json.loads(json_str)
+        if isinstance(data, dict) and data:
+            return data
+    except json.JSONDecodeError:
+        pass
+    merged = {}
+    for m in re.finditer(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', response):
+        try:
+            merged.update(json.loads(m.group()))
+        except (json.JSONDecodeError, ValueError, TypeError):
+            continue
+    return merged
+
+
+def _legacy_repair(json_str: str):
+    last = [-1]
+
+    def track(i, c, d):
+        if c == '}' and d == 1:
+            last[0] = i
+        return False
+
+    _legacy_scan(json_str, track)
+    if last[0] > 0:
+        return json_str[:last[0] + 1].rstrip().rstrip(',') + '}'
+    return None
+
+
+def _legacy_truncate_at_duplicate_key(json_str: str) -> str:
+    seen = set()
+    for m in re.finditer(r'"([^"\\]*(?:\\.[^"\\]*)*)"\s*:\s*\{', json_str):
+        key = m.group(1).lower()
+        if key in seen:
+            comma = json_str.rfind(',', 0, m.start())
+            return json_str[:comma if comma > 0 else m.start()] + "}"
+        seen.add(key)
+    return json_str
+
+
+# ---------------------------------------------------------------------------
+# Parity checks
+# ---------------------------------------------------------------------------
+
+def _prompt_tester_parser():
+    """JSONParser.parse_batched_response, importing prompt_tester quietly."""
+    sys.path.insert(0, str(CORPUS_DIR.parent))
+    from prompt_tester.prompt_tester import JSONParser
+    logging.getLogger("prompt_tester.prompt_tester").setLevel(logging.ERROR)
+    return JSONParser
+
+
+def check_parity(corpus: list[tuple[str, str]], chunk: int = 8) -> tuple[dict, list[str]]:
+    """Run the parity checks. Returns (counts, failure messages)."""
+    JSONParser = _prompt_tester_parser()
+    counts = {"same_as_legacy": 0, "recovered": 0, "duplicate_cut": 0, "both_empty": 0}
+    failures = []
+
+    for label, response in corpus:
+        parsed = parse_llm_json(response)
+        data = parsed.data if isinstance(parsed.data, dict) else {}
+
+        # Benchmark and prompt_tester normalize the same entries
+        ours = _typed_batched_decode(response)
+        theirs = JSONParser.parse_batched_response(response)
+        if ours != theirs:
+            failures.append(f"{label}: benchmark and prompt_tester parsers disagree")
+
+        # Typed decoding matches the legacy dict normalization on every backend
+        legacy_entries = _legacy_batched_decode(response)
+        for backend in available_backends():
+            previous = set_backend(backend)
+            typed = {k: v.to_dict() for k, v in _typed_batched_decode(response).items()}
+            set_backend(previous)
+            if typed != legacy_entries:
+                failures.append(f"{label}: typed decode ({backend}) differs from dict normalization")
+
+        # Chunk-fed streaming equals one-shot parsing
+        parser = StreamingJSONParser()
+        for i in range(0, len(response), chunk):
+            parser.feed(response[i:i + chunk])
+        parser.finish()
+        if parser.entries != data or parser.truncated != parsed.truncated:
+            failures.append(f"{label}: streaming ({chunk}-char chunks) differs from one-shot parse")
+
+        # Repaired text decodes to the same data
+        if data and parsed.text and json.loads(parsed.text) != data:
+            failures.append(f"{label}: repaired JSON text does not match decoded data")
+
+        legacy = _legacy_benchmark_parse(response)
+        if legacy == data:
+            counts["same_as_legacy" if data else "both_empty"] += 1
+        elif not legacy:
+            counts["recovered"] += 1
+        elif parsed.duplicate_keys and all(legacy.get(k) is not None for k in data):
+            counts["duplicate_cut"] += 1
+        else:
+            failures.append(f"{label}: legacy parser found {sorted(legacy)} but engine found {sorted(data)}")
+    return counts, failures
+
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+def time_parser(func: Callable[[str], object], responses: list[str], repeat: int) -> dict:
+    """Time repeat passes of func over every response; costs come from the fastest pass."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        for response in responses:
+            func(response)
+        best = min(best, time.perf_counter() - t0)
+    chars = sum(len(r) for r in responses)
+    return {
+        "seconds": best,
+        "us_per_response": best / len(responses) * 1e6 if responses else 0.0,
+        "mb_per_s": chars / best / 1e6 if best > 0 else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Robustness: mutated corpus
+# ---------------------------------------------------------------------------
+
+RUNAWAY_CHARS = 1_000_000
+# Per-character cost above which a call counts as pathological (linear parsers
+# stay well below 1 us/char; backtracking on a megabyte input is far above)
+MAX_US_PER_CHAR = 5.0
+# Inputs shorter than this are too short for a per-character cost to mean anything
+MIN_COST_CHARS = 10_000
+
+_PROSE_BEFORE = "Sure! Here is the analysis of the excerpt:\n\n"
+_PROSE_AFTER = "\n\nLet me know if you need anything else."
+_THINK = '<think>\nThe user wants JSON like {"name": {"D": [...]}}. Let me list who speaks first...\n</think>\n'
+
+
+def _batched_entries(response: str) -> dict:
+    data = parse_llm_json(response).data
+    return data if isinstance(data, dict) else {}
+
+
+def build_formats(corpus: list[tuple[str, str]]) -> dict[str, list[tuple[str, str]]]:
+    """Base inputs per response format, all derived from the captures.
+
+    - batched: the captured batched-analysis responses themselves
+    - dialogs: pass-2 style [{"speaker", "text"}, ...] arrays of their dialogs
+    - characters: "Characters: A, B and C" lines of their names
+    """
+    formats: dict[str, list[tuple[str, str]]] = {"batched": list(corpus), "dialogs": [], "characters": []}
+    for label, response in corpus:
+        entries = _batched_entries(response)
+        if not entries:
+            continue
+        rows = [
+            {"speaker": name, "text": line}
+            for name, entry in entries.items() if isinstance(entry, dict)
+            for line in (entry.get("D") or []) if isinstance(line, str)
+        ]
+        if rows:
+            formats["dialogs"].append((label, json.dumps(rows, indent=2, ensure_ascii=False)))
+        names = list(entries)
+        listed = ", ".join(names[:-1]) + f" and {names[-1]}" if len(names) > 1 else names[0]
+        formats["characters"].append((label, f"Characters: {listed}\nTraits: see below"))
+    return formats
+
+
+def _repeat_first_entry(text: str, fmt: str) -> Optional[str]:
+    """The input with its first entry repeated after the last one (a looping model)."""
+    if fmt == "characters":
+        line, _, rest = text.partition("\n")
+        first = line.split(":", 1)[1].split(",")[0].split(" and ")[0].strip()
+        return f"{line}, {first}\n{rest}"
+    data = parse_llm_json(text, roots="{[").data
+    if not data:
+        return None
+    root = text.rstrip()
+    if isinstance(data, dict):
+        key, value = next(iter(data.items()))
+        repeated = f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+    else:
+        repeated = json.dumps(data[0], ensure_ascii=False)
+    return f"{root[:-1].rstrip()},\n  {repeated}\n{root[-1]}"
+
+
+def _runaway(text: str, fmt: str, size: int) -> list[tuple[str, str]]:
+    """Megabyte-sized outputs of a model that never stops."""
+    if fmt == "characters":
+        loop = "Characters: " + "Mr Dursley, " * (size // 12)
+    elif fmt == "dialogs":
+        loop = text[:text.find("{")] + '{"speaker": "Mr Dursley", "text": "He hummed."}, ' * (size // 48)
+    else:
+        loop = '{\n  "Mr Dursley": {\n    "D": [' + '"He hummed.", ' * (size // 14)
+    return [("runaway_loop", loop), ("runaway_braces", text[:text.find(text.lstrip()[0])] + "{" * size)]
+
+
+def mutations(text: str, fmt: str, truncate_step: int = 1) -> list[tuple[str, str]]:
+    """(kind, mutated input) pairs of one base input (runaway outputs are added separately)."""
+    out = [("truncated", text[:end]) for end in range(1, len(text), max(1, truncate_step))]
+    out += [
+        ("fenced", f"```json\n{text}\n```"),
+        ("prose", f"{_PROSE_BEFORE}{text}{_PROSE_AFTER}"),
+        ("think", f"{_THINK}{text}"),
+    ]
+    repeated = _repeat_first_entry(text, fmt)
+    if repeated:
+        out.append(("repeated_entry", repeated))
+    return out
+
+
+def _json_keys(text: str) -> set:
+    try:
+        data = json.loads(text) if text else {}
+    except json.JSONDecodeError:
+        return set()
+    return set(data) if isinstance(data, dict) else set()
+
+
+def robustness_parsers() -> list[tuple[str, str, Callable[[str], object], Callable[[object], set]]]:
+    """(name, format, parse, items of the parse result) for every parser under test."""
+    JSONParser = _prompt_tester_parser()
+    return [
+        ("extract_json_from_text", "batched", extract_json_from_text, _json_keys),
+        ("JSONParser.parse_batched_response", "batched", JSONParser.parse_batched_response, set),
+        ("JSONParser.parse_dialog_list", "dialogs", JSONParser.parse_dialog_list,
+         lambda out: {(d["speaker"], d["text"]) for d in out}),
+        ("parse_characters_from_output", "characters", parse_characters_from_output,
+         lambda out: set(out) - {"Narrator"}),
+    ]
+
+
+def _recoverable(prefix: str, fmt: str) -> bool:
+    """Does a truncated input still hold a complete entry? (reference for the recovery rate)"""
+    if fmt == "characters":
+        names = prefix.partition(":")[2]
+        return "," in names or "\n" in names
+    return bool(parse_llm_json(prefix, roots="{[").data)
+
+
+def run_robustness(
+    formats: dict[str, list[tuple[str, str]]],
+    truncate_step: int = 1,
+    runaway_chars: int = RUNAWAY_CHARS,
+) -> list[dict]:
+    """Time and score every parser on the mutations of its format's inputs.
+
+    Recovery: lossless wrappers (fences, prose, think blocks, a repeated
+    entry) must give the same items as the clean input; a truncated input
+    that still holds a complete entry must give a non-empty subset of them.
+    Items that were never in the clean input count as wrong.
+
+    Returns:
+        One row per (parser, mutation kind): inputs, MB/s, worst call,
+        highest per-character cost, recovered / recoverable, wrong
+    """
+    rows = []
+    for name, fmt, parse, items in robustness_parsers():
+        stats: dict[str, dict] = {}
+
+        def record(kind: str, text: str, expected: Optional[set]) -> None:
+            t0 = time.perf_counter()
+            out = parse(text)
+            seconds = time.perf_counter() - t0
+            s = stats.setdefault(kind, {
+                "inputs": 0, "chars": 0, "seconds": 0.0, "worst_ms": 0.0, "worst_us_per_char": 0.0,
+                "recoverable": 0, "recovered": 0, "wrong": 0,
+            })
+            s["inputs"] += 1
+            s["chars"] += len(text)
+            s["seconds"] += seconds
+            s["worst_ms"] = max(s["worst_ms"], seconds * 1000)
+            if len(text) >= MIN_COST_CHARS:
+                s["worst_us_per_char"] = max(s["worst_us_per_char"], seconds * 1e6 / len(text))
+            if expected is None:
+                return
+            found = items(out)
+            if found - expected:
+                s["wrong"] += 1
+            if kind == "truncated":
+                if not _recoverable(text, fmt):
+                    return
+                s["recoverable"] += 1
+                s["recovered"] += bool(found) and found <= expected
+            else:
+                s["recoverable"] += 1
+                s["recovered"] += found == expected
+
+        bases = formats[fmt]
+        for _, base in bases:
+            expected = items(parse(base))
+            for kind, text in mutations(base, fmt, truncate_step):
+                record(kind, text, expected)
+        if bases:
+            longest = max((b for _, b in bases), key=len)
+            for kind, text in _runaway(longest, fmt, runaway_chars):
+                record(kind, text, None)
+
+        for kind, s in stats.items():
+            rows.append({
+                "parser": name, "kind": kind, "inputs": s["inputs"],
+                "mb_per_s": s["chars"] / s["seconds"] / 1e6 if s["seconds"] > 0 else 0.0,
+                "worst_ms": s["worst_ms"], "worst_us_per_char": s["worst_us_per_char"],
+                "recovered": s["recovered"], "recoverable": s["recoverable"], "wrong": s["wrong"],
+            })
+    return rows
+
+
+def format_robustness(rows: list[dict]) -> str:
+    lines = [
+        f"{'parser':<36}{'kind':<16}{'inputs':>8}{'MB/s':>8}{'worst ms':>10}{'us/char':>9}"
+        f"{'recovered':>11}{'wrong':>7}"
+    ]
+    for r in rows:
+        recovered = f"{r['recovered'] / r['recoverable']:.1%}" if r["recoverable"] else "-"
+        cost = f"{r['worst_us_per_char']:.2f}" if r["worst_us_per_char"] else "-"
+        lines.append(
+            f"{r['parser']:<36}{r['kind']:<16}{r['inputs']:>8}{r['mb_per_s']:>8.2f}{r['worst_ms']:>10.1f}"
+            f"{cost:>9}{recovered:>11}{r['wrong']:>7}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and parity-check LLM JSON parsing on the raw output corpus.")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the corpus per parser, fastest reported (default: 20)")
+    parser.add_argument("--chunk", type=int, default=8, help="Chunk size for the streaming parity check (default: 8)")
+    parser.add_argument("--corpus-dir", default=str(CORPUS_DIR), help="Directory with raw_llm_output*.txt")
+    parser.add_argument("--robustness", action="store_true",
+                        help="Run the parsers over mutated captures instead of the parity/timing checks")
+    parser.add_argument("--truncate-step", type=int, default=1,
+                        help="Truncate every N-th offset for --robustness (default: 1, every offset)")
+    parser.add_argument("--runaway-chars", type=int, default=RUNAWAY_CHARS,
+                        help=f"Size of the runaway outputs for --robustness (default: {RUNAWAY_CHARS})")
+    parser.add_argument("--max-us-per-char", type=float, default=MAX_US_PER_CHAR,
+                        help=f"Fail --robustness if a call on a {MIN_COST_CHARS}+ char input costs more "
+                             f"(default: {MAX_US_PER_CHAR})")
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.corpus_dir))
+    if not corpus:
+        print(f"ERROR: no {CORPUS_GLOB} captures in {args.corpus_dir}", file=sys.stderr)
+        sys.exit(1)
+    responses = [r for _, r in corpus]
+    print(f"Corpus: {len(corpus)} responses, {sum(len(r) for r in responses)} chars")
+
+    if args.robustness:
+        formats = build_formats(corpus)
+        print("Formats: " + ", ".join(f"{fmt} {len(inputs)}" for fmt, inputs in formats.items()))
+        rows = run_robustness(formats, args.truncate_step, args.runaway_chars)
+        print(format_robustness(rows))
+        slow = [r for r in rows if r["worst_us_per_char"] > args.max_us_per_char]
+        for r in slow:
+            print(f"PATHOLOGICAL: {r['parser']} on {r['kind']} costs {r['worst_us_per_char']:.1f} us/char "
+                  f"(limit {args.max_us_per_char})")
+        sys.exit(1 if slow else 0)
+
+    counts, failures = check_parity(corpus, args.chunk)
+    print(f"Parity: {counts}")
+
+    JSONParser = _prompt_tester_parser()
+    parsers = [
+        ("engine parse_llm_json", parse_llm_json),
+        ("engine JSONParser.parse_batched_response", JSONParser.parse_batched_response),
+        ("legacy benchmark extract + json.loads", _legacy_benchmark_parse),
+        ("legacy prompt_tester parse_batched_response", _legacy_prompt_tester_parse),
+    ]
+    print(f"\n{'parser':<46}{'us/response':>14}{'MB/s':>10}")
+    for name, func in parsers:
+        stats = time_parser(func, responses, args.repeat)
+        print(f"{name:<46}{stats['us_per_response']:>14.1f}{stats['mb_per_s']:>10.2f}")
+
+    # Decode step alone (the scan is shared): each response's root JSON text
+    # decoded to generic dicts and normalized, vs typed records per backend
+    roots = [t for t in (parse_llm_json(r).text for r in responses) if t]
+    decoders = [("json", "json.loads + normalize pass", lambda t: _legacy_normalize_entries(json.loads(t)))]
+    decoders += [
+        (b, f"typed decode [{b}]", lambda t: {k: decode_character_entry(v) for k, v in loads(t).items()})
+        for b in reversed(available_backends())
+    ]
+    print(f"\n{'batched decode step':<46}{'us/response':>14}{'MB/s':>10}")
+    for backend, name, func in decoders:
+        previous = set_backend(backend)
+        stats = time_parser(func, roots, args.repeat)
+        set_backend(previous)
+        print(f"{name:<46}{stats['us_per_response']:>14.1f}{stats['mb_per_s']:>10.2f}")
+
+    if failures:
+        print(f"\n{len(failures)} parity failure(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll parity checks passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,497 @@
+"""
+Incremental JSON parsing of LLM output.
+
+LLM responses arrive token by token and are frequently truncated (max tokens
+hit) or degenerate into repetition loops (the same character key emitted over
+and over). StreamingJSONParser is fed chunks as they arrive and scans each
+character exactly once:
+
+- text before the JSON (prose, ```json fences, <think>...</think> blocks) is
+  skipped;
+- every top-level entry of the root object ("Name": {...}) is emitted as soon
+  as it closes, and so is every element of an array directly under a
+  top-level key ({"dialogs": [{...}, {...}]}) or of a root array;
+- a repeated top-level key (case-insensitive) is detected when its colon is
+  read, and parsing stops there (the model is looping);
+- a root that never closes is reported as truncated, keeping every entry
+  and element that did complete.
+
+Only the slice of one completed value is decoded (benchmark.decode.loads,
+which uses msgspec/orjson when installed), and consumed input is dropped, so
+memory is bounded by the largest single entry. A decode_entry callable turns
+each entry into a typed record as it is decoded.
+
+Usage:
+    parser = StreamingJSONParser()
+    for chunk in model.generate_stream(prompt):
+        for event in parser.feed(chunk):
+            handle(event.key, event.value)
+    parser.finish()
+    data = parser.result()
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, Optional
+
+from .decode import loads
+
+_STRUCTURAL_RE = re.compile(r'[{}\[\]",:]')
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
+
+
+@dataclass
+class JSONEvent:
+    """A completed piece of the streamed document.
+
+    kind is "entry" (key/value of the root object) or "item" (array element;
+    key is the top-level key holding the array, or None for a root array).
+    """
+    kind: str
+    key: Optional[str]
+    value: Any
+
+
+class StreamingJSONParser:
+    """Single-pass, chunk-fed JSON scanner that emits entries as they close."""
+
+    def __init__(
+        self,
+        roots: str = "{",
+        stop_on_duplicate: bool = True,
+        multiple_roots: bool = False,
+        decode_entry: Optional[Callable[[Any], Any]] = None,
+    ):
+        """Create a parser.
+
+        Args:
+            roots: Characters that may open the root value ("{", "[" or "{[")
+            stop_on_duplicate: Stop at the first repeated top-level key
+                (otherwise the repeat is skipped and parsing continues)
+            multiple_roots: Keep scanning for further root values after the
+                first one closes (JSONL-style output), merging their entries
+            decode_entry: Converts each decoded root-object entry (e.g. into a
+                typed record); entries it maps to None are dropped
+        """
+        self.roots = roots
+        self.stop_on_duplicate = stop_on_duplicate
+        self.multiple_roots = multiple_roots
+        self.decode_entry = decode_entry
+        self._root_re = re.compile(
+            "|".join([re.escape(_THINK_OPEN)] + [re.escape(c) for c in roots])
+        )
+
+        self._buf = ""
+        self._pos = 0
+        self._mode = "preamble"  # preamble | think | json | done
+        self._stack: list[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+
+        # Root object state
+        self._expect = "key"  # key | colon | value | comma
+        self._key: Optional[str] = None
+        self._value_start = -1
+        self._skip_entry = False
+        # Element state of the array being streamed (root array or array under a key)
+        self._items: Optional[list] = None
+        self._item_start = -1
+
+        self.root_type: Optional[str] = None
+        self.entries: dict[str, Any] = {}
+        self.items: list = []
+        self.duplicate_keys: list[str] = []
+        self.errors = 0
+        self.closed = False
+        self.truncated = False
+        self.partial_entry = False  # finish() kept the elements of a cut-off array
+        self._seen: set[str] = set()
+        # Absolute offsets into everything fed (for repaired-text extraction)
+        self._consumed = 0
+        self.root_start = -1
+        self.root_end = -1
+        self.last_complete_end = -1
+
+    @classmethod
+    def parse(cls, text: str, start: int = 0, **kwargs) -> "StreamingJSONParser":
+        """Parse a complete response in one go and return the finished parser.
+
+        Args:
+            text: Raw model response
+            start: Offset to start scanning at (offsets stay relative to text)
+        """
+        parser = cls(**kwargs)
+        parser._pos = start
+        parser.feed(text)
+        parser.finish()
+        return parser
+
+    @property
+    def stopped_on_duplicate(self) -> bool:
+        """True once a repeated key ended parsing (the rest can be discarded)."""
+        return self.stop_on_duplicate and bool(self.duplicate_keys)
+
+    @property
+    def done(self) -> bool:
+        """True when further input would be ignored."""
+        return self._mode == "done"
+
+    def result(self):
+        """The parsed root: a dict for an object root, a list for an array root."""
+        return self.items if self.root_type == "[" else self.entries
+
+    # -------------------------------------------------------------------------
+    # Feeding
+    # -------------------------------------------------------------------------
+
+    def feed(self, chunk: str) -> list[JSONEvent]:
+        """Consume the next chunk of text and return the events it completed."""
+        events: list[JSONEvent] = []
+        if self._mode == "done" or not chunk:
+            return events
+        self._buf += chunk
+        while self._pos < len(self._buf) and self._mode != "done":
+            if self._mode == "json":
+                self._scan_json(events)
+            elif self._mode == "think":
+                if not self._scan_think():
+                    break
+            elif not self._scan_preamble():
+                break
+        if self._mode != "done":
+            self._compact()
+        return events
+
+    def finish(self) -> list[JSONEvent]:
+        """Signal end of input; flags truncation and keeps partial arrays."""
+        events: list[JSONEvent] = []
+        if self._mode == "json" and self._stack:
+            self.truncated = True
+            # Elements of an array cut off mid-way are still useful (e.g. dialogs)
+            if self.root_type == "{" and self._items and not self._skip_entry and self._key is not None:
+                value = self.decode_entry(self._items) if self.decode_entry else self._items
+                if value is not None:
+                    self.entries[self._key] = value
+                    self.partial_entry = True
+                    events.append(JSONEvent("entry", self._key, value))
+        self._mode = "done"
+        return events
+
+    def _scan_preamble(self) -> bool:
+        """Skip text up to the root value or a think block. False if more input is needed."""
+        m = self._root_re.search(self._buf, self._pos)
+        if not m:
+            # Keep a possible partial "<think" tag for the next chunk
+            self._pos = max(self._pos, len(self._buf) - len(_THINK_OPEN) + 1)
+            return False
+        if m.group() == _THINK_OPEN:
+            self._mode = "think"
+            self._pos = m.end()
+            return True
+        self._start_root(m.group(), m.start())
+        return True
+
+    def _scan_think(self) -> bool:
+        """Skip a think block. False if more input is needed."""
+        end = self._buf.find(_THINK_CLOSE, self._pos)
+        if end == -1:
+            self._pos = max(self._pos, len(self._buf) - len(_THINK_CLOSE) + 1)
+            return False
+        self._mode = "preamble"
+        self._pos = end + len(_THINK_CLOSE)
+        return True
+
+    def _start_root(self, char: str, index: int) -> None:
+        self._mode = "json"
+        if self.root_type is None:
+            self.root_start = self._consumed + index
+        self.root_type = self.root_type or char
+        self._stack = [char]
+        self._expect = "key"
+        self._pos = index + 1
+        if char == "[":
+            self._items = self.items
+            self._item_start = index + 1
+
+    def _compact(self) -> None:
+        """Drop consumed input that no pending value refers to."""
+        marks = [self._pos]
+        for mark in (self._value_start, self._item_start, self._string_start):
+            if mark >= 0:
+                marks.append(mark)
+        cut = min(marks)
+        if cut <= 0:
+            return
+        self._buf = self._buf[cut:]
+        self._consumed += cut
+        self._pos -= cut
+        if self._value_start >= 0:
+            self._value_start -= cut
+        if self._item_start >= 0:
+            self._item_start -= cut
+        if self._string_start >= 0:
+            self._string_start -= cut
+
+    # -------------------------------------------------------------------------
+    # JSON scanning
+    # -------------------------------------------------------------------------
+
+    def _scan_json(self, events: list[JSONEvent]) -> None:
+        buf = self._buf
+        while self._pos < len(buf) and self._mode == "json":
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    self._pos += 1
+                    continue
+                m = _STRING_SPECIAL_RE.search(buf, self._pos)
+                if not m:
+                    self._pos = len(buf)
+                    return
+                i = m.start()
+                self._pos = i + 1
+                if buf[i] == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                    self._end_string(i)
+                continue
+
+            m = _STRUCTURAL_RE.search(buf, self._pos)
+            if not m:
+                self._pos = len(buf)
+                return
+            i = m.start()
+            self._pos = i + 1
+            c = buf[i]
+            if c == '"':
+                self._in_string = True
+                if len(self._stack) == 1 and self.root_type == "{" and self._expect == "key":
+                    self._string_start = i
+            elif c in "{[":
+                self._open(c, i)
+            elif c in "}]":
+                self._close(i, events)
+            elif c == ",":
+                self._comma(i, events)
+            else:
+                self._colon(i)
+
+    def _end_string(self, i: int) -> None:
+        if self._string_start < 0:
+            return
+        raw = self._buf[self._string_start:i + 1]
+        self._string_start = -1
+        if "\\" not in raw:
+            # Nothing to unescape (a key json.loads rejects falls back to this too)
+            self._key = raw[1:-1]
+        else:
+            try:
+                self._key = json.loads(raw)
+            except json.JSONDecodeError:
+                self._key = raw[1:-1]
+        self._expect = "colon"
+
+    def _colon(self, i: int) -> None:
+        if len(self._stack) != 1 or self.root_type != "{" or self._expect != "colon":
+            return
+        self._expect = "value"
+        self._value_start = i + 1
+        folded = self._key.lower()
+        self._skip_entry = folded in self._seen
+        if self._skip_entry:
+            self.duplicate_keys.append(self._key)
+            if self.stop_on_duplicate:
+                # Everything from the repeated key on is a loop: treat the root as closed
+                self._value_start = -1
+                self.closed = True
+                self._mode = "done"
+        else:
+            self._seen.add(folded)
+
+    def _open(self, c: str, i: int) -> None:
+        self._stack.append(c)
+        if self.root_type == "{" and len(self._stack) == 2 and c == "[":
+            # Array value under a top-level key: stream its elements
+            self._items = []
+            self._item_start = i + 1
+            self._value_start = -1
+
+    def _close(self, i: int, events: list[JSONEvent]) -> None:
+        depth = len(self._stack)
+        streaming_array = self._items is not None and (
+            (self.root_type == "[" and depth == 1) or (self.root_type == "{" and depth == 2)
+        )
+        if streaming_array:
+            self._flush_scalar_item(i, events)
+        self._stack.pop()
+        depth -= 1
+
+        if depth == 0:
+            if self.root_type == "{" and self._expect == "value":
+                self._emit_entry(self._buf[self._value_start:i], events, i)
+            if self.root_end < 0:
+                self.root_end = self._consumed + i + 1
+            self.closed = True
+            self._items = None if self.root_type == "{" else self._items
+            self._item_start = -1
+            self._mode = "preamble" if self.multiple_roots else "done"
+            return
+
+        if self.root_type == "{":
+            if depth == 1:
+                if self._items is not None:
+                    self._emit_value(self._items, events, i + 1)
+                    self._items = None
+                    self._item_start = -1
+                else:
+                    self._emit_entry(self._buf[self._value_start:i + 1], events, i + 1)
+                self._value_start = -1
+                self._expect = "comma"
+            elif depth == 2 and self._items is not None and self._item_start >= 0:
+                self._emit_item(self._buf[self._item_start:i + 1], self._key, events, i + 1)
+                self._item_start = -1
+        elif depth == 1 and self._item_start >= 0:
+            self._emit_item(self._buf[self._item_start:i + 1], None, events, i + 1)
+            self._item_start = -1
+
+    def _comma(self, i: int, events: list[JSONEvent]) -> None:
+        depth = len(self._stack)
+        if self.root_type == "{":
+            if depth == 1:
+                if self._expect == "value":
+                    self._emit_entry(self._buf[self._value_start:i], events, i)
+                    self._value_start = -1
+                self._expect = "key"
+            elif depth == 2 and self._items is not None:
+                self._flush_scalar_item(i, events)
+                self._item_start = i + 1
+        elif depth == 1:
+            self._flush_scalar_item(i, events)
+            self._item_start = i + 1
+
+    def _flush_scalar_item(self, i: int, events: list[JSONEvent]) -> None:
+        """Emit a pending scalar element ending at i (container elements emit on close)."""
+        if self._item_start < 0:
+            return
+        raw = self._buf[self._item_start:i].strip()
+        self._item_start = -1
+        if raw:
+            self._emit_item(raw, self._key if self.root_type == "{" else None, events, i)
+
+    # -------------------------------------------------------------------------
+    # Emitting
+    # -------------------------------------------------------------------------
+
+    def _decode(self, raw: str) -> tuple[bool, Any]:
+        try:
+            return True, loads(raw)
+        except json.JSONDecodeError:
+            self.errors += 1
+            return False, None
+
+    def _emit_entry(self, raw: str, events: list[JSONEvent], end: int) -> None:
+        if self._skip_entry:
+            return
+        ok, value = self._decode(raw)
+        if ok:
+            self._emit_value(value, events, end)
+
+    def _emit_value(self, value: Any, events: list[JSONEvent], end: int) -> None:
+        if self._skip_entry or self._key is None:
+            return
+        self.last_complete_end = self._consumed + end
+        if self.decode_entry is not None:
+            value = self.decode_entry(value)
+            if value is None:
+                return
+        self.entries[self._key] = value
+        events.append(JSONEvent("entry", self._key, value))
+
+    def _emit_item(self, raw: str, key: Optional[str], events: list[JSONEvent], end: int) -> None:
+        if self._skip_entry:
+            return
+        ok, value = self._decode(raw)
+        if ok:
+            self._items.append(value)
+            if self.root_type == "[":
+                self.last_complete_end = self._consumed + end
+            events.append(JSONEvent("item", key, value))
+
+
+# -----------------------------------------------------------------------------
+# One-shot extraction engine
+# -----------------------------------------------------------------------------
+
+@dataclass
+class ParsedJSON:
+    """Result of parse_llm_json()."""
+    data: Any  # dict / list, or None when no JSON root was found
+    text: str  # JSON text of the root, repaired when truncated or cut at a repeated key
+    truncated: bool = False
+    duplicate_keys: list[str] = field(default_factory=list)
+    errors: int = 0  # completed values that failed to decode
+
+
+def parse_llm_json(text: str, roots: str = "{", multiple_roots: bool = False) -> ParsedJSON:
+    """Locate, repair and decode the JSON in an LLM response in one linear pass.
+
+    Think blocks, prose and code fences around the JSON are skipped. A
+    truncated root keeps every completed entry (and the completed elements of
+    an array it was streaming); a repeated top-level key ends the root (the
+    first occurrence wins, matching the app's truncateAtDuplicateKey).
+
+    Args:
+        text: Raw model response
+        roots: Characters that may open the root value ("{", "[" or "{[")
+        multiple_roots: Merge entries of several consecutive root values (JSONL)
+
+    Returns:
+        ParsedJSON with the decoded data and the (repaired) JSON text
+    """
+    parser = StreamingJSONParser.parse(text, roots=roots, multiple_roots=multiple_roots)
+    if parser.root_type is None:
+        return ParsedJSON(data=None, text="")
+
+    data = parser.result()
+    close = "}" if parser.root_type == "{" else "]"
+    # The raw slice is only reusable when every entry in it decoded
+    if multiple_roots or parser.partial_entry or parser.errors:
+        json_text = json.dumps(data, ensure_ascii=False) if data else ""
+    elif parser.root_end >= 0 and not parser.duplicate_keys:
+        json_text = text[parser.root_start:parser.root_end]
+    elif parser.last_complete_end >= 0:
+        json_text = text[parser.root_start:parser.last_complete_end] + "\n" + close
+    else:
+        json_text = json.dumps(data, ensure_ascii=False) if data else ""
+    return ParsedJSON(
+        data=data,
+        text=json_text,
+        truncated=parser.truncated,
+        duplicate_keys=list(parser.duplicate_keys),
+        errors=parser.errors,
+    )
+
+
+def iter_json_roots(text: str, roots: str = "{[") -> Iterator[Any]:
+    """Decode every root value of an LLM response in order, one pass over the text.
+
+    Unlike multiple_roots, roots are yielded one by one, so an array followed
+    by an object (or two objects with the same keys) keep their contents.
+    A truncated or looping root is the last one yielded, with the entries
+    and elements it completed.
+    """
+    start = 0
+    while start < len(text):
+        parser = StreamingJSONParser.parse(text, start=start, roots=roots)
+        if parser.root_type is None:
+            return
+        yield parser.result()
+        if parser.root_end < 0 or parser.stopped_on_duplicate:
+            return
+        start = parser.root_end
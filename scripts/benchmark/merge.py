@@ -0,0 +1,173 @@
+"""
+Hierarchical map-reduce merging of partial (chapter-level) analysis results.
+
+Very large books are analyzed as many independent units. Instead of appending
+everything to flat lists and rescanning them per character, each unit becomes a
+PartialResult with a character table and dialogs already grouped by speaker.
+Partials are then combined by pairwise tree merges, level by level, which can
+run across processes. A merge step only ever holds two partials, and per
+character context is capped, so memory per step stays bounded.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .utils import canonicalize_characters, is_character_name, resolve_alias
+
+# Context excerpts kept per character after a merge (bounds merge memory)
+MAX_CONTEXTS_PER_CHARACTER = 8
+
+
+@dataclass
+class PartialResult:
+    """Analysis result of one unit (chapter) or of a merged group of units."""
+    # name -> {"pages": [...], "traits": [...], "context": [...], "voice_profile": {...}}
+    characters: dict[str, dict] = field(default_factory=dict)
+    dialogs: dict[str, list[dict]] = field(default_factory=dict)  # speaker -> dialogs
+    # speaker -> reading-order position of each dialog in dialogs[speaker]
+    dialog_seq: dict[str, list[int]] = field(default_factory=dict)
+    next_seq: int = 0  # positions used so far; merges shift the right partial by it
+    aliases: dict[str, str] = field(default_factory=dict)  # raw alias -> canonical
+    units: int = 1
+    duplicates_dropped: int = 0
+
+    @classmethod
+    def from_unit(
+        cls,
+        characters: dict[str, list[int]],
+        dialogs: list[dict],
+        context: Optional[dict[str, str]] = None,
+    ) -> "PartialResult":
+        """Build a partial from one unit's character page map, dialogs and context."""
+        context = context or {}
+        characters = {name: pages for name, pages in characters.items() if is_character_name(name)}
+        partial = cls()
+        partial.characters = {
+            name: {
+                "pages": sorted(set(pages)),
+                "traits": [],
+                "context": [context[name]] if context.get(name) else [],
+                "voice_profile": {},
+            }
+            for name, pages in characters.items()
+        }
+        partial.aliases = {name: name for name in characters}
+        for seq, d in enumerate(dialogs):
+            partial._add_dialog(d.get("speaker") or "Unknown", d, seq)
+        partial.next_seq = len(dialogs)
+        return partial
+
+    def _add_dialog(self, speaker: str, dialog: dict, seq: int) -> None:
+        self.dialogs.setdefault(speaker, []).append(dialog)
+        self.dialog_seq.setdefault(speaker, []).append(seq)
+
+    def flat_dialogs(self) -> list[dict]:
+        """All dialogs in page order, in reading order within a page."""
+        rows = [
+            (d.get("page") if isinstance(d.get("page"), int) else 0, seq, d)
+            for speaker, group in self.dialogs.items()
+            for seq, d in zip(self.dialog_seq[speaker], group)
+        ]
+        rows.sort(key=lambda row: row[:2])
+        return [d for _, _, d in rows]
+
+
+def _dialog_key(d: dict) -> tuple:
+    """Identity of a dialog for deduplication: speaker, normalized text, page."""
+    text = " ".join(str(d.get("text", "")).split()).casefold()
+    return d.get("speaker"), text, d.get("page")
+
+
+def merge_partials(a: PartialResult, b: PartialResult) -> PartialResult:
+    """Merge two partial results.
+
+    Character tables are combined after canonicalizing the union of both name
+    sets, traits and pages are unioned, context is capped and dialogs are
+    re-keyed to canonical speakers and deduplicated.
+    """
+    step_aliases = canonicalize_characters(list(a.characters) + list(b.characters))
+    merged = PartialResult(units=a.units + b.units, next_seq=a.next_seq + b.next_seq)
+    merged.duplicates_dropped = a.duplicates_dropped + b.duplicates_dropped
+
+    for source in (a, b):
+        for alias, canonical in source.aliases.items():
+            merged.aliases[alias] = step_aliases.get(canonical, canonical)
+        for name, info in source.characters.items():
+            target = merged.characters.setdefault(
+                step_aliases[name],
+                {"pages": [], "traits": [], "context": [], "voice_profile": {}},
+            )
+            target["pages"] = sorted(set(target["pages"]).union(info["pages"]))
+            target["traits"].extend(t for t in info["traits"] if t not in target["traits"])
+            room = MAX_CONTEXTS_PER_CHARACTER - len(target["context"])
+            if room > 0:
+                target["context"].extend(info["context"][:room])
+            if not target["voice_profile"]:
+                target["voice_profile"] = info["voice_profile"]
+
+    seen: set[tuple] = set()
+    resolved: dict[str, str] = {}
+    for source, shift in ((a, 0), (b, a.next_seq)):
+        for speaker, group in source.dialogs.items():
+            if speaker not in resolved:
+                resolved[speaker] = resolve_alias(speaker, step_aliases)
+            canonical = resolved[speaker]
+            for seq, d in zip(source.dialog_seq[speaker], group):
+                d["speaker"] = canonical
+                key = _dialog_key(d)
+                if key in seen:
+                    merged.duplicates_dropped += 1
+                    continue
+                seen.add(key)
+                merged._add_dialog(canonical, d, seq + shift)
+    return merged
+
+
+def _merge_pair(pair: tuple) -> PartialResult:
+    """Process-pool entry point (must be module level to pickle)."""
+    return merge_partials(*pair)
+
+
+def tree_merge(partials: list[PartialResult], processes: int = 0) -> tuple[PartialResult, dict]:
+    """Reduce partials with pairwise merges, one tree level at a time.
+
+    Args:
+        partials: Unit-level results, in book order
+        processes: Worker processes per level (0/1 merges in-process)
+
+    Returns:
+        Tuple of (merged result, timing breakdown). The breakdown has a
+        'merge_levelN' entry per level and 'merge_total'.
+    """
+    timing: dict[str, float] = {}
+    if not partials:
+        return PartialResult(units=0), {"merge_total": 0.0}
+
+    level = list(partials)
+    depth = 0
+    t_start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=processes) if processes > 1 else None
+    try:
+        while len(level) > 1:
+            depth += 1
+            t0 = time.perf_counter()
+            pairs = [(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+            carry = [level[-1]] if len(level) % 2 else []
+            if pool and len(pairs) > 1:
+                merged = list(pool.map(_merge_pair, pairs))
+            else:
+                merged = [merge_partials(x, y) for x, y in pairs]
+            level = merged + carry
+            timing[f"merge_level{depth}"] = time.perf_counter() - t0
+    finally:
+        if pool:
+            pool.shutdown()
+
+    result = level[0]
+    if depth == 0:
+        # A single unit still goes through one merge to canonicalize and dedupe
+        result = merge_partials(result, PartialResult(units=0))
+    timing["merge_total"] = time.perf_counter() - t_start
+    return result, timing
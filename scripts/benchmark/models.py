@@ -8,12 +8,19 @@ Supports:
 
 import json
 import subprocess
+import threading
 import time
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 import requests
 
+from .decode import loads
+
+# Token usage of the last generate() call, per thread (workflows may share a model
+# across threads, so a plain attribute would race)
+_usage = threading.local()
+
 
 class BaseModel(ABC):
     """Abstract base class for model loaders."""
@@ -23,6 +30,28 @@ class BaseModel(ABC):
         """Generate text from prompt."""
         pass
 
+    def generate_stream(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> Iterator[str]:
+        """Yield the completion in chunks as it is decoded.
+
+        Closing the iterator early abandons the rest of the generation where the
+        backend supports it. Backends without streaming yield one chunk.
+        """
+        yield self.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+
+    def count_tokens(self, text: str) -> int:
+        """Count prompt tokens. Backends with a tokenizer override this."""
+        return max(1, len(text) // 4)
+
+    def _record_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        """Store token usage reported by the backend for the current thread."""
+        _usage.value = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def pop_usage(self) -> Optional[dict]:
+        """Return and clear the usage of this thread's last generate(), if reported."""
+        usage = getattr(_usage, "value", None)
+        _usage.value = None
+        return usage
+
     @abstractmethod
     def close(self) -> None:
         """Clean up resources."""
@@ -56,9 +85,9 @@ class LlamaServerModel(BaseModel):
         self.cache_prompt = cache_prompt
         self.session = requests.Session()
 
-    def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
-        """Generate completion via llama-server API."""
-        payload = {
+    def _payload(self, prompt: str, max_tokens: int, temperature: float) -> dict:
+        """Request body for /completion."""
+        return {
             "prompt": prompt,
             "n_predict": max_tokens,
             "temperature": temperature,
@@ -68,6 +97,10 @@ class LlamaServerModel(BaseModel):
             "repeat_penalty": 1.1,
             "repeat_last_n": 64,
         }
+
+    def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
+        """Generate completion via llama-server API."""
+        payload = self._payload(prompt, max_tokens, temperature)
         try:
             resp = self.session.post(
                 f"{self.base_url}/completion",
@@ -75,11 +108,52 @@ class LlamaServerModel(BaseModel):
                 timeout=300,
             )
             resp.raise_for_status()
-            return resp.json().get("content", "")
+            data = resp.json()
+            if "tokens_evaluated" in data:
+                self._record_usage(data.get("tokens_evaluated", 0), data.get("tokens_predicted", 0))
+            return data.get("content", "")
         except requests.RequestException as e:
             print(f"[LlamaServerModel] Request failed: {e}")
             return ""
 
+    def generate_stream(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> Iterator[str]:
+        """Stream a completion via server-sent events.
+
+        Closing the iterator closes the connection, which makes llama-server
+        stop decoding the request.
+        """
+        payload = self._payload(prompt, max_tokens, temperature)
+        payload["stream"] = True
+        try:
+            with self.session.post(
+                f"{self.base_url}/completion",
+                json=payload,
+                timeout=300,
+                stream=True,
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line.startswith(b"data: "):
+                        continue
+                    data = loads(line[len(b"data: "):])
+                    if data.get("content"):
+                        yield data["content"]
+                    if data.get("stop"):
+                        if "tokens_evaluated" in data:
+                            self._record_usage(data.get("tokens_evaluated", 0), data.get("tokens_predicted", 0))
+                        return
+        except requests.RequestException as e:
+            print(f"[LlamaServerModel] Request failed: {e}")
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the server's tokenizer (/tokenize), estimating on failure."""
+        try:
+            resp = self.session.post(f"{self.base_url}/tokenize", json={"content": text}, timeout=30)
+            resp.raise_for_status()
+            return len(resp.json().get("tokens", []))
+        except requests.RequestException:
+            return super().count_tokens(text)
+
     def health_check(self) -> bool:
         """Check if llama-server is healthy."""
         try:
@@ -419,6 +493,9 @@ class GGUFModel(BaseModel):
         self.n_gpu_layers = n_gpu_layers
         self.stop_tokens = stop_tokens or ["<|im_end|>", "<|endoftext|>"]
         self._llm = None
+        self._vocab = None  # vocab-only instance for count_tokens() without loading weights
+        # llama-cpp contexts are not thread-safe; parallel workflows share one model
+        self._lock = threading.Lock()
 
     def _load_model(self):
         """Lazy load llama-cpp-python model."""
@@ -438,17 +515,46 @@ class GGUFModel(BaseModel):
 
     def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
         """Generate text using llama-cpp-python."""
-        self._load_model()
-
-        output = self._llm(
-            prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            stop=self.stop_tokens,
-        )
+        with self._lock:
+            self._load_model()
+            output = self._llm(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=self.stop_tokens,
+            )
+        usage = output.get("usage")
+        if usage:
+            self._record_usage(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
         return output["choices"][0]["text"].strip()
 
+    def generate_stream(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> Iterator[str]:
+        """Stream text using llama-cpp-python (the model stays locked while streaming)."""
+        with self._lock:
+            self._load_model()
+            for chunk in self._llm(
+                prompt,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stop=self.stop_tokens,
+                stream=True,
+            ):
+                yield chunk["choices"][0]["text"]
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the model's own tokenizer (loads vocab only if needed)."""
+        with self._lock:
+            tokenizer = self._llm or self._vocab
+            if tokenizer is None:
+                try:
+                    from llama_cpp import Llama
+                except ImportError:
+                    return super().count_tokens(text)
+                self._vocab = tokenizer = Llama(model_path=self.model_path, vocab_only=True, verbose=False)
+            return len(tokenizer.tokenize(text.encode("utf-8"), add_bos=False))
+
     def close(self) -> None:
         """Release model."""
         self._llm = None
+        self._vocab = None
 
@@ -0,0 +1,343 @@
+"""
+Token-saving normalization of extracted PDF page text.
+
+PyMuPDF page text carries layout artifacts that every prompt pays for:
+running headers and footers, page numbers, words hyphenated across line
+breaks, hard-wrapped lines and padding whitespace. TextNormalizer removes
+them between extraction and prompting:
+
+- boilerplate: lines at the top/bottom of a page whose shape (case-folded,
+  digits as '#') repeats on many pages are found with a frequency index over
+  the whole book and dropped;
+- page numbers: "12", "- 12 -", "Page 12", "12 of 300", "xiv" at a page edge
+  (a bare roman numeral only as a whole lowercase line, and below 400);
+- de-hyphenation: "exam-" + "ple" -> "example" when the next line continues
+  in lowercase;
+- reflow: hard-wrapped lines (close to the page's line width) are joined into
+  paragraphs; short lines (headings, dialog lines) keep their break and blank
+  lines become paragraph breaks ("\\n\\n", what the splitters look for);
+- whitespace: runs of spaces/tabs collapse to one space, lines are stripped.
+
+Each NormalizedText keeps an offset map back to the page text it came from,
+so a span found in the normalized text (a quote, a name mention) can be
+located in the original.
+
+Usage:
+    normalizer = TextNormalizer().fit(pages)
+    normalized = [normalizer.normalize(page) for page in pages]
+    normalized[0].original_span(10, 42)
+    normalizer.stats.to_dict()  # chars/tokens before and after
+
+    python -m benchmark.normalize book.pdf other.pdf   # report tokens saved
+"""
+
+import argparse
+import re
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Iterable, Iterator, Optional
+
+# Pages read before the boilerplate index is built when pages are streamed
+FIT_SAMPLE_PAGES = 32
+
+_WORD_RE = re.compile(r"\S+")
+_DIGITS_RE = re.compile(r"\d+")
+# Roman numerals up to 399 (front matter); the lookahead rules out the empty
+# match, and leaving out m/d keeps words like "mix" and "did"
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:page\s+)?[-(\[]?\s*(?:\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?|"
+    r"(?=[clxvi])c{0,3}(?:xc|xl|l?x{0,3})(?:ix|iv|v?i{0,3}))\s*[-)\]]?$"
+)
+_ROMAN_ONLY_RE = re.compile(r"^[ivxlcdm]+$")
+_SENTENCE_END = ".!?:;\"')"
+
+
+def _line_key(line: str) -> str:
+    """Shape of an edge line: case-folded, digits as '#', whitespace collapsed."""
+    return _DIGITS_RE.sub("#", " ".join(line.lower().split()))
+
+
+def _is_page_number(line: str) -> bool:
+    """True for a line that is only a page number (roman numerals lowercase only)."""
+    stripped = line.strip()
+    if not stripped or not _PAGE_NUMBER_RE.match(stripped.lower()):
+        return False
+    if _ROMAN_ONLY_RE.match(stripped.lower()):
+        return stripped.islower()
+    return True
+
+
+class NormalizedText:
+    """Normalized text plus the map from its offsets to the original text."""
+
+    __slots__ = ("text", "original_length", "_starts", "_origins")
+
+    def __init__(self, text: str, original_length: int, starts: array, origins: array):
+        self.text = text
+        self.original_length = original_length
+        # Anchors: text[starts[k]:] continues original[origins[k]:] character
+        # for character until the next anchor
+        self._starts = starts
+        self._origins = origins
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def to_original(self, offset: int) -> int:
+        """Offset in the original text of the character at offset."""
+        if not self._starts:
+            return min(offset, self.original_length)
+        k = max(0, bisect_right(self._starts, offset) - 1)
+        return min(self._origins[k] + offset - self._starts[k], self.original_length)
+
+    def original_span(self, start: int, end: int) -> tuple[int, int]:
+        """Original (start, end) of the normalized span [start, end)."""
+        if end <= start:
+            origin = self.to_original(start)
+            return origin, origin
+        return self.to_original(start), self.to_original(end - 1) + 1
+
+
+@dataclass
+class NormalizationStats:
+    """Running totals of what normalization removed."""
+    pages: int = 0
+    chars_in: int = 0
+    chars_out: int = 0
+    boilerplate_lines: int = 0
+    page_numbers: int = 0
+    hyphens_joined: int = 0
+    lines_joined: int = 0
+
+    def to_dict(self, chars_per_token: int = 4) -> dict:
+        """Totals plus estimated tokens before/after (chars_per_token, like estimate_tokens)."""
+        tokens_in = self.chars_in // chars_per_token
+        tokens_out = self.chars_out // chars_per_token
+        return {
+            **asdict(self),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "tokens_saved": tokens_in - tokens_out,
+            "saved_pct": round(100 * (1 - self.chars_out / self.chars_in), 1) if self.chars_in else 0.0,
+        }
+
+
+class TextNormalizer:
+    """Removes page layout artifacts from extracted page text."""
+
+    def __init__(
+        self,
+        edge_lines: int = 3,
+        min_repeats: int = 3,
+        repeat_ratio: float = 0.4,
+        reflow_ratio: float = 0.75,
+        min_reflow_width: int = 40,
+    ):
+        """Create a normalizer.
+
+        Args:
+            edge_lines: Non-blank lines at the top and bottom of a page that
+                may be headers, footers or page numbers
+            min_repeats: Pages an edge line must appear on to be boilerplate
+            repeat_ratio: ... and the fraction of fitted pages it must appear on
+            reflow_ratio: A line at least this fraction of the page's widest
+                line is treated as hard-wrapped and joined with the next
+            min_reflow_width: Pages whose widest line is shorter are not
+                reflowed (verse, lists, picture-book captions)
+        """
+        self.edge_lines = edge_lines
+        self.min_repeats = min_repeats
+        self.repeat_ratio = repeat_ratio
+        self.reflow_ratio = reflow_ratio
+        self.min_reflow_width = min_reflow_width
+        self.boilerplate: set[str] = set()
+        self.fitted = False
+        self.stats = NormalizationStats()
+
+    # -------------------------------------------------------------------------
+    # Boilerplate index
+    # -------------------------------------------------------------------------
+
+    def _edge_candidates(self, lines: list[str]) -> list[str]:
+        """The first and last edge_lines non-blank lines of a page."""
+        content = [line for line in lines if line.strip()]
+        if len(content) <= 2 * self.edge_lines:
+            return content
+        return content[:self.edge_lines] + content[-self.edge_lines:]
+
+    def fit(self, pages: Iterable[str]) -> "TextNormalizer":
+        """Build the header/footer frequency index from a book's pages."""
+        counts: Counter = Counter()
+        num_pages = 0
+        for page in pages:
+            num_pages += 1
+            counts.update({_line_key(line) for line in self._edge_candidates(page.split("\n"))})
+        threshold = max(self.min_repeats, self.repeat_ratio * num_pages)
+        self.boilerplate = {key for key, count in counts.items() if count >= threshold}
+        self.fitted = True
+        return self
+
+    def _droppable(self, line: str) -> Optional[str]:
+        """Which artifact an edge line is ("boilerplate", "page_number") or None."""
+        if _is_page_number(line):
+            return "page_number"
+        if _line_key(line) in self.boilerplate:
+            return "boilerplate"
+        return None
+
+    # -------------------------------------------------------------------------
+    # Normalization
+    # -------------------------------------------------------------------------
+
+    def normalize(self, page: str) -> NormalizedText:
+        """Normalize one page (fit() first to enable boilerplate removal)."""
+        # (start offset, stripped line) for every line, blank lines as ""
+        lines: list[tuple[int, str]] = []
+        offset = 0
+        for raw in page.split("\n"):
+            stripped = raw.strip()
+            lines.append((offset + raw.find(stripped) if stripped else offset, stripped))
+            offset += len(raw) + 1
+
+        keep = [bool(text) for _, text in lines]
+        self._drop_edges(lines, keep, range(len(lines)))
+        self._drop_edges(lines, keep, range(len(lines) - 1, -1, -1))
+
+        kept = [i for i, k in enumerate(keep) if k]
+        width = max((len(lines[i][1]) for i in kept), default=0)
+        reflow = width >= self.min_reflow_width
+
+        pieces: list[str] = []
+        starts = array("i")
+        origins = array("i")
+        out_len = 0
+        previous = None  # index of the previous kept line
+        for i in kept:
+            origin, text = lines[i]
+            if previous is not None:
+                separator = self._separator(lines[previous][1], text, i - previous > 1, reflow, width)
+                if separator == "" and pieces[-1].endswith("-"):
+                    # "exam-" / "ple": drop the hyphen already written to the output
+                    pieces[-1] = pieces[-1][:-1]
+                    out_len -= 1
+                pieces.append(separator)
+                out_len += len(separator)
+            previous = i
+            out_len = self._append_line(text, origin, pieces, starts, origins, out_len)
+
+        text = "".join(pieces)
+        self.stats.pages += 1
+        self.stats.chars_in += len(page)
+        self.stats.chars_out += len(text)
+        return NormalizedText(text, len(page), starts, origins)
+
+    def _separator(self, prev_text: str, text: str, blank_between: bool, reflow: bool, width: int) -> str:
+        """What joins two kept lines: paragraph break, line break, space or nothing (hyphen)."""
+        if blank_between:
+            return "\n\n"
+        if not reflow:
+            return "\n"
+        if len(prev_text) > 1 and prev_text[-1] == "-" and prev_text[-2].isalpha() and text[:1].islower():
+            self.stats.hyphens_joined += 1
+            return ""
+        # A sentence ending clearly short of the margin ends its paragraph
+        if len(prev_text) >= self.reflow_ratio * width and not (
+            prev_text[-1] in _SENTENCE_END and len(prev_text) < 0.9 * width
+        ):
+            self.stats.lines_joined += 1
+            return " "
+        return "\n"
+
+    def _drop_edges(self, lines: list[tuple[int, str]], keep: list[bool], order: range) -> None:
+        """Drop boilerplate / page-number lines from one edge of the page inward."""
+        seen = 0
+        for i in order:
+            text = lines[i][1]
+            if not keep[i]:
+                continue  # blank, or already dropped from the other edge
+            kind = self._droppable(text)
+            if kind is None:
+                return
+            keep[i] = False
+            if kind == "boilerplate":
+                self.stats.boilerplate_lines += 1
+            else:
+                self.stats.page_numbers += 1
+            seen += 1
+            if seen == self.edge_lines:
+                return
+
+    @staticmethod
+    def _append_line(
+        text: str, origin: int, pieces: list[str], starts: array, origins: array, out_len: int
+    ) -> int:
+        """Append a stripped line with inner whitespace collapsed, extending the offset map."""
+        for match in _WORD_RE.finditer(text):
+            word_origin = origin + match.start()
+            if match.start():
+                pieces.append(" ")
+                out_len += 1
+            # A new anchor only where the offset shift changes
+            if not starts or origins[-1] - starts[-1] != word_origin - out_len:
+                starts.append(out_len)
+                origins.append(word_origin)
+            pieces.append(match.group())
+            out_len += len(match.group())
+        return out_len
+
+    def iter_normalized(self, pages: Iterable[str]) -> Iterator[NormalizedText]:
+        """Normalize a stream of pages, fitting on the first FIT_SAMPLE_PAGES if not fitted."""
+        pages = iter(pages)
+        sample: list[str] = []
+        if not self.fitted:
+            for page in pages:
+                sample.append(page)
+                if len(sample) == FIT_SAMPLE_PAGES:
+                    break
+            self.fit(sample)
+        for page in sample:
+            yield self.normalize(page)
+        for page in pages:
+            yield self.normalize(page)
+
+
+def normalize_pages(pages: list[str], normalizer: Optional[TextNormalizer] = None) -> list[NormalizedText]:
+    """Fit a normalizer on a book's pages and normalize each of them."""
+    normalizer = normalizer or TextNormalizer()
+    if not normalizer.fitted:
+        normalizer.fit(pages)
+    return [normalizer.normalize(page) for page in pages]
+
+
+def main() -> None:
+    """Report what normalization saves on each PDF."""
+    from .utils import extract_pdf_pages
+
+    parser = argparse.ArgumentParser(description="Report tokens saved by text normalization per book")
+    parser.add_argument("pdfs", nargs="+", help="PDF files")
+    parser.add_argument("--max-pages", type=int, default=None, help="Pages per book (default: all)")
+    parser.add_argument("--show", type=int, default=None, metavar="PAGE", help="Print one normalized page")
+    args = parser.parse_args()
+
+    print(f"{'book':<32} {'pages':>6} {'tokens in':>10} {'tokens out':>10} {'saved':>8} {'%':>6}"
+          f" {'hdr/ftr':>8} {'pg no':>6} {'hyph':>6} {'joined':>7}")
+    for pdf in args.pdfs:
+        normalizer = TextNormalizer()
+        pages = extract_pdf_pages(pdf, max_pages=args.max_pages)
+        normalized = normalize_pages(pages, normalizer)
+        s = normalizer.stats.to_dict()
+        name = pdf.replace("\\", "/").rsplit("/", 1)[-1][:32]
+        print(f"{name:<32} {s['pages']:>6} {s['tokens_in']:>10} {s['tokens_out']:>10} {s['tokens_saved']:>8}"
+              f" {s['saved_pct']:>6} {s['boilerplate_lines']:>8} {s['page_numbers']:>6}"
+              f" {s['hyphens_joined']:>6} {s['lines_joined']:>7}")
+        if args.show is not None and args.show < len(normalized):
+            print(normalized[args.show].text)
+
+
+if __name__ == "__main__":
+    main()
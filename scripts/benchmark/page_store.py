@@ -0,0 +1,196 @@
+"""
+Persistent store of extracted PDF text.
+
+Extraction results are cached on disk, keyed by the SHA-256 of the PDF content
+plus the extraction options, so repeat runs over the same book skip PyMuPDF
+entirely. Each entry is two files:
+
+    <key>.txt   page texts, UTF-8, concatenated
+    <key>.idx   int64 page count of the PDF, then byte offsets: page i is
+                txt[off[i]:off[i + 1]]
+
+An entry may hold only the first pages of the book: a run limited to
+--max-pages stores what it read, and a later run that needs more pages
+extracts just the missing ones and stores the longer prefix.
+
+Both are memory-mapped on load, so any page or page span is an O(1) slice of
+the mapping (page_bytes() returns a zero-copy memoryview; indexing decodes
+just that page).
+
+The cache directory defaults to ~/.cache/storyteller/pages and can be moved
+with the STORYTELLER_PAGE_CACHE environment variable (empty disables it).
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "storyteller" / "pages"
+CACHE_ENV_VAR = "STORYTELLER_PAGE_CACHE"
+
+_OFFSET_FORMAT = "q"
+# Bumped when the entry layout changes; entries of older layouts are misses
+_LAYOUT_VERSION = 2
+
+
+class CachedPages:
+    """Read-only page sequence backed by memory-mapped text and offset files."""
+
+    def __init__(self, text_path: Path, index_path: Path):
+        with open(index_path, "rb") as f:
+            self._index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = memoryview(self._index).cast(_OFFSET_FORMAT)
+        self.page_count = header[0]  # pages in the PDF; len(self) may be fewer
+        self._offsets = header[1:]
+        header.release()
+        size = self._offsets[-1] if len(self._offsets) else 0
+        # mmap cannot map empty files; an all-empty book keeps a bytes stand-in
+        with open(text_path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._view = memoryview(self._data)
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    @property
+    def complete(self) -> bool:
+        """True when every page of the PDF is stored."""
+        return len(self) >= self.page_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return str(self.page_bytes(index), "utf-8", "surrogatepass")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def page_bytes(self, index: int) -> memoryview:
+        """Zero-copy UTF-8 bytes of one page (valid until close())."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("page index out of range")
+        return self._view[self._offsets[index]:self._offsets[index + 1]]
+
+    def span(self, start: int, stop: int) -> str:
+        """Concatenated text of pages [start, stop) decoded from one slice."""
+        stop = min(stop, len(self))
+        if start >= stop:
+            return ""
+        return str(self._view[self._offsets[start]:self._offsets[stop]], "utf-8", "surrogatepass")
+
+    def close(self) -> None:
+        """Release the mappings."""
+        self._view.release()
+        self._offsets.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class PageStore:
+    """Directory of cached extractions keyed by PDF content hash and options."""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else DEFAULT_CACHE_DIR
+        # (path, size, mtime) -> content hash, so one run hashes each PDF once
+        self._hashes: dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def content_hash(self, pdf_path: str) -> str:
+        """SHA-256 of the PDF bytes (memoized per file size and mtime)."""
+        stat = os.stat(pdf_path)
+        memo_key = (str(Path(pdf_path).resolve()), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._hashes.get(memo_key)
+        if cached:
+            return cached
+        digest = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._hashes[memo_key] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def _paths(self, pdf_path: str, ascii_only: bool) -> tuple[Path, Path]:
+        key = f"{self.content_hash(pdf_path)}-{'ascii' if ascii_only else 'utf8'}-v{_LAYOUT_VERSION}"
+        return self.cache_dir / f"{key}.txt", self.cache_dir / f"{key}.idx"
+
+    def get(self, pdf_path: str, ascii_only: bool) -> Optional[CachedPages]:
+        """Open the cached extraction of a PDF, or None on a miss."""
+        text_path, index_path = self._paths(pdf_path, ascii_only)
+        if not index_path.is_file() or not text_path.is_file():
+            return None
+        try:
+            return CachedPages(text_path, index_path)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, pdf_path: str, ascii_only: bool, pages: list[str], page_count: Optional[int] = None) -> None:
+        """Store the first len(pages) pages of a PDF, in order.
+
+        Args:
+            page_count: Pages in the whole PDF (default: len(pages), a full extraction)
+        """
+        existing = self.get(pdf_path, ascii_only)
+        if existing is not None:
+            with existing:
+                if len(existing) >= len(pages):
+                    return  # never replace a longer prefix with a shorter one
+        text_path, index_path = self._paths(pdf_path, ascii_only)
+        encoded = [page.encode("utf-8", "surrogatepass") for page in pages]
+        offsets = [len(pages) if page_count is None else page_count, 0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+
+        # Write to temp names and rename, index last: a present index means a usable entry
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_text = text_path.with_name(text_path.name + suffix)
+        tmp_index = index_path.with_name(index_path.name + suffix)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp_text, "wb") as f:
+                f.writelines(encoded)
+            with open(tmp_index, "wb") as f:
+                f.write(struct.pack(f"{len(offsets)}{_OFFSET_FORMAT}", *offsets))
+            os.replace(tmp_text, text_path)
+            os.replace(tmp_index, index_path)
+        except OSError:
+            # The cache is an optimization; a read-only or full disk is not an error
+            for tmp in (tmp_text, tmp_index):
+                tmp.unlink(missing_ok=True)
+
+
+_default_store: Optional[PageStore] = None
+_default_store_configured = False
+
+
+def get_page_store() -> Optional[PageStore]:
+    """The process-wide store used by benchmark.utils (None when disabled)."""
+    global _default_store, _default_store_configured
+    if not _default_store_configured:
+        cache_dir = os.environ.get(CACHE_ENV_VAR)
+        _default_store = None if cache_dir == "" else PageStore(cache_dir)
+        _default_store_configured = True
+    return _default_store
+
+
+def set_page_store(store: Optional[PageStore]) -> None:
+    """Replace the process-wide store (None disables caching)."""
+    global _default_store, _default_store_configured
+    _default_store = store
+    _default_store_configured = True
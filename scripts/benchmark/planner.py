@@ -0,0 +1,339 @@
+"""
+Dry-run planner: estimate calls, tokens and wall time before a long run.
+
+The planner runs the chosen workflow against a PlanningModel that never calls
+an LLM. It synthesizes plausible responses (candidate names, quoted dialogs)
+from the prompt text so that per-character passes are planned too, and records
+every prompt the workflow would send. Prompt tokens are counted with the real
+tokenizer of the backend when one is available.
+
+Wall time is predicted from a ThroughputProfile: a least-squares fit of
+    seconds = overhead + prompt_tokens / prefill_tps + output_tokens / decode_tps
+over the calls of previous real runs with the same backend, plus the average
+output tokens per call for each pass. A real run adds its calls to the
+profile only when asked to (run_benchmark --update-profile).
+
+Usage:
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --update-profile
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --plan
+"""
+
+import json
+import os
+import re
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Optional
+
+from .models import BaseModel
+from .workflows import BaseWorkflow
+
+DEFAULT_PROFILES_FILE = "benchmark_profiles.json"
+
+# Used when no run of this backend has been recorded yet
+DEFAULT_OVERHEAD_S = 0.5
+DEFAULT_PREFILL_TPS = 400.0
+DEFAULT_DECODE_TPS = 15.0
+DEFAULT_OUTPUT_TOKENS = 200
+
+# Prompt signatures from prompts.PromptBuilder, used to fake matching responses
+_NAME_PROMPT = "character name extraction engine"
+_DIALOG_PROMPT = "dialog extraction engine"
+_BATCHED_PROMPT = "Story analysis engine"
+
+_NAME_STOPWORDS = {
+    "The", "A", "An", "He", "She", "It", "They", "We", "I", "You", "His", "Her", "Its",
+    "Their", "Our", "My", "Your", "This", "That", "These", "Those", "But", "And", "Or",
+    "So", "Then", "When", "What", "Where", "Why", "How", "Who", "If", "As", "At", "In",
+    "On", "Of", "To", "For", "With", "Chapter", "Part", "Yes", "No", "Oh", "Well",
+    "Mr", "Mrs", "Ms", "Dr", "Not", "All", "There", "Here", "Now", "Just",
+}
+
+
+def guess_character_names(text: str, min_count: int = 2) -> list[str]:
+    """Cheap capitalized-word heuristic for candidate character names."""
+    counts = Counter(
+        m.group(1) for m in re.finditer(r"\b([A-Z][a-z]+(?:\s[A-Z][a-z]+)?)\b", text)
+    )
+    return [
+        name for name, n in counts.most_common()
+        if n >= min_count and name.split()[0] not in _NAME_STOPWORDS
+    ]
+
+
+def guess_dialogs(text: str, names: list[str]) -> list[dict]:
+    """Quoted spans attributed to the nearest preceding candidate name."""
+    dialogs = []
+    for m in re.finditer(r"[\"“]([^\"”]{2,400})[\"”]", text):
+        window = text[max(0, m.start() - 200):m.start()]
+        speaker = next((n for n in names if n in window), "Unknown")
+        dialogs.append({"speaker": speaker, "text": m.group(1), "emotion": "neutral", "intensity": 0.5})
+    return dialogs
+
+
+def _prompt_text(prompt: str) -> str:
+    """The book text embedded in a prompt (after the last TEXT/Story Excerpt marker)."""
+    for marker in ("TEXT:\n", "Story Excerpt:\n"):
+        idx = prompt.rfind(marker)
+        if idx != -1:
+            return prompt[idx + len(marker):]
+    return ""
+
+
+class PlanningModel(BaseModel):
+    """Model stand-in that answers instantly with responses derived from the prompt."""
+
+    def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
+        """Return a synthesized response shaped like the requested pass output."""
+        text = _prompt_text(prompt)
+        if _NAME_PROMPT in prompt:
+            return json.dumps({"characters": guess_character_names(text)})
+        if _DIALOG_PROMPT in prompt:
+            return json.dumps({"dialogs": guess_dialogs(text, guess_character_names(text))})
+        if _BATCHED_PROMPT in prompt:
+            names = guess_character_names(text)
+            by_speaker: dict[str, list[str]] = {}
+            for d in guess_dialogs(text, names):
+                if d["speaker"] != "Unknown":
+                    by_speaker.setdefault(d["speaker"], []).append(d["text"])
+            return json.dumps({n: {"D": ds, "T": [], "V": ""} for n, ds in by_speaker.items()})
+        return "{}"
+
+    def close(self) -> None:
+        """Nothing to release."""
+        pass
+
+
+class ThroughputProfile:
+    """Per-backend latency model fitted from the calls of previous runs."""
+
+    def __init__(self, data: Optional[dict] = None):
+        data = data or {}
+        # Running sums for the least-squares fit over x = (1, prompt_tokens, output_tokens)
+        self.sums = data.get("sums", {"xx": [[0.0] * 3 for _ in range(3)], "xy": [0.0] * 3})
+        self.calls = data.get("calls", 0)
+        self.stage_output = data.get("stage_output", {})  # stage -> [calls, output_tokens]
+
+    def to_dict(self) -> dict:
+        return {"sums": self.sums, "calls": self.calls, "stage_output": self.stage_output}
+
+    def add_calls(self, call_log: list[dict]) -> None:
+        """Fold the call_log of a real run into the profile."""
+        for entry in call_log:
+            x = (1.0, float(entry["prompt_tokens"]), float(entry["output_tokens"]))
+            for i in range(3):
+                self.sums["xy"][i] += x[i] * entry["seconds"]
+                for j in range(3):
+                    self.sums["xx"][i][j] += x[i] * x[j]
+            stage = self.stage_output.setdefault(entry["stage"], [0, 0])
+            stage[0] += 1
+            stage[1] += entry["output_tokens"]
+            self.calls += 1
+
+    def coefficients(self) -> tuple[float, float, float]:
+        """Return (overhead_s, s_per_prompt_token, s_per_output_token)."""
+        default = (DEFAULT_OVERHEAD_S, 1 / DEFAULT_PREFILL_TPS, 1 / DEFAULT_DECODE_TPS)
+        if self.calls < 3:
+            return default
+        solved = _solve3(self.sums["xx"], self.sums["xy"])
+        if solved is None or solved[1] < 0 or solved[2] <= 0:
+            return default
+        return (max(0.0, solved[0]), solved[1], solved[2])
+
+    def output_tokens(self, stage: str) -> float:
+        """Average output tokens per call of a stage (all stages as fallback)."""
+        if stage in self.stage_output and self.stage_output[stage][0]:
+            calls, tokens = self.stage_output[stage]
+            return tokens / calls
+        calls = sum(c for c, _ in self.stage_output.values())
+        tokens = sum(t for _, t in self.stage_output.values())
+        return tokens / calls if calls else DEFAULT_OUTPUT_TOKENS
+
+    def predict_seconds(self, prompt_tokens: float, output_tokens: float, calls: int = 1) -> float:
+        overhead, per_prompt, per_output = self.coefficients()
+        return calls * overhead + prompt_tokens * per_prompt + output_tokens * per_output
+
+
+def _solve3(a: list[list[float]], b: list[float]) -> Optional[list[float]]:
+    """Solve a 3x3 linear system with Gaussian elimination (None if singular)."""
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(3):
+        pivot = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(3):
+            if r != col:
+                factor = m[r][col] / m[col][col]
+                m[r] = [v - factor * p for v, p in zip(m[r], m[col])]
+    return [m[i][3] / m[i][i] for i in range(3)]
+
+
+def load_profile(key: str, path: str = DEFAULT_PROFILES_FILE) -> ThroughputProfile:
+    """Load the throughput profile of a backend key (empty if none recorded)."""
+    profiles_path = Path(path)
+    if not profiles_path.is_file():
+        return ThroughputProfile()
+    try:
+        profiles = json.loads(profiles_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return ThroughputProfile()
+    return ThroughputProfile(profiles.get(key))
+
+
+def update_profile(key: str, call_log: list[dict], path: str = DEFAULT_PROFILES_FILE) -> None:
+    """Add a real run's calls to the stored profile of a backend key."""
+    if not call_log:
+        return
+    profiles_path = Path(path)
+    profiles = {}
+    if profiles_path.is_file():
+        try:
+            profiles = json.loads(profiles_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            profiles = {}
+    profile = ThroughputProfile(profiles.get(key))
+    profile.add_calls(call_log)
+    profiles[key] = profile.to_dict()
+    # Temp file + rename: a reader (or a crash mid-write) never sees a partial file
+    tmp_path = profiles_path.with_name(f"{profiles_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp_path.write_text(json.dumps(profiles, indent=2), encoding="utf-8")
+        os.replace(tmp_path, profiles_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def plan_workflow(
+    workflow: BaseWorkflow,
+    pdf_path: str,
+    profile: ThroughputProfile,
+    count_tokens: Optional[Callable[[str], int]] = None,
+    run_kwargs: Optional[dict] = None,
+) -> dict:
+    """Plan one workflow configuration without calling the model.
+
+    Args:
+        workflow: Workflow built around a PlanningModel
+        pdf_path: PDF to plan for
+        profile: Throughput profile of the target backend
+        count_tokens: Real tokenizer (default: the workflow's estimate)
+        run_kwargs: Keyword arguments for workflow.run()
+
+    Returns:
+        Plan dict with per-pass and total calls, tokens and predicted seconds
+    """
+    workflow.record_prompts = True
+    kwargs = dict(run_kwargs or {})
+    kwargs["max_workers"] = 1  # keep the prompt order deterministic
+    kwargs["verbose"] = False
+    result = workflow.run(pdf_path, **kwargs)
+
+    passes: dict[str, dict] = {}
+    for entry in workflow.call_log:
+        prompt_tokens = count_tokens(entry["prompt"]) if count_tokens else entry["prompt_tokens"]
+        stage = passes.setdefault(entry["stage"], {"calls": 0, "prompt_tokens": 0})
+        stage["calls"] += 1
+        stage["prompt_tokens"] += prompt_tokens
+
+    for name, stage in passes.items():
+        stage["output_tokens"] = round(profile.output_tokens(name) * stage["calls"])
+        stage["seconds"] = profile.predict_seconds(stage["prompt_tokens"], stage["output_tokens"], stage["calls"])
+
+    return {
+        "passes": passes,
+        "calls": sum(p["calls"] for p in passes.values()),
+        "prefill_tokens": sum(p["prompt_tokens"] for p in passes.values()),
+        "decode_tokens": sum(p["output_tokens"] for p in passes.values()),
+        "seconds": sum(p["seconds"] for p in passes.values()),
+        "characters_planned": len(result.characters),
+        "skipped_calls": result.metadata.get("skipped_calls", {}).get("total", 0),
+        "metadata": {k: v for k, v in result.metadata.items() if k.startswith("num_")},
+    }
+
+
+def plan_knobs(
+    make_workflow: Callable[[str], BaseWorkflow],
+    pdf_path: str,
+    profile: ThroughputProfile,
+    base_workflow: str,
+    base_kwargs: dict,
+    base_plan: dict,
+) -> list[dict]:
+    """Re-plan with one knob changed at a time and rank knobs by their effect.
+
+    Alternatives use the estimated token counts (no tokenizer round-trips),
+    scaled by the real/estimated ratio measured for the base plan.
+    """
+    variants = []
+    for workflow_name in ("batched", "2pass", "3pass", "5pass", "chapters"):
+        if workflow_name != base_workflow:
+            variants.append((f"workflow={workflow_name}", workflow_name, {}))
+    if base_workflow in ("batched", "2pass"):
+        size = base_kwargs.get("segment_size", 4000)
+        for factor in (0.5, 2):
+            variants.append((f"segment_size={int(size * factor)}", base_workflow, {"segment_size": int(size * factor)}))
+    else:
+        variants.append(("pack_tokens=0 (no page packing)", base_workflow, {"pack_tokens": 0}))
+        if base_kwargs.get("evidence") and base_kwargs["evidence"].enabled:
+            variants.append(("evidence thresholds off", base_workflow, {"evidence": _thresholds(False)}))
+        else:
+            variants.append(("evidence thresholds on (suggested)", base_workflow, {"evidence": _thresholds(True)}))
+    normalize = not base_kwargs.get("normalize")
+    variants.append((f"normalize={'on' if normalize else 'off'}", base_workflow, {"normalize": normalize}))
+
+    base_estimate = plan_workflow(make_workflow(base_workflow), pdf_path, profile, None, base_kwargs)
+    ratio = base_plan["prefill_tokens"] / base_estimate["prefill_tokens"] if base_estimate["prefill_tokens"] else 1.0
+
+    knobs = []
+    for label, workflow_name, overrides in variants:
+        plan = plan_workflow(make_workflow(workflow_name), pdf_path, profile, None, {**base_kwargs, **overrides})
+        prefill = plan["prefill_tokens"] * ratio
+        seconds = profile.predict_seconds(prefill, plan["decode_tokens"], plan["calls"])
+        knobs.append({
+            "knob": label,
+            "calls": plan["calls"],
+            "prefill_tokens": round(prefill),
+            "seconds": seconds,
+            "delta_seconds": seconds - base_plan["seconds"],
+        })
+    knobs.sort(key=lambda k: abs(k["delta_seconds"]), reverse=True)
+    return knobs
+
+
+def _thresholds(enabled: bool):
+    from .workflows import EvidenceThresholds
+    return EvidenceThresholds.suggested() if enabled else EvidenceThresholds()
+
+
+def format_plan(plan: dict, knobs: list[dict]) -> str:
+    """Human-readable plan report."""
+    lines = ["=" * 72, "DRY-RUN PLAN", "=" * 72]
+    lines.append(f"{'pass':<18}{'calls':>7}{'prefill tok':>14}{'decode tok':>13}{'est. time':>14}")
+    for name, p in plan["passes"].items():
+        lines.append(
+            f"{name:<18}{p['calls']:>7}{p['prompt_tokens']:>14}{p['output_tokens']:>13}{_fmt_s(p['seconds']):>14}"
+        )
+    lines.append("-" * 72)
+    lines.append(
+        f"{'total':<18}{plan['calls']:>7}{plan['prefill_tokens']:>14}{plan['decode_tokens']:>13}{_fmt_s(plan['seconds']):>14}"
+    )
+    lines.append(f"Throughput profile: {plan['profile']}")
+    if knobs:
+        lines.append("")
+        lines.append("Knobs ranked by effect on wall time:")
+        for k in knobs:
+            sign = "+" if k["delta_seconds"] >= 0 else "-"
+            lines.append(
+                f"  {k['knob']:<34} calls={k['calls']:<6} time={_fmt_s(k['seconds']):>10} ({sign}{_fmt_s(abs(k['delta_seconds']))})"
+            )
+    return "\n".join(lines)
+
+
+def _fmt_s(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds:.1f}s"
@@ -0,0 +1,195 @@
+"""
+Prompt token-diet tooling: template overhead and compact-prompt A/B checks.
+
+Template overhead is what a prompt costs before any book text, character
+name or trait is filled in. It is prefilled on every call, so it is measured
+per pass and per model type (chat wrappers differ) with the backend's own
+tokenizer when one is available.
+
+The A/B harness runs the same workflow on the same book with two prompt
+variants and scores both against an expected-results JSON (the
+SpaceStoryAnalysis.json format used by prompt_tester), so a compact
+template only replaces a full one if extraction F1 holds.
+
+Usage:
+    python -m benchmark.run_benchmark --prompt-overhead --model llama-server
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass \\
+        --ab-prompts book_expected.json
+"""
+
+import json
+from typing import Callable
+
+from .dialog_match import match_dialogs
+from .prompts import PROMPT_VARIANTS, PromptBuilder
+from .workflows import WorkflowResult
+
+MODEL_TYPES = ("chatml", "gemma", "qwen3", "qwen2")
+
+# Characters added by the workflows themselves, not extracted by a prompt
+_WORKFLOW_CHARACTERS = {"narrator"}
+
+
+# -----------------------------------------------------------------------------
+# Template overhead
+# -----------------------------------------------------------------------------
+
+def builder_templates(builder: PromptBuilder) -> dict[str, str]:
+    """Every pass prompt of a builder with all variable slots left empty."""
+    return {
+        "pass1 names": builder.build_pass1_prompt(""),
+        "pass2 traits": builder.build_pass2_trait_prompt("", ""),
+        "pass2.5 dialogs": builder.build_pass2_5_dialog_prompt("", []),
+        "pass3 personality": builder.build_pass3_personality_prompt("", []),
+        "pass4 voice": builder.build_pass4_voice_prompt("", []),
+        "pass3 traits+voice": builder.build_pass3_with_context_prompt("", ""),
+        "batched": builder.build_batched_analysis_prompt(""),
+    }
+
+
+def compare_templates(
+    count_tokens: Callable[[str], int], variants: dict[str, dict[str, str]], **labels
+) -> list[dict]:
+    """Token count of each template in every variant.
+
+    Args:
+        count_tokens: Tokenizer (model.count_tokens)
+        variants: Variant name -> {template name: empty-slot prompt}; the
+            first variant is the baseline savings are measured against
+        labels: Extra columns copied into every row (e.g. model_type)
+
+    Returns:
+        One row per template: labels, one token count per variant, and the
+        saved tokens / percent of the last variant against the first
+    """
+    names = list(variants)
+    rows = []
+    for template in variants[names[0]]:
+        row = {"template": template, **labels}
+        for name in names:
+            row[name] = count_tokens(variants[name][template])
+        baseline, candidate = row[names[0]], row[names[-1]]
+        row["saved"] = baseline - candidate
+        row["saved_pct"] = round(100 * (baseline - candidate) / baseline, 1) if baseline else 0.0
+        rows.append(row)
+    return rows
+
+
+def measure_overhead(
+    count_tokens: Callable[[str], int],
+    model_types=MODEL_TYPES,
+    variants: dict[str, type] = PROMPT_VARIANTS,
+) -> list[dict]:
+    """Template overhead of every pass for each model type and PromptBuilder variant."""
+    rows = []
+    for model_type in model_types:
+        templates = {name: builder_templates(cls(model_type)) for name, cls in variants.items()}
+        rows.extend(compare_templates(count_tokens, templates, model_type=model_type))
+    return rows
+
+
+def format_overhead(rows: list[dict]) -> str:
+    """Overhead rows as a text table."""
+    if not rows:
+        return "(no templates)"
+    fixed = {"template", "model_type", "saved", "saved_pct"}
+    variants = [k for k in rows[0] if k not in fixed]
+    header = f"{'template':<20} {'model':<8}" + "".join(f" {v:>9}" for v in variants) + f" {'saved':>7} {'%':>6}"
+    lines = ["Prompt template overhead (tokens per call, empty slots):", header]
+    for row in rows:
+        lines.append(
+            f"{row['template']:<20} {row.get('model_type', ''):<8}"
+            + "".join(f" {row[v]:>9}" for v in variants)
+            + f" {row['saved']:>7} {row['saved_pct']:>6}"
+        )
+    return "\n".join(lines)
+
+
+# -----------------------------------------------------------------------------
+# A/B extraction quality
+# -----------------------------------------------------------------------------
+
+def load_expected(path: str) -> tuple[list[str], list[tuple[str, str]]]:
+    """Expected characters and (speaker, text) dialogs of an analysis JSON."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    dialogs = [
+        (d["speaker"], d["text"])
+        for chapter in data.get("chapters", [])
+        for d in chapter.get("dialogs", [])
+    ]
+    return data.get("characters", []), dialogs
+
+
+def _prf(matches: int, found: int, expected: int) -> dict:
+    precision = matches / found if found else 0.0
+    recall = matches / expected if expected else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def score_result(result: WorkflowResult, expected: tuple[list[str], list[tuple[str, str]]]) -> dict:
+    """Character and dialog precision/recall/F1 of a workflow result (plus dialog speaker accuracy).
+
+    Dialogs are matched with prompt_tester's Evaluator rule (benchmark.dialog_match).
+    """
+    expected_names, expected_dialogs = expected
+    found_names = {c.name.lower().strip() for c in result.characters} - _WORKFLOW_CHARACTERS
+    wanted_names = {n.lower().strip() for n in expected_names}
+
+    dialogs = result.dialogs
+    found_dialogs = [(dialogs.speaker(row) or "", dialogs.text(row) or "") for row in range(len(dialogs))]
+    match = match_dialogs(found_dialogs, expected_dialogs)
+
+    return {
+        "characters": _prf(len(found_names & wanted_names), len(found_names), len(wanted_names)),
+        "dialogs": {**_prf(match.matches, match.extracted, match.expected),
+                    "speaker_accuracy": match.speaker_accuracy},
+    }
+
+
+def ab_compare(
+    run_variant: Callable[[str], tuple[WorkflowResult, dict]],
+    expected: tuple[list[str], list[tuple[str, str]]],
+    variants=("full", "compact"),
+    tolerance: float = 0.0,
+) -> dict:
+    """Run and score every prompt variant; the last one passes if no F1 drops by more than tolerance.
+
+    Args:
+        run_variant: Runs the workflow with a variant's PromptBuilder and
+            returns (result, workflow.call_summary())
+        expected: load_expected() output
+        variants: Variant names, baseline first
+        tolerance: Allowed F1 drop (absolute, 0.02 = two points)
+
+    Returns:
+        {"variants": {name: {scores, prompt_tokens, calls}}, "passed": bool}
+    """
+    report: dict = {"variants": {}, "tolerance": tolerance}
+    for name in variants:
+        result, calls = run_variant(name)
+        report["variants"][name] = {
+            **score_result(result, expected),
+            "prompt_tokens": sum(stage["prompt_tokens"] for stage in calls.values()),
+            "calls": sum(stage["calls"] for stage in calls.values()),
+        }
+    baseline, candidate = (report["variants"][variants[0]], report["variants"][variants[-1]])
+    report["passed"] = all(
+        candidate[kind]["f1"] >= baseline[kind]["f1"] - tolerance for kind in ("characters", "dialogs")
+    )
+    return report
+
+
+def format_ab(report: dict) -> str:
+    """A/B report as a text table with the verdict."""
+    lines = [f"{'variant':<10} {'char F1':>8} {'dialog F1':>10} {'speaker':>8} {'calls':>6} {'prompt tokens':>14}"]
+    for name, v in report["variants"].items():
+        lines.append(
+            f"{name:<10} {v['characters']['f1']:>8.1%} {v['dialogs']['f1']:>10.1%}"
+            f" {v['dialogs']['speaker_accuracy']:>8.1%} {v['calls']:>6} {v['prompt_tokens']:>14}"
+        )
+    verdict = "PASS" if report["passed"] else "FAIL"
+    lines.append(f"{verdict}: F1 within {report['tolerance']:.1%} of the baseline" if report["passed"]
+                 else f"{verdict}: F1 dropped by more than {report['tolerance']:.1%}")
+    return "\n".join(lines)
@@ -146,10 +146,15 @@ TEXT:
     # Pass 2.5: Dialog Extraction
     # -------------------------------------------------------------------------
 
-    def build_pass2_5_dialog_prompt(self, text: str, character_names: list[str], max_chars: int = 10000) -> str:
-        """Build Pass-2.5 prompt for dialog extraction."""
+    def build_pass2_5_dialog_prompt(
+        self, text: str, character_names: list[str], max_chars: int = 10000, max_names: int = 10
+    ) -> str:
+        """Build Pass-2.5 prompt for dialog extraction.
+
+        Packed prompts raise max_names so every page of the pack keeps its names.
+        """
         text = text[:max_chars]
-        chars_json = json.dumps(character_names[:10])
+        chars_json = json.dumps(character_names[:max_names])
 
         system = "You are a dialog extraction engine. Extract quoted speech and attribute it to the correct speaker. Output valid JSON only."
         user = f"""CHARACTERS ON THIS PAGE: {chars_json}
@@ -302,3 +307,98 @@ Story Excerpt:
 JSON:'''
         return self.build_chat_prompt(system, user)
 
+
+
+class CompactPromptBuilder(PromptBuilder):
+    """PromptBuilder with token-lean templates (same passes, output keys and signatures).
+
+    Every template states its rules once, shows the output format once, passes
+    list inputs once and drops JSON_REMINDER (the chat wrapper and the output
+    format already ask for JSON). Compare the two with
+    `run_benchmark --prompt-overhead` and `run_benchmark --ab-prompts`.
+    """
+
+    def build_pass1_prompt(self, text: str, max_chars: int = 10000) -> str:
+        """Build compact Pass-1 prompt for character name extraction."""
+        text = text[:max_chars]
+        system = "You are a character name extraction engine."
+        user = f"""RULES: list proper names written in the text (e.g. "Harry Potter", "Mr. Dursley") of characters who speak, act or are described here. No pronouns, descriptions (the boy), groups (the family), lone titles (Professor), guesses, or surnames split from a full name.
+OUTPUT: {{"characters": ["Name1", "Name2"]}}
+
+TEXT:
+{text}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_pass2_trait_prompt(self, character_name: str, text: str, max_chars: int = 6000) -> str:
+        """Build compact Pass-2 prompt for trait extraction."""
+        text = text[:max_chars]
+        system = f'You are a trait extraction engine for "{character_name}".'
+        user = f"""RULES: only traits of this character stated or shown in the text: physical ("red hair"), behavior ("spoke softly"), speech ("stutters"), emotion ("frightened"). No inferred personality, no other characters' traits; [] if none.
+OUTPUT: {{"character": "{character_name}", "traits": ["trait1", "trait2"]}}
+
+TEXT:
+{text}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_pass2_5_dialog_prompt(
+        self, text: str, character_names: list[str], max_chars: int = 10000, max_names: int = 10
+    ) -> str:
+        """Build compact Pass-2.5 prompt for dialog extraction."""
+        text = text[:max_chars]
+        chars_json = json.dumps(character_names[:max_names])
+        system = "You are a dialog extraction engine. Output valid JSON only."
+        user = f"""CHARACTERS: {chars_json}
+RULES: extract each quoted span ("..." or '...'). speaker: nearest name by "said X", "X said", "X:", else "Unknown". emotion: neutral|happy|sad|angry|surprised|fearful|excited|worried|curious|defiant. intensity: 0.0-1.0.
+OUTPUT: {{"dialogs": [{{"speaker": "Name", "text": "dialog", "emotion": "neutral", "intensity": 0.5}}]}}
+
+TEXT:
+{text}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_pass3_personality_prompt(self, character_name: str, traits: list[str]) -> str:
+        """Build compact Pass-3 prompt for personality inference (traits listed once)."""
+        system = f'You are a personality analysis engine. Infer the personality of "{character_name}" from ONLY these traits.'
+        user = f"""TRAITS: {json.dumps(traits)}
+RULES: synthesize 3-5 personality points.
+OUTPUT: {{"character": "{character_name}", "personality": ["point1", "point2", "point3"]}}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_pass4_voice_prompt(self, character_name: str, personality: list[str]) -> str:
+        """Build compact Pass-4 prompt for voice profile suggestion (personality listed once)."""
+        system = f'You are a voice casting director. Suggest a voice profile for "{character_name}" from ONLY this personality.'
+        user = f"""PERSONALITY: {json.dumps(personality)}
+OUTPUT: {{"character": "{character_name}", "voice_profile": {{"pitch": 1.0, "speed": 1.0, "energy": 1.0, "gender": "male|female|neutral", "age": "young|middle-aged|elderly", "tone": "description", "accent": "neutral"}}}}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_pass3_with_context_prompt(self, character_name: str, context: str, max_chars: int = 10000) -> str:
+        """Build compact Pass-3 prompt with aggregated context for traits + voice profile."""
+        context = context[:max_chars]
+        system = "You are a character analyst for TTS voice casting. JSON only."
+        user = f"""CHARACTER: "{character_name}"
+
+TEXT:
+{context}
+
+RULES: traits of 1-2 words (e.g. "gravelly voice", "dry humor"). speaker_id (VCTK 0-108): female young 10-30, adult 31-50; male young 51-70, adult 71-90; elderly/character 91-108.
+OUTPUT: {{"character": "{character_name}", "traits": ["trait1", "trait2"], "voice_profile": {{"pitch": 1.0, "speed": 1.0, "energy": 0.7, "gender": "male|female", "age": "child|young|middle-aged|elderly", "tone": "brief description", "speaker_id": 45}}}}"""
+        return self.build_chat_prompt(system, user)
+
+    def build_batched_analysis_prompt(self, text: str, max_chars: int = 14800) -> str:
+        """Build compact batched analysis prompt (same {"Name": {"D", "T", "V"}} output)."""
+        text = text[:max_chars]
+        system = "You are a Story analysis engine. Output one complete, valid JSON object."
+        user = f'''List each character with quoted dialogs in the Story excerpt exactly once (not places, objects or creatures that don't speak):
+D: their exact quoted dialogs, attributed by name and pronouns
+T: traits stated in the story
+V: "Gender,Age,Accent,Pitch,Speed" with male|female, child|young|middle-aged|elderly, neutral|british|american|asian, pitch 0.5-1.5, speed 0.5-2.0, inferred from the traits
+OUTPUT: {{"Name1": {{"D": ["dialog", "next dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}}, "Name2": {{"D": ["dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}}}}
+
+Story Excerpt:
+{text}
+
+JSON:'''
+        return self.build_chat_prompt(system, user)
+
+
+# Prompt template variants selectable by workflows (run_benchmark --compact-prompts)
+PROMPT_VARIANTS = {"full": PromptBuilder, "compact": CompactPromptBuilder}
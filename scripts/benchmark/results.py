@@ -0,0 +1,380 @@
+"""
+Compact, column-oriented storage for extracted dialogs.
+
+A long book yields tens of thousands of dialogs. Rather than one dict per
+dialog (each holding its own copies of the speaker, emotion and text strings),
+WorkflowResult keeps a DialogTable:
+
+- one array column per numeric field (speaker id, page, segment, chapter id,
+  emotion code, intensity);
+- speaker, emotion and chapter names interned once per table;
+- dialog text stored as a (source, start, end) span into the page or segment
+  text it was quoted from whenever it occurs there verbatim, and only copied
+  when the model paraphrased it.
+
+Paged workflows call record_page_spans() before that, so each dialog
+quoted verbatim from a page also reports its [start, end) offsets in that
+page ("span"), in the original page text even when the pages were
+normalized (normalize.NormalizedText offset maps).
+
+Once a run is done, compact() either rebinds the spans to the memory-mapped
+page store entry of the book (off-heap) or packs every text into one string,
+so the result never keeps the run's page list alive.
+
+CharacterResult holds a DialogView, which is just the row numbers of that
+character's dialogs. Dicts are only built when a result is serialized.
+
+Usage:
+    table = DialogTable(pages)
+    table.append({"speaker": "Harry", "text": "Hello"}, page=3, source=3)
+    table.map_speakers(lambda name: aliases.get(name, name))
+    table.record_page_spans()
+    table.compact(page_store.get(pdf_path, ascii_only=True))
+    harry = table.by_speaker()["Harry"]
+    json.dumps(table.to_dicts())
+"""
+
+import sys
+from array import array
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+_NONE = -1  # missing value in id / int columns
+_OWNED = -1  # text source: text kept in the table's own list
+_NO_TEXT = -2  # text source: the dialog had no text
+_ARENA = -3  # text source: span of the table's packed text (after compact())
+_MISSING = object()
+
+
+class _Interner:
+    """Bidirectional name <-> small int mapping."""
+
+    __slots__ = ("names", "ids")
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        index = self.ids.get(name)
+        if index is None:
+            index = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+class DialogTable:
+    """Append-only table of dialogs stored as parallel array columns."""
+
+    def __init__(self, sources: Optional[Sequence[str]] = None):
+        """Create an empty table.
+
+        Args:
+            sources: Texts dialogs are quoted from (pages or segments); a
+                dialog appended with source=i is stored as a span of
+                sources[i] when its text occurs there verbatim
+        """
+        self.sources = sources if sources is not None else []
+        self._speakers = _Interner()
+        self._emotions = _Interner()
+        self._chapters = _Interner()
+        self._speaker = array("i")
+        self._emotion = array("i")
+        self._intensity = array("d")
+        self._page = array("i")
+        self._segment = array("i")
+        self._chapter = array("i")
+        self._text_source = array("i")
+        self._text_start = array("i")  # offset into the source, or index into _owned
+        self._text_end = array("i")
+        self._owned: list[str] = []
+        self._arena = ""
+        self._extra: dict[int, dict] = {}  # row -> fields without a column (rare)
+        # Offsets into the original page text per row (record_page_spans)
+        self._span_start: Optional[array] = None
+        self._span_end: Optional[array] = None
+
+    def __len__(self) -> int:
+        return len(self._speaker)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(len(self)))]
+        return self.row(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(len(self)):
+            yield self.row(i)
+
+    # -------------------------------------------------------------------------
+    # Appending
+    # -------------------------------------------------------------------------
+
+    def append(
+        self,
+        dialog: Any,
+        page: Optional[int] = None,
+        segment: Optional[int] = None,
+        chapter: Optional[str] = None,
+        source: Optional[int] = None,
+    ) -> int:
+        """Add a dialog dict as parsed from a model response.
+
+        Args:
+            dialog: {"speaker", "text", "emotion", "intensity", ...}; anything
+                that is not a dict is ignored
+            page, segment, chapter: Attribution set by the workflow
+                (override keys of the same name in dialog)
+            source: Index into sources the text was quoted from
+
+        Returns:
+            The new row number, or -1 if dialog was not a dict
+        """
+        if not isinstance(dialog, dict):
+            return -1
+        row = len(self._speaker)
+        values = dict(dialog)
+        if page is not None:
+            values["page"] = page
+        if segment is not None:
+            values["segment"] = segment
+        if chapter is not None:
+            values["chapter"] = chapter
+
+        extra: dict = {}
+        self._speaker.append(self._name_id(self._speakers, "speaker", values, extra))
+        self._append_text(values.pop("text", _MISSING), source, extra)
+        self._emotion.append(self._name_id(self._emotions, "emotion", values, extra))
+        intensity = values.pop("intensity", _MISSING)
+        if isinstance(intensity, float) and intensity == intensity:
+            self._intensity.append(intensity)
+        else:
+            self._intensity.append(float("nan"))
+            if intensity is not _MISSING:
+                extra["intensity"] = intensity
+        self._page.append(self._int_value("page", values, extra))
+        self._segment.append(self._int_value("segment", values, extra))
+        self._chapter.append(self._name_id(self._chapters, "chapter", values, extra))
+
+        extra.update(values)
+        if extra:
+            self._extra[row] = extra
+        return row
+
+    def extend(self, dialogs, **kwargs) -> None:
+        """append() every dialog with the same attribution keywords."""
+        for dialog in dialogs:
+            self.append(dialog, **kwargs)
+
+    @staticmethod
+    def _name_id(interner: _Interner, key: str, values: dict, extra: dict) -> int:
+        value = values.pop(key, _MISSING)
+        if isinstance(value, str):
+            return interner.id(value)
+        if value is not _MISSING:
+            extra[key] = value
+        return _NONE
+
+    @staticmethod
+    def _int_value(key: str, values: dict, extra: dict) -> int:
+        value = values.pop(key, _MISSING)
+        if type(value) is int and _NONE < value < 2 ** 31:
+            return value
+        if value is not _MISSING:
+            extra[key] = value
+        return _NONE
+
+    def _append_text(self, text: Any, source: Optional[int], extra: dict) -> None:
+        if not isinstance(text, str):
+            self._text_source.append(_NO_TEXT)
+            self._text_start.append(0)
+            self._text_end.append(0)
+            if text is not _MISSING:
+                extra["text"] = text
+            return
+        if text and source is not None and 0 <= source < len(self.sources):
+            start = self.sources[source].find(text)
+            if start >= 0:
+                self._text_source.append(source)
+                self._text_start.append(start)
+                self._text_end.append(start + len(text))
+                return
+        self._text_source.append(_OWNED)
+        self._text_start.append(len(self._owned))
+        self._text_end.append(0)
+        self._owned.append(text)
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+
+    def speaker(self, row: int) -> Optional[str]:
+        speaker_id = self._speaker[row]
+        return self._speakers.names[speaker_id] if speaker_id != _NONE else None
+
+    def text(self, row: int) -> Optional[str]:
+        source = self._text_source[row]
+        if source == _NO_TEXT:
+            return None
+        if source == _OWNED:
+            return self._owned[self._text_start[row]]
+        if source == _ARENA:
+            return self._arena[self._text_start[row]:self._text_end[row]]
+        return self.sources[source][self._text_start[row]:self._text_end[row]]
+
+    def page(self, row: int) -> Optional[int]:
+        page = self._page[row]
+        return page if page != _NONE else None
+
+    def row(self, row: int) -> dict:
+        """Materialize one dialog as a dict (the shape the model emitted plus attribution)."""
+        if row < 0:
+            row += len(self)
+        d: dict = {}
+        speaker_id = self._speaker[row]
+        if speaker_id != _NONE:
+            d["speaker"] = self._speakers.names[speaker_id]
+        if self._text_source[row] != _NO_TEXT:
+            d["text"] = self.text(row)
+        emotion = self._emotion[row]
+        if emotion != _NONE:
+            d["emotion"] = self._emotions.names[emotion]
+        intensity = self._intensity[row]
+        if intensity == intensity:
+            d["intensity"] = intensity
+        if self._page[row] != _NONE:
+            d["page"] = self._page[row]
+        if self._segment[row] != _NONE:
+            d["segment"] = self._segment[row]
+        if self._chapter[row] != _NONE:
+            d["chapter"] = self._chapters.names[self._chapter[row]]
+        if self._span_start is not None and row < len(self._span_start) and self._span_start[row] != _NONE:
+            d["span"] = [self._span_start[row], self._span_end[row]]
+        extra = self._extra.get(row)
+        if extra:
+            d.update(extra)
+        return d
+
+    def to_dicts(self) -> list[dict]:
+        """All dialogs as dicts, for JSON output."""
+        return [self.row(i) for i in range(len(self))]
+
+    def record_page_spans(self, maps: Optional[Sequence] = None) -> None:
+        """Keep the offsets of every span row so row() reports them as "span".
+
+        Call before compact(), while spans still index the sources (pages).
+
+        Args:
+            maps: Offset map per source (normalize.NormalizedText) when the
+                sources are normalized page texts; spans are then reported
+                as offsets into the original page text
+        """
+        starts, ends = array("i"), array("i")
+        for row, source in enumerate(self._text_source):
+            if source >= 0:
+                start, end = self._text_start[row], self._text_end[row]
+                if maps is not None:
+                    start, end = maps[source].original_span(start, end)
+            else:
+                start = end = _NONE
+            starts.append(start)
+            ends.append(end)
+        self._span_start, self._span_end = starts, ends
+
+    def compact(self, sources: Optional[Sequence[str]] = None) -> None:
+        """Release the texts the table was built against.
+
+        Args:
+            sources: Equivalent texts to keep spans into (e.g. the page store's
+                CachedPages for the same book, which lives outside the heap).
+                When None, span texts are copied and the old sources dropped.
+                Either way, copied texts are packed into one string.
+        """
+        parts = [self._arena]
+        size = len(self._arena)
+        for row, source in enumerate(self._text_source):
+            if source == _OWNED:
+                text = self._owned[self._text_start[row]]
+            elif source >= 0 and sources is None:
+                text = self.sources[source][self._text_start[row]:self._text_end[row]]
+            else:
+                continue
+            parts.append(text)
+            self._text_source[row] = _ARENA
+            self._text_start[row] = size
+            size += len(text)
+            self._text_end[row] = size
+        self._arena = "".join(parts)
+        self._owned = []
+        self.sources = sources if sources is not None else []
+
+    # -------------------------------------------------------------------------
+    # Speakers
+    # -------------------------------------------------------------------------
+
+    def map_speakers(self, resolve: Callable[[str], str]) -> None:
+        """Rename speakers (e.g. alias -> canonical); resolve runs once per distinct name."""
+        renamed = _Interner()
+        new_ids = [renamed.id(resolve(name)) for name in self._speakers.names]
+        self._speaker = array("i", [new_ids[s] if s != _NONE else _NONE for s in self._speaker])
+        self._speakers = renamed
+
+    def by_speaker(self) -> dict[str, "DialogView"]:
+        """Group rows by speaker name in one pass (rows keep table order)."""
+        groups = [array("i") for _ in self._speakers.names]
+        for row, speaker_id in enumerate(self._speaker):
+            if speaker_id != _NONE:
+                groups[speaker_id].append(row)
+        return {
+            name: DialogView(self, rows)
+            for name, rows in zip(self._speakers.names, groups)
+        }
+
+    def for_speaker(self, name: str) -> "DialogView":
+        """Rows spoken by one speaker."""
+        speaker_id = self._speakers.ids.get(name, _NONE)
+        if speaker_id == _NONE:
+            return DialogView(self)
+        return DialogView(self, array("i", [r for r, s in enumerate(self._speaker) if s == speaker_id]))
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the table (excluding the shared sources)."""
+        columns = (
+            self._speaker, self._emotion, self._intensity, self._page, self._segment,
+            self._chapter, self._text_source, self._text_start, self._text_end,
+        ) + tuple(c for c in (self._span_start, self._span_end) if c is not None)
+        size = sum(sys.getsizeof(c) for c in columns)
+        size += sys.getsizeof(self._owned) + sys.getsizeof(self._arena)
+        size += sum(sys.getsizeof(t) for t in self._owned)
+        for interner in (self._speakers, self._emotions, self._chapters):
+            size += sys.getsizeof(interner.ids) + sum(sys.getsizeof(n) for n in interner.names)
+        return size + sum(sys.getsizeof(e) for e in self._extra.values())
+
+
+class DialogView:
+    """A subset of a DialogTable's rows (e.g. one character's dialogs)."""
+
+    __slots__ = ("table", "rows")
+
+    def __init__(self, table: Optional[DialogTable] = None, rows: Optional[array] = None):
+        self.table = table
+        self.rows = rows if rows is not None else array("i")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return DialogView(self.table, self.rows[index])
+        return self.table.row(self.rows[index])
+
+    def __iter__(self) -> Iterator[dict]:
+        for row in self.rows:
+            yield self.table.row(row)
+
+    def texts(self) -> Iterator[str]:
+        """Dialog texts without building dicts ("" for dialogs without text)."""
+        for row in self.rows:
+            yield self.table.text(row) or ""
+
+    def to_dicts(self) -> list[dict]:
+        return [self.table.row(row) for row in self.rows]
@@ -14,6 +14,29 @@ Usage:
     python -m benchmark.run_benchmark --pdf book.pdf --workflow 5pass --model gguf \\
         --model-path path/to/model.gguf
 
+    # Dry run: predicted calls, tokens and wall time without calling the model
+    # (from the throughput profile recorded by earlier runs with --update-profile)
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --update-profile
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --plan
+
+    # Stream the result as JSON Lines (characters as they finish, then dialogs)
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --format jsonl -o result.jsonl
+
+    # Template tokens per pass, then check compact prompts keep extraction F1
+    python -m benchmark.run_benchmark --prompt-overhead --model llama-server
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --ab-prompts expected.json
+
+    # Latency distributions over 10 warm iterations after 2 warmup (cold) ones; compare two summaries
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --repeat 10 --warmup 2 -o a.json
+    python -m benchmark.stats compare a.json b.json
+
+    # Fail on a significant slowdown vs the median of the last 5 runs (same model, PDF, workflow, settings)
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --gate
+
+    # Batch of books sharing one warm model
+    python -m benchmark.run_benchmark --batch books/ --output-dir results/ --model gguf \\
+        --model-path path/to/model.gguf
+
 For LiteRT models, see scripts/benchmark/TROUBLESHOOTING.md for common issues.
 """
 
@@ -21,11 +44,36 @@ import argparse
 import json
 import sys
 import time
+from contextlib import nullcontext
+from dataclasses import asdict
 from pathlib import Path
 
+from .batch import load_books, run_batch
+from .gate import (
+    DEFAULT_GATE_RUNS,
+    DEFAULT_GATE_TOLERANCE,
+    check_regressions,
+    config_fingerprint,
+    format_gate,
+    run_perf,
+)
+from .history import DEFAULT_HISTORY_DB, HistoryStore
 from .models import BaseModel, GGUFModel, LlamaServerModel, LiteRTModel
-from .prompts import PromptBuilder
-from .workflows import BatchedWorkflow, FivePassWorkflow, ThreePassWorkflow, TwoPassWorkflow, WorkflowResult
+from .page_store import set_page_store
+from .planner import PlanningModel, format_plan, load_profile, plan_knobs, plan_workflow, update_profile
+from .prompt_diet import ab_compare, format_ab, format_overhead, load_expected, measure_overhead
+from .prompts import PROMPT_VARIANTS
+from .stats import DEFAULT_RESAMPLES, format_summary, summarize_runs
+from .writer import FORMATS, ResultWriter
+from .workflows import (
+    BatchedWorkflow,
+    ChapterWorkflow,
+    FivePassWorkflow,
+    ThreePassWorkflow,
+    TwoPassWorkflow,
+    EvidenceThresholds,
+    WorkflowResult,
+)
 
 
 def validate_litert_args(args) -> None:
@@ -122,20 +170,200 @@ def create_model(args) -> BaseModel:
         sys.exit(1)
 
 
-def create_workflow(args, model: BaseModel):
-    """Create workflow instance based on arguments."""
-    prompt_builder = PromptBuilder(args.model_type)
+def create_workflow(args, model: BaseModel, workflow: str = None, prompts: str = None):
+    """Create workflow instance based on arguments (or an explicit workflow / prompt variant)."""
+    prompts = prompts or ("compact" if args.compact_prompts else "full")
+    prompt_builder = PROMPT_VARIANTS[prompts](args.model_type)
+    workflow = workflow or args.workflow
 
-    if args.workflow == "batched":
+    if workflow == "batched":
         return BatchedWorkflow(model, prompt_builder)
-    elif args.workflow == "2pass":
+    elif workflow == "2pass":
         return TwoPassWorkflow(model, prompt_builder)
-    elif args.workflow == "3pass":
+    elif workflow == "3pass":
         return ThreePassWorkflow(model, prompt_builder)
-    elif args.workflow == "5pass":
+    elif workflow == "5pass":
         return FivePassWorkflow(model, prompt_builder)
+    elif workflow == "chapters":
+        return ChapterWorkflow(model, prompt_builder)
     else:
-        raise ValueError(f"Unknown workflow: {args.workflow}")
+        raise ValueError(f"Unknown workflow: {workflow}")
+
+
+def build_run_kwargs(args) -> dict:
+    """Keyword arguments passed to workflow.run() for the parsed CLI options."""
+    return {
+        "max_pages": args.max_pages,
+        "segment_size": args.segment_size,
+        "max_segments": args.max_segments,
+        "pack_tokens": args.pack_tokens,
+        "context_size": args.context_size,
+        "max_workers": args.workers,
+        "merge_processes": args.merge_processes,
+        "normalize": args.normalize,
+        "evidence": EvidenceThresholds(
+            min_dialogs=args.min_dialogs,
+            min_mentions=args.min_mentions,
+            min_pages=args.min_pages,
+        ),
+        "verbose": args.verbose,
+    }
+
+
+def run_config(args) -> dict:
+    """Settings a run's performance depends on besides model, PDF and workflow."""
+    run_kwargs = build_run_kwargs(args)
+    run_kwargs.pop("verbose")
+    return {
+        "prompt_version": "compact" if args.compact_prompts else "full",
+        "temperature": args.temperature,
+        "max_tokens": args.max_tokens,
+        "page_cache": not args.no_page_cache,
+        **run_kwargs,
+        "evidence": asdict(run_kwargs["evidence"]),
+    }
+
+
+def history_record(args, pdf_path: Path) -> dict:
+    """History record of a run (benchmark.history); timing, tokens and perf are added after it."""
+    config = run_config(args)
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "model_name": profile_key(args),
+        "prompt_version": config["prompt_version"],
+        "mode": args.workflow,
+        "pdf": str(pdf_path.resolve()),
+        "config": config,
+        "config_hash": config_fingerprint(config),
+    }
+
+
+def profile_key(args) -> str:
+    """Throughput profile key: backend, prompt format, model file/server and device."""
+    location = args.server_url if args.model == "llama-server" else str(args.model_path)
+    backend = args.backend if args.model == "litert" else ""
+    return "|".join([args.model, args.model_type, location, backend])
+
+
+def create_tokenizer_model(args) -> BaseModel:
+    """Model used only for count_tokens() in --plan (no generation, no weights loaded)."""
+    if args.model == "llama-server":
+        return create_model(args)
+    if args.model == "gguf" and args.model_path and Path(args.model_path).is_file():
+        return create_model(args)
+    # LiteRT has no tokenizer endpoint: fall back to the estimate
+    return PlanningModel()
+
+
+def run_plan_mode(args) -> None:
+    """Print the dry-run plan for --pdf without calling the model."""
+    profile = load_profile(profile_key(args), args.profiles)
+    run_kwargs = build_run_kwargs(args)
+    make_workflow = lambda name: create_workflow(args, PlanningModel(), name)
+
+    with create_tokenizer_model(args) as tokenizer:
+        plan = plan_workflow(
+            make_workflow(args.workflow), args.pdf, profile, tokenizer.count_tokens, run_kwargs
+        )
+    plan["profile"] = (
+        f"{profile.calls} recorded calls" if profile.calls else "defaults (no recorded runs)"
+    )
+    knobs = plan_knobs(make_workflow, args.pdf, profile, args.workflow, run_kwargs, plan)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({**plan, "knobs": knobs}, indent=2), encoding="utf-8")
+    print(format_plan(plan, knobs))
+
+
+def run_overhead_mode(args) -> None:
+    """Print the template overhead of every pass, model type and prompt variant."""
+    with create_tokenizer_model(args) as tokenizer:
+        rows = measure_overhead(tokenizer.count_tokens)
+    if args.output:
+        Path(args.output).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+    print(format_overhead(rows))
+
+
+def run_ab_mode(args) -> None:
+    """Run --pdf with the full and the compact prompts and compare extraction F1."""
+    expected = load_expected(args.ab_prompts)
+
+    def run_variant(prompts: str):
+        with create_model(args) as model:
+            workflow = create_workflow(args, model, prompts=prompts)
+            result = workflow.run(args.pdf, **build_run_kwargs(args))
+            return result, workflow.call_summary()
+
+    report = ab_compare(run_variant, expected, tolerance=args.ab_tolerance)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(format_ab(report))
+    if not report["passed"]:
+        sys.exit(1)
+
+
+def run_repeat_mode(args, pdf_path: Path) -> None:
+    """Run --pdf --warmup + --repeat times on one loaded model and summarize the latencies.
+
+    Every iteration gets a fresh workflow; the model and the page cache stay
+    warm across iterations, which is what the warmup iterations absorb.
+    """
+    iterations = []
+    with create_model(args) as model:
+        for i in range(args.warmup + args.repeat):
+            workflow = create_workflow(args, model)
+            t0 = time.perf_counter()
+            result = workflow.run(str(pdf_path), **build_run_kwargs(args))
+            total = time.perf_counter() - t0
+            iterations.append({
+                "total": total,
+                "passes": {name: seconds for name, seconds in result.timing.items() if name != "total"},
+                "calls": [{"stage": c["stage"], "seconds": c["seconds"]} for c in workflow.call_log],
+            })
+            if args.verbose:
+                phase = "warmup" if i < args.warmup else "run"
+                print(f"[{phase} {i + 1}/{args.warmup + args.repeat}] {total:.2f}s, {len(workflow.call_log)} calls")
+
+    config = {
+        "workflow": args.workflow,
+        "model": profile_key(args),
+        "pdf": str(pdf_path.resolve()),
+        **run_config(args),
+    }
+    summary = summarize_runs(iterations, args.warmup, config, resamples=args.resamples)
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    print(format_summary(summary))
+
+
+def run_batch_mode(args) -> None:
+    """Run every book of --batch through one warm model pool."""
+    books = load_books(args.batch)
+    if not books:
+        print(f"ERROR: No PDFs found in batch source: {args.batch}", file=sys.stderr)
+        sys.exit(1)
+    output_dir = args.output_dir or "batch_results"
+
+    models = [create_model(args) for _ in range(max(1, args.pool_size))]
+    try:
+        report = run_batch(
+            books,
+            models,
+            workflow_factory=lambda model: create_workflow(args, model),
+            output_dir=output_dir,
+            run_kwargs=build_run_kwargs(args),
+            max_active_books=args.max_active_books,
+            verbose=args.verbose,
+            output_format=args.format,
+        )
+    finally:
+        for model in models:
+            model.close()
+
+    print(f"Books: {report['completed']}/{report['books']} completed")
+    print(f"Wall time: {report['wall_seconds']:.1f}s")
+    print(f"Throughput: {report['books_per_hour']:.2f} books/hour, {report['pages_per_min']:.2f} pages/min")
+    print(f"Report written to: {Path(output_dir) / 'batch_report.json'}")
 
 
 def main():
@@ -162,13 +390,25 @@ For LiteRT troubleshooting, see scripts/benchmark/TROUBLESHOOTING.md
 
     # Required arguments (pdf is required unless using utility commands)
     parser.add_argument("--pdf", help="Path to PDF file (required for benchmarking)")
+    parser.add_argument(
+        "--batch",
+        help="Directory of PDFs or manifest (JSON list / one path per line) to run as one batch",
+    )
+
+    parser.add_argument(
+        "--no-page-cache",
+        action="store_true",
+        help="Always re-extract PDF text instead of reading the extracted-text cache "
+             "(default location: ~/.cache/storyteller/pages, see STORYTELLER_PAGE_CACHE)",
+    )
 
     # Workflow selection
     parser.add_argument(
         "--workflow",
-        choices=["batched", "2pass", "3pass", "5pass"],
+        choices=["batched", "2pass", "3pass", "5pass", "chapters"],
         default="3pass",
-        help="Workflow type: batched (single-pass), 2pass, 3pass, 5pass (default: 3pass)",
+        help="Workflow type: batched (single-pass), 2pass, 3pass, 5pass, "
+             "chapters (chapter-sharded 3-pass) (default: 3pass)",
     )
 
     # Model backend selection
@@ -221,9 +461,147 @@ For LiteRT troubleshooting, see scripts/benchmark/TROUBLESHOOTING.md
 
     # Processing options
     parser.add_argument("--max-pages", type=int, default=50, help="Max pages to process (default: 50)")
+    parser.add_argument("--segment-size", type=int, default=4000, help="Characters per segment (batched/2pass, default: 4000)")
+    parser.add_argument("--max-segments", type=int, default=10, help="Max segments to process (batched/2pass, default: 10)")
+    parser.add_argument(
+        "--pack-tokens",
+        type=int,
+        default=None,
+        help="Token budget for packing short pages into one prompt (3pass/5pass). "
+             "Default: derived from the pass prompt and --context-size; 0 disables packing.",
+    )
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="Strip running headers/footers and page numbers, de-hyphenate and re-flow page text "
+             "before prompting (token savings reported in metadata.normalization)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Chapters analyzed in parallel (chapters workflow, default: 4)",
+    )
+    parser.add_argument(
+        "--merge-processes",
+        type=int,
+        default=0,
+        help="Processes for the hierarchical chapter merge (chapters workflow, default: in-process)",
+    )
+
+    # Evidence thresholds (characters below all of them skip per-character LLM calls)
+    parser.add_argument("--min-dialogs", type=int, default=0, help="Min dialogs for per-character calls (default: 0, off; suggested: 1)")
+    parser.add_argument("--min-mentions", type=int, default=0, help="Min name mentions for per-character calls (default: 0, off; suggested: 3)")
+    parser.add_argument("--min-pages", type=int, default=0, help="Min pages/segments for per-character calls (default: 0, off; suggested: 2)")
+
+    # Batch options
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=1,
+        help="Models kept warm for --batch (default: 1)",
+    )
+    parser.add_argument(
+        "--max-active-books",
+        type=int,
+        default=None,
+        help="Books analyzed concurrently in --batch (default: all, interleaved fairly)",
+    )
+    parser.add_argument("--output-dir", help="Result directory for --batch (default: batch_results)")
+
+    # Planning options
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Dry run: predict calls, tokens and wall time per pass without calling the model",
+    )
+    parser.add_argument(
+        "--compact-prompts",
+        action="store_true",
+        help="Use the token-lean prompt templates (prompts.CompactPromptBuilder)",
+    )
+    parser.add_argument(
+        "--prompt-overhead",
+        action="store_true",
+        help="Print the template tokens of every pass (full vs compact prompts, per model type) and exit",
+    )
+    parser.add_argument(
+        "--ab-prompts",
+        metavar="EXPECTED_JSON",
+        help="Run --pdf with the full and the compact prompts, score both against this expected "
+             "analysis JSON and exit 1 if compact extraction F1 drops by more than --ab-tolerance",
+    )
+    parser.add_argument(
+        "--ab-tolerance",
+        type=float,
+        default=0.0,
+        help="Allowed F1 drop for --ab-prompts (default: 0.0)",
+    )
+    parser.add_argument(
+        "--profiles",
+        default="benchmark_profiles.json",
+        help="Throughput profiles measured from previous runs (default: benchmark_profiles.json)",
+    )
+    parser.add_argument(
+        "--update-profile",
+        action="store_true",
+        help="Add this run's call latencies to its backend's profile in --profiles (used by --plan)",
+    )
+    parser.add_argument(
+        "--history-db",
+        help=f"Record the run in this history database (default: not recorded; with --gate: "
+             f"{DEFAULT_HISTORY_DB})",
+    )
+    parser.add_argument(
+        "--gate",
+        action="store_true",
+        help="Exit 1 on a significant latency/throughput/calls/memory regression against earlier runs "
+             "with the same settings (records the run)",
+    )
+    parser.add_argument(
+        "--gate-runs",
+        type=int,
+        default=DEFAULT_GATE_RUNS,
+        help=f"Earlier runs (same model, PDF, workflow and settings) whose median is the baseline "
+             f"(default: {DEFAULT_GATE_RUNS})",
+    )
+    parser.add_argument(
+        "--gate-tolerance",
+        type=float,
+        default=DEFAULT_GATE_TOLERANCE,
+        help=f"Allowed slowdown vs the baseline median, relative (default: {DEFAULT_GATE_TOLERANCE})",
+    )
+
+    # Repeated-run statistics
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Measured (warm) iterations; above 1, --output gets a latency distribution summary "
+             "(benchmark.stats) instead of the result and the run is not recorded in the history",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=0,
+        help="Leading iterations reported separately as cold and kept out of the warm distributions (default: 0)",
+    )
+    parser.add_argument(
+        "--resamples",
+        type=int,
+        default=DEFAULT_RESAMPLES,
+        help=f"Bootstrap resamples for the confidence intervals (default: {DEFAULT_RESAMPLES})",
+    )
 
     # Output options
     parser.add_argument("--output", "-o", help="Output JSON file (default: stdout)")
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="json",
+        help="Output format: json (single document) or jsonl (one record per line) (default: json)",
+    )
     parser.add_argument("--raw-output", help="Save raw LLM outputs to this file (batched workflow only)")
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
 
@@ -236,6 +614,9 @@ For LiteRT troubleshooting, see scripts/benchmark/TROUBLESHOOTING.md
 
     args = parser.parse_args()
 
+    if args.no_page_cache:
+        set_page_store(None)
+
     # Handle utility commands
     if args.list_aliases:
         print("Known LiteRT model aliases:")
@@ -246,9 +627,17 @@ For LiteRT troubleshooting, see scripts/benchmark/TROUBLESHOOTING.md
         print("Run `lit.exe list --show_all` to see all available aliases.")
         sys.exit(0)
 
+    if args.prompt_overhead:
+        run_overhead_mode(args)
+        return
+
+    if args.batch:
+        run_batch_mode(args)
+        return
+
     # Validate PDF is provided and exists
     if not args.pdf:
-        print("ERROR: --pdf is required for benchmarking", file=sys.stderr)
+        print("ERROR: --pdf (or --batch) is required for benchmarking", file=sys.stderr)
         print("Use --help for usage information", file=sys.stderr)
         sys.exit(1)
 
@@ -257,44 +646,121 @@ For LiteRT troubleshooting, see scripts/benchmark/TROUBLESHOOTING.md
         print(f"ERROR: PDF not found: {args.pdf}", file=sys.stderr)
         sys.exit(1)
 
+    if args.plan:
+        run_plan_mode(args)
+        return
+
+    if args.ab_prompts:
+        run_ab_mode(args)
+        return
+
+    if args.repeat < 1 or args.warmup < 0 or args.resamples < 1:
+        print("ERROR: --repeat and --resamples must be at least 1 and --warmup at least 0", file=sys.stderr)
+        sys.exit(1)
+    if args.repeat > 1 or args.warmup:
+        # Repeat mode writes a statistics summary and records no history
+        ignored = [
+            flag for flag, given in (
+                ("--gate", args.gate), ("--format", args.format != "json"), ("--raw-output", args.raw_output),
+            ) if given
+        ]
+        if ignored:
+            print(f"ERROR: {', '.join(ignored)} cannot be combined with --repeat/--warmup", file=sys.stderr)
+            sys.exit(1)
+        run_repeat_mode(args, pdf_path)
+        return
+
     if args.verbose:
         print(f"PDF: {args.pdf}")
         print(f"Workflow: {args.workflow}")
         print(f"Model: {args.model} ({args.model_type})")
 
-    # Run benchmark
-    t_start = time.time()
-
-    with create_model(args) as model:
-        workflow = create_workflow(args, model)
-        result: WorkflowResult = workflow.run(
-            str(pdf_path),
-            max_pages=args.max_pages,
-            verbose=args.verbose,
-            raw_output_file=getattr(args, 'raw_output', None),
+    # Recording is opt-in; the gate needs a history to compare against
+    history_db = args.history_db or (DEFAULT_HISTORY_DB if args.gate else None)
+    record = history_record(args, pdf_path)
+
+    with HistoryStore(history_db) if history_db else nullcontext() as history:
+        # Baseline taken before this run is recorded
+        baseline = (
+            history.query(
+                model=record["model_name"], pdf=record["pdf"], mode=args.workflow,
+                config_hash=record["config_hash"], limit=args.gate_runs, full=True,
+            )
+            if args.gate else None
         )
 
-    result.timing["total"] = time.time() - t_start
-    result.metadata["pdf"] = str(pdf_path)
-    result.metadata["workflow"] = args.workflow
-    result.metadata["model"] = args.model
-    result.metadata["model_type"] = args.model_type
-
-    # Output
-    output_data = result.to_dict()
-    output_json = json.dumps(output_data, indent=2, ensure_ascii=False)
-
-    if args.output:
-        Path(args.output).write_text(output_json, encoding="utf-8")
-        if args.verbose:
-            print(f"Output written to: {args.output}")
-    else:
-        print(output_json)
+        # Characters are streamed to an output file as the workflow finishes them;
+        # stdout output waits for the run so it doesn't interleave with progress prints
+        writer = ResultWriter.to_file(args.output, args.format) if args.output else ResultWriter(sys.stdout, args.format)
+
+        # Run benchmark (an interrupted run leaves no partial output file)
+        t_start = time.perf_counter()
+
+        with writer:
+            with create_model(args) as model:
+                workflow = create_workflow(args, model)
+                if args.output:
+                    workflow.on_character = writer.add_character
+                result: WorkflowResult = workflow.run(
+                    str(pdf_path),
+                    raw_output_file=getattr(args, 'raw_output', None),
+                    **build_run_kwargs(args),
+                )
+
+            result.timing["total"] = time.perf_counter() - t_start
+            result.metadata["pdf"] = str(pdf_path)
+            result.metadata["workflow"] = args.workflow
+            result.metadata["model"] = args.model
+            result.metadata["model_type"] = args.model_type
+            result.metadata["calls"] = workflow.call_summary()
+
+            # Feed measured call latencies into this backend's throughput profile (for --plan)
+            if args.update_profile:
+                update_profile(profile_key(args), workflow.call_log, args.profiles)
+
+            calls = result.metadata["calls"]
+            record["timing_ms"] = {"total": result.timing["total"] * 1000}
+            record["tokens"] = {
+                "prompt_tokens": sum(stage["prompt_tokens"] for stage in calls.values()),
+                "completion_tokens": sum(stage["output_tokens"] for stage in calls.values()),
+            }
+            record["perf"] = run_perf(
+                total_s=result.timing["total"],
+                # Pass wall times: with --workers a pass's calls overlap, so their sum overstates it
+                passes={name: seconds for name, seconds in result.timing.items() if name != "total"},
+                calls=sum(stage["calls"] for stage in calls.values()),
+                output_tokens=record["tokens"]["completion_tokens"],
+                llm_seconds=sum(stage["seconds"] for stage in calls.values()),
+            )
+
+            # Output
+            writer.finish(result)
+
+        if history is not None:
+            history.append(record)
+
+    if args.output and args.verbose:
+        print(f"Output written to: {args.output}")
+
+    gate = check_regressions(record["perf"], baseline, tolerance=args.gate_tolerance) if args.gate else None
+    if gate is not None:
+        # stderr: stdout may carry the result document
+        print(format_gate(gate), file=sys.stderr)
 
     if args.verbose:
         print(f"\nTiming: {result.timing}")
         print(f"Characters found: {len(result.characters)}")
         print(f"Dialogs extracted: {len(result.dialogs)}")
+        skipped = result.metadata.get("skipped_calls")
+        if skipped:
+            print(f"Skipped calls (below evidence thresholds): {skipped['total']} {skipped['by_pass']}")
+        normalization = result.metadata.get("normalization")
+        if normalization:
+            print(f"Normalization saved ~{normalization['tokens_saved']} tokens per pass "
+                  f"({normalization['saved_pct']}% of page text)")
+
+    if gate is not None and not gate.passed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""
+Repeated-run statistics: latency distributions and configuration comparison.
+
+run_benchmark --repeat N --warmup K runs a workflow K + N times on one
+loaded model. The K warmup iterations pay the cold costs (first page
+extraction, server prompt cache, lazy imports). They are summarized
+separately as "cold" and kept out of the N "warm" iterations the
+distributions are built from:
+- total wall time per iteration
+- wall time of every pass per iteration ("pass:<name>")
+- latency of every model call of a stage, pooled over iterations ("call:<stage>")
+
+Each distribution has n, mean, stddev, min, p50, p90, p99, max and
+bootstrap confidence intervals of the mean and the median. The summary
+keeps the raw samples, so two summaries can be compared later: compare()
+bootstraps the ratio of medians (B / A) per metric. A change counts as
+significant only if its interval excludes 1.0.
+
+Usage:
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --repeat 10 --warmup 2 -o a.json
+    python -m benchmark.run_benchmark --pdf book.pdf --workflow 3pass --compact-prompts \\
+        --repeat 10 --warmup 2 -o b.json
+    python -m benchmark.stats show a.json
+    python -m benchmark.stats compare a.json b.json [--json]
+"""
+
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+from pathlib import Path
+from typing import Callable, Optional
+
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_RESAMPLES = 2000
+# Fixed seed: the same samples always give the same intervals
+BOOTSTRAP_SEED = 0
+
+
+def percentile(values: list[float], q: float) -> float:
+    """q-th percentile (0-100) with linear interpolation between closest ranks."""
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile of an empty sample")
+    rank = (len(ordered) - 1) * q / 100
+    lo = math.floor(rank)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (rank - lo)
+
+
+def bootstrap_ci(
+    values: list[float],
+    statistic: Callable[[list[float]], float] = statistics.median,
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+    seed: int = BOOTSTRAP_SEED,
+) -> tuple[float, float]:
+    """Percentile bootstrap confidence interval of a statistic of one sample."""
+    if len(values) < 2:
+        return (values[0], values[0]) if values else (math.nan, math.nan)
+    rng = random.Random(seed)
+    estimates = [statistic(rng.choices(values, k=len(values))) for _ in range(resamples)]
+    alpha = (1 - confidence) / 2
+    return percentile(estimates, 100 * alpha), percentile(estimates, 100 * (1 - alpha))
+
+
+def describe(
+    values: list[float],
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+) -> dict:
+    """Distribution summary of one metric (seconds); keeps the samples for compare()."""
+    if not values:
+        return {"n": 0, "samples": []}
+    return {
+        "n": len(values),
+        "mean": statistics.fmean(values),
+        "stddev": statistics.stdev(values) if len(values) > 1 else 0.0,
+        "min": min(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values),
+        "mean_ci": bootstrap_ci(values, statistics.fmean, confidence, resamples),
+        "p50_ci": bootstrap_ci(values, statistics.median, confidence, resamples),
+        "samples": list(values),
+    }
+
+
+def iteration_samples(iterations: list[dict]) -> dict[str, list[float]]:
+    """Samples per metric over iterations.
+
+    Args:
+        iterations: One dict per iteration: "total" (seconds), "passes"
+            ({pass: seconds}) and "calls" (call_log entries with "stage" and
+            "seconds")
+
+    Returns:
+        {"total": [...], "pass:<name>": [...], "call:<stage>": [...]}
+    """
+    samples: dict[str, list[float]] = {"total": [it["total"] for it in iterations]}
+    for it in iterations:
+        for name, seconds in it.get("passes", {}).items():
+            samples.setdefault(f"pass:{name}", []).append(seconds)
+        for call in it.get("calls", []):
+            samples.setdefault(f"call:{call['stage']}", []).append(call["seconds"])
+    return samples
+
+
+def summarize_runs(
+    iterations: list[dict],
+    warmup: int,
+    config: Optional[dict] = None,
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+) -> dict:
+    """Machine-readable summary of a repeated run.
+
+    Args:
+        iterations: All iterations in run order (see iteration_samples)
+        warmup: Leading iterations reported as "cold"
+        config: What was run (workflow, model, prompts, PDF); compare() shows it
+
+    Returns:
+        {"config", "warmup", "repeat", "confidence", "cold": {metric: summary},
+        "warm": {metric: summary}}
+    """
+    cold, warm = iterations[:warmup], iterations[warmup:]
+    return {
+        "config": config or {},
+        "warmup": len(cold),
+        "repeat": len(warm),
+        "confidence": confidence,
+        "cold": {m: describe(v, confidence, resamples) for m, v in iteration_samples(cold).items()} if cold else {},
+        "warm": {m: describe(v, confidence, resamples) for m, v in iteration_samples(warm).items()} if warm else {},
+    }
+
+
+def _median_ratio_ci(
+    a: list[float], b: list[float], confidence: float, resamples: int, seed: int = BOOTSTRAP_SEED,
+) -> tuple[float, float]:
+    """Bootstrap interval of median(b) / median(a), resampling both samples independently."""
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        base = statistics.median(rng.choices(a, k=len(a)))
+        if base > 0:
+            ratios.append(statistics.median(rng.choices(b, k=len(b))) / base)
+    if not ratios:
+        return math.nan, math.nan
+    alpha = (1 - confidence) / 2
+    return percentile(ratios, 100 * alpha), percentile(ratios, 100 * (1 - alpha))
+
+
+def compare(
+    summary_a: dict,
+    summary_b: dict,
+    section: str = "warm",
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+) -> list[dict]:
+    """Compare two repeated-run summaries metric by metric.
+
+    Returns:
+        One row per metric present in both: medians, ratio B / A with its
+        bootstrap interval, and whether the interval excludes 1.0
+    """
+    rows = []
+    a_metrics, b_metrics = summary_a.get(section, {}), summary_b.get(section, {})
+    for metric in a_metrics:
+        if metric not in b_metrics:
+            continue
+        a, b = a_metrics[metric]["samples"], b_metrics[metric]["samples"]
+        if not a or not b:
+            continue
+        median_a, median_b = statistics.median(a), statistics.median(b)
+        lo, hi = _median_ratio_ci(a, b, confidence, resamples)
+        rows.append({
+            "metric": metric,
+            "n_a": len(a),
+            "n_b": len(b),
+            "p50_a": median_a,
+            "p50_b": median_b,
+            "ratio": median_b / median_a if median_a > 0 else math.nan,
+            "ratio_ci": (lo, hi),
+            "significant": not (lo <= 1.0 <= hi),
+        })
+    return rows
+
+
+def _fmt_ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+def format_summary(summary: dict) -> str:
+    """Table per section: one row per metric, times in ms."""
+    level = f"{summary.get('confidence', DEFAULT_CONFIDENCE):.0%}"
+    lines = []
+    for section in ("cold", "warm"):
+        metrics = summary.get(section) or {}
+        if not metrics:
+            continue
+        count = summary["warmup"] if section == "cold" else summary["repeat"]
+        lines.append(f"{section.upper()} ({count} iterations), ms; CI = {level} bootstrap interval of p50")
+        lines.append(
+            f"{'metric':<28}{'n':>6}{'mean':>10}{'stddev':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'p50 CI':>22}"
+        )
+        for metric, s in metrics.items():
+            if not s["n"]:
+                continue
+            lo, hi = s["p50_ci"]
+            ci = f"[{_fmt_ms(lo)}, {_fmt_ms(hi)}]"
+            lines.append(
+                f"{metric:<28}{s['n']:>6}{_fmt_ms(s['mean']):>10}{_fmt_ms(s['stddev']):>10}{_fmt_ms(s['p50']):>10}"
+                f"{_fmt_ms(s['p90']):>10}{_fmt_ms(s['p99']):>10}{ci:>22}"
+            )
+        lines.append("")
+    return "\n".join(lines).rstrip()
+
+
+def format_compare(rows: list[dict], summary_a: dict, summary_b: dict, confidence: float) -> str:
+    """Comparison table; '*' marks a significant change."""
+    lines = [f"A: {json.dumps(summary_a.get('config', {}))}", f"B: {json.dumps(summary_b.get('config', {}))}"]
+    lines.append(f"{'metric':<28}{'p50 A ms':>11}{'p50 B ms':>11}{'B/A':>8}{f'{confidence:.0%} CI':>18}")
+    for r in rows:
+        lo, hi = r["ratio_ci"]
+        mark = " *" if r["significant"] else ""
+        lines.append(
+            f"{r['metric']:<28}{_fmt_ms(r['p50_a']):>11}{_fmt_ms(r['p50_b']):>11}{r['ratio']:>8.3f}"
+            f"{f'[{lo:.3f}, {hi:.3f}]':>18}{mark}"
+        )
+    return "\n".join(lines)
+
+
+def load_summary(path: str) -> dict:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if "warm" not in data:
+        raise ValueError(f"{path} is not a repeated-run summary (run_benchmark --repeat ... -o)")
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show or compare repeated-run benchmark summaries.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    show = sub.add_parser("show", help="Print the distributions of one summary")
+    show.add_argument("summary")
+
+    cmp_parser = sub.add_parser("compare", help="Compare two summaries (B relative to A)")
+    cmp_parser.add_argument("a")
+    cmp_parser.add_argument("b")
+    cmp_parser.add_argument("--section", choices=("warm", "cold"), default="warm")
+    cmp_parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    cmp_parser.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES)
+    cmp_parser.add_argument("--json", action="store_true", help="Print the rows as JSON")
+    args = parser.parse_args()
+    if args.command == "compare" and args.resamples < 1:
+        parser.error("--resamples must be at least 1")
+
+    try:
+        if args.command == "show":
+            print(format_summary(load_summary(args.summary)))
+            return
+        summary_a, summary_b = load_summary(args.a), load_summary(args.b)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    rows = compare(summary_a, summary_b, args.section, args.confidence, args.resamples)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_compare(rows, summary_a, summary_b, args.confidence))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Blank character names from the model must not break alias resolution."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmark.merge import PartialResult, merge_partials
+from benchmark.page_store import set_page_store
+from benchmark.planner import PlanningModel
+from benchmark.prompts import PromptBuilder
+from benchmark.utils import canonicalize_characters, is_character_name
+from benchmark.workflows import BatchedWorkflow, ChapterWorkflow, FivePassWorkflow, ThreePassWorkflow
+
+DEMO_PDF = Path(__file__).resolve().parents[3] / "app" / "src" / "main" / "assets" / "demo" / "SpaceStory.pdf"
+BLANK_NAMES = ["", " ", "\t\n"]
+
+
+class BlankNamesModel(PlanningModel):
+    """PlanningModel whose name lists and batched keys also contain blank names."""
+
+    def generate(self, prompt: str, max_tokens: int = 2048, temperature: float = 0.3) -> str:
+        data = json.loads(super().generate(prompt, max_tokens, temperature))
+        if "characters" in data:
+            data["characters"] += BLANK_NAMES
+        elif data and "dialogs" not in data:
+            for name in BLANK_NAMES:
+                data[name] = {"D": ["Blank line."], "T": [], "V": ""}
+        return json.dumps(data)
+
+
+@pytest.fixture(autouse=True)
+def no_page_store():
+    set_page_store(None)
+    yield
+    set_page_store(None)
+
+
+def test_is_character_name():
+    assert is_character_name("Jax")
+    assert not any(is_character_name(n) for n in BLANK_NAMES + [None, 3])
+
+
+def test_canonicalize_drops_blank_names():
+    aliases = canonicalize_characters(["Jax", "Captain Jax"] + BLANK_NAMES)
+    assert set(aliases) == {"Jax", "Captain Jax"}
+    assert aliases["Jax"] == aliases["Captain Jax"]
+
+
+def test_merge_drops_blank_names():
+    a = PartialResult.from_unit({"Jax": [0], " ": [0]}, [{"speaker": "Jax", "text": "Hi.", "page": 0}])
+    b = PartialResult.from_unit({"": [1], "Lyra": [1]}, [])
+    assert set(merge_partials(a, b).characters) == {"Jax", "Lyra"}
+
+
+@pytest.mark.parametrize("workflow", [ThreePassWorkflow, FivePassWorkflow, BatchedWorkflow, ChapterWorkflow])
+def test_workflows_skip_blank_names(workflow):
+    pytest.importorskip("fitz")
+    result = workflow(BlankNamesModel(), PromptBuilder()).run(str(DEMO_PDF))
+    names = [c.name for c in result.characters]
+    assert names and all(is_character_name(n) for n in names)
+    assert all(is_character_name(alias) for alias in result.aliases)
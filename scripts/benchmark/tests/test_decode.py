@@ -0,0 +1,41 @@
+"""Typed decoding of the per-pass response schemas."""
+
+import pytest
+
+from benchmark.decode import (
+    CharacterEntry,
+    CharacterNames,
+    CharacterPersonality,
+    CharacterTraits,
+    DialogList,
+    VoiceSuggestion,
+    decode_character_entry,
+    loads,
+)
+
+
+def test_character_entry_aliases():
+    entry = decode_character_entry(loads('{"d": ["Hi"], "Traits": ["brave"], "VOICE": "male"}'))
+    assert entry == CharacterEntry(["Hi"], ["brave"], "male")
+    assert decode_character_entry(["not", "an", "object"]) is None
+
+
+@pytest.mark.parametrize("raw, record", [
+    ('{"Characters": ["Jax", "Lyra"]}', CharacterNames(characters=["Jax", "Lyra"])),
+    ('{"dialogues": [{"speaker": "Jax", "text": "Hi"}]}', DialogList(dialogs=[{"speaker": "Jax", "text": "Hi"}])),
+    ('{"character": "Jax", "Traits": ["tall"]}', CharacterTraits(character="Jax", traits=["tall"])),
+    ('{"character": "Jax", "personality": ["bold"]}', CharacterPersonality(character="Jax", personality=["bold"])),
+    (
+        '{"character": "Jax", "traits": ["tall"], "voice_profile": {"pitch": 1.1}}',
+        VoiceSuggestion(character="Jax", traits=["tall"], voice_profile={"pitch": 1.1}),
+    ),
+])
+def test_pass_records(raw, record):
+    assert type(record).decode(loads(raw)) == record
+
+
+def test_wrong_types_keep_empty_defaults():
+    record = VoiceSuggestion.decode({"traits": "tall", "voice_profile": "deep", "character": 3})
+    assert (record.character, record.traits, record.voice_profile) == ("", [], {})
+    assert CharacterNames.decode(["Jax"]).characters == []
+    assert DialogList.decode(None).dialogs == []
@@ -0,0 +1,22 @@
+"""Tree merges keep dialogs in reading order."""
+
+from benchmark.merge import PartialResult, tree_merge
+
+
+def _dialogs(*lines: tuple[str, str, int]) -> list[dict]:
+    return [{"speaker": speaker, "text": text, "page": page} for speaker, text, page in lines]
+
+
+def test_flat_dialogs_keep_order_within_a_page():
+    partial = PartialResult.from_unit({"A": [0], "B": [0]}, _dialogs(("A", "1", 0), ("B", "2", 0), ("A", "3", 0)))
+    assert [d["text"] for d in partial.flat_dialogs()] == ["1", "2", "3"]
+
+
+def test_tree_merge_keeps_reading_order():
+    units = [
+        PartialResult.from_unit({"A": [0], "B": [0]}, _dialogs(("A", "1", 0), ("B", "2", 0), ("A", "3", 0))),
+        PartialResult.from_unit({"B": [1], "C": [1]}, _dialogs(("C", "4", 1), ("B", "5", 1))),
+        PartialResult.from_unit({"Captain A": [2], "B": [2]}, _dialogs(("B", "6", 2), ("Captain A", "7", 2))),
+    ]
+    merged, _ = tree_merge(units)
+    assert [d["text"] for d in merged.flat_dialogs()] == ["1", "2", "3", "4", "5", "6", "7"]
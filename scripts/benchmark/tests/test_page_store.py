@@ -0,0 +1,73 @@
+"""Limited runs stop at their limit and store the pages they read."""
+
+import pytest
+
+from benchmark.page_store import PageStore, set_page_store
+from benchmark.utils import count_pdf_pages, extract_pdf_pages, iter_pdf_pages, iter_pdf_segments
+
+fitz = pytest.importorskip("fitz")
+
+NUM_PAGES = 120
+
+
+@pytest.fixture
+def book(tmp_path):
+    doc = fitz.open()
+    for i in range(NUM_PAGES):
+        doc.new_page().insert_text((72, 72), f'Page {i}. "Hello," said Jax on page {i}.')
+    path = tmp_path / "book.pdf"
+    doc.save(path)
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PageStore(str(tmp_path / "cache"))
+    set_page_store(store)
+    yield store
+    set_page_store(None)
+
+
+def _uncached(extract):
+    set_page_store(None)
+    return extract()
+
+
+def _stored(store, book, ascii_only=True):
+    with store.get(book, ascii_only) as cached:
+        return len(cached), cached.page_count
+
+
+def test_limited_extraction_stores_only_its_prefix(book, store):
+    expected = _uncached(lambda: extract_pdf_pages(book, workers=0))
+    set_page_store(store)
+    assert extract_pdf_pages(book, max_pages=20, workers=0) == expected[:20]
+    assert _stored(store, book) == (20, NUM_PAGES)
+    assert count_pdf_pages(book) == NUM_PAGES
+
+    # A longer run extracts only the missing pages and stores the whole book
+    assert extract_pdf_pages(book, workers=2) == expected
+    assert _stored(store, book) == (NUM_PAGES, NUM_PAGES)
+    assert extract_pdf_pages(book, max_pages=20) == expected[:20]
+
+
+def test_lazy_pages_store_what_was_read(book, store):
+    expected = _uncached(lambda: extract_pdf_pages(book, workers=0))
+    set_page_store(store)
+    assert list(iter_pdf_pages(book, max_pages=5)) == expected[:5]
+    assert _stored(store, book) == (5, NUM_PAGES)
+    assert list(iter_pdf_pages(book, max_pages=30)) == expected[:30]
+    assert _stored(store, book) == (30, NUM_PAGES)
+    assert list(iter_pdf_pages(book)) == expected
+    assert _stored(store, book) == (NUM_PAGES, NUM_PAGES)
+
+
+def test_limited_segments_stop_early(book, store):
+    expected = _uncached(lambda: list(iter_pdf_segments(book, 200)))
+    set_page_store(store)
+    assert list(iter_pdf_segments(book, 200, max_segments=3)) == expected[:3]
+    pages_read, _ = _stored(store, book, ascii_only=False)
+    assert pages_read < NUM_PAGES
+    assert list(iter_pdf_segments(book, 200)) == expected
+    assert _stored(store, book, ascii_only=False) == (NUM_PAGES, NUM_PAGES)
@@ -0,0 +1,36 @@
+"""Streamed output matches WorkflowResult.to_dict()."""
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmark.page_store import set_page_store
+from benchmark.planner import PlanningModel
+from benchmark.prompts import PromptBuilder
+from benchmark.workflows import ChapterWorkflow, FivePassWorkflow, ThreePassWorkflow
+from benchmark.writer import ResultWriter
+
+DEMO_PDF = Path(__file__).resolve().parents[3] / "app" / "src" / "main" / "assets" / "demo" / "SpaceStory.pdf"
+
+
+@pytest.fixture(autouse=True)
+def no_page_store():
+    set_page_store(None)
+    yield
+    set_page_store(None)
+
+
+@pytest.mark.parametrize("normalize", [False, True])
+@pytest.mark.parametrize("workflow", [ThreePassWorkflow, FivePassWorkflow, ChapterWorkflow])
+def test_streamed_json_matches_to_dict(workflow, normalize):
+    pytest.importorskip("fitz")
+    stream = io.StringIO()
+    wf = workflow(PlanningModel(), PromptBuilder())
+    writer = ResultWriter(stream, "json")
+    wf.on_character = writer.add_character
+    result = wf.run(str(DEMO_PDF), normalize=normalize)
+    writer.finish(result)
+    assert any("span" in d for c in result.to_dict()["characters"] for d in c["dialogs"])
+    assert stream.getvalue() == json.dumps(result.to_dict(), indent=2) + "\n"
@@ -5,10 +5,18 @@ Provides PDF extraction, text splitting, JSON validation, and other common utili
 """
 
 import json
+import os
 import re
 import sys
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
+
+from .jsonparse import parse_llm_json
+from .normalize import TextNormalizer
+from .page_store import get_page_store
 
 # Optional: PyMuPDF for PDF extraction
 try:
@@ -16,6 +24,12 @@ try:
 except ImportError:
     fitz = None
 
+# Optional: NumPy for vectorized boundary indexing of very large texts
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 # Ensure UTF-8 output
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
@@ -25,11 +39,98 @@ if hasattr(sys.stdout, 'reconfigure'):
 # PDF Extraction
 # ---------------------------------------------------------------------------
 
-def extract_pdf_text(pdf_path: str) -> str:
+# Documents with fewer pages are extracted serially (process start-up would dominate)
+PARALLEL_EXTRACTION_MIN_PAGES = 64
+# Page ranges per worker; several small shards balance uneven page costs
+SHARDS_PER_WORKER = 4
+
+
+def _extract_page_range(args: tuple) -> list[str]:
+    """Extract pages [start, stop) with a document handle owned by this worker.
+
+    Module level so it can be pickled into a process pool.
+    """
+    pdf_path, start, stop, ascii_only = args
+    doc = fitz.open(pdf_path)
+    try:
+        pages = []
+        for index in range(start, stop):
+            text = doc[index].get_text()
+            if ascii_only:
+                text = text.encode('ascii', 'ignore').decode('ascii')
+            pages.append(text)
+        return pages
+    finally:
+        doc.close()
+
+
+def _extract_range_parallel(
+    pdf_path: str, start: int, stop: int, ascii_only: bool, workers: Optional[int]
+) -> list[str]:
+    """Extract pages [start, stop) in order, sharding the range across processes."""
+    num_pages = max(0, stop - start)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or num_pages < PARALLEL_EXTRACTION_MIN_PAGES:
+        return _extract_page_range((pdf_path, start, stop, ascii_only))
+    shard = -(-num_pages // (workers * SHARDS_PER_WORKER))
+    ranges = [
+        (pdf_path, first, min(first + shard, stop), ascii_only)
+        for first in range(start, stop, shard)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields shards in submission order, so pages stay in order
+        return [page for shard_pages in pool.map(_extract_page_range, ranges) for page in shard_pages]
+
+
+def _extract_pages_parallel(
+    pdf_path: str, ascii_only: bool, workers: Optional[int], max_pages: Optional[int] = None
+) -> list[str]:
+    """Extract pages in order, sharding page ranges across processes.
+
+    With the page store enabled, pages already stored are read from it and
+    only the missing ones up to max_pages are extracted; the longer prefix
+    is then stored for later runs.
+
+    Args:
+        pdf_path: Path to the PDF file
+        ascii_only: If True, strip non-ASCII characters
+        workers: Worker processes (default: CPU count; 0/1 extracts serially)
+        max_pages: Extract only the first max_pages pages (default: all)
+
+    Returns:
+        List of page texts in document order
+    """
+    if not Path(pdf_path).is_file():
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    store = get_page_store()
+    cached = store.get(pdf_path, ascii_only) if store else None
+    prefix: list[str] = []
+    total_pages = None
+    if cached is not None:
+        with cached:
+            if cached.complete or (max_pages is not None and len(cached) >= max_pages):
+                return cached[:max_pages]
+            prefix = cached[:]
+            total_pages = cached.page_count
+    if not fitz:
+        raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
+
+    if total_pages is None:
+        total_pages = count_pdf_pages(pdf_path)
+    stop = total_pages if max_pages is None else min(total_pages, max_pages)
+    pages = prefix + _extract_range_parallel(pdf_path, len(prefix), stop, ascii_only, workers)
+    if store and len(pages) > len(prefix):
+        store.put(pdf_path, ascii_only, pages, page_count=total_pages)
+    return pages
+
+
+def extract_pdf_text(pdf_path: str, workers: Optional[int] = None) -> str:
     """Extract full text from PDF using PyMuPDF.
     
     Args:
         pdf_path: Path to the PDF file
+        workers: Extraction processes for large PDFs (default: CPU count)
         
     Returns:
         Extracted text as a single string
@@ -38,71 +139,243 @@ def extract_pdf_text(pdf_path: str) -> str:
         RuntimeError: If PyMuPDF is not installed
         FileNotFoundError: If PDF file doesn't exist
     """
-    if not fitz:
-        raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
-    path = Path(pdf_path)
-    if not path.is_file():
-        raise FileNotFoundError(f"PDF not found: {pdf_path}")
-    doc = fitz.open(pdf_path)
-    try:
-        text = "".join(page.get_text() for page in doc)
-    finally:
-        doc.close()
-    return text.strip()
+    return "".join(_extract_pages_parallel(pdf_path, False, workers)).strip()
 
 
-def extract_pdf_pages(pdf_path: str, ascii_only: bool = True) -> list[str]:
+def extract_pdf_pages(
+    pdf_path: str,
+    ascii_only: bool = True,
+    workers: Optional[int] = None,
+    max_pages: Optional[int] = None,
+) -> list[str]:
     """Extract text from each PDF page separately.
     
     Args:
         pdf_path: Path to the PDF file
         ascii_only: If True, strip non-ASCII characters
+        workers: Extraction processes for large PDFs (default: CPU count)
+        max_pages: Extract only the first max_pages pages (default: all)
         
     Returns:
         List of page texts
     """
+    return _extract_pages_parallel(pdf_path, ascii_only, workers, max_pages)
+
+
+def iter_pdf_pages(pdf_path: str, ascii_only: bool = True, max_pages: Optional[int] = None) -> Iterator[str]:
+    """Lazily yield page texts; a page is only decoded when it is requested.
+
+    Pages already in the page store are served from it. The rest of the
+    document is read page by page, so stopping the iteration early (or
+    hitting max_pages) leaves it unread; with the store enabled, the pages
+    read are stored as a longer prefix when the iteration ends.
+
+    Args:
+        pdf_path: Path to the PDF file
+        ascii_only: If True, strip non-ASCII characters
+        max_pages: Stop after this many pages (default: all)
+
+    Yields:
+        Page texts in document order
+    """
+    if not Path(pdf_path).is_file():
+        raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    store = get_page_store()
+    cached = store.get(pdf_path, ascii_only) if store else None
+    read: list[str] = []  # every page yielded so far, kept to extend the store
+    stored = 0
+    if cached is not None:
+        with cached:
+            stored = len(cached)
+            covered = cached.complete or (max_pages is not None and stored >= max_pages)
+            stop = stored if max_pages is None else min(stored, max_pages)
+            for index in range(stop):
+                page = cached[index]
+                if not covered:
+                    read.append(page)
+                yield page
+        if covered:
+            return
     if not fitz:
         raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
     doc = fitz.open(pdf_path)
-    pages = []
-    for page in doc:
-        text = page.get_text()
-        if ascii_only:
-            text = text.encode('ascii', 'ignore').decode('ascii')
-        pages.append(text)
-    doc.close()
-    return pages
+    try:
+        stop = doc.page_count if max_pages is None else min(doc.page_count, max_pages)
+        for index in range(len(read), stop):
+            text = doc[index].get_text()
+            if ascii_only:
+                text = text.encode('ascii', 'ignore').decode('ascii')
+            if store:
+                read.append(text)
+            yield text
+    finally:
+        if store and len(read) > stored:
+            store.put(pdf_path, ascii_only, read, page_count=doc.page_count)
+        doc.close()
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Return the number of pages in a PDF without extracting any text."""
+    store = get_page_store()
+    for ascii_only in (False, True):
+        cached = store.get(pdf_path, ascii_only) if store else None
+        if cached is not None:
+            with cached:
+                return cached.page_count
+    if not fitz:
+        raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
+    doc = fitz.open(pdf_path)
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
 
 
 # ---------------------------------------------------------------------------
 # Text Splitting
 # ---------------------------------------------------------------------------
 
-def _last_boundary_before(text: str, max_chars: int, prefer_paragraph: bool = True) -> int:
+# Boundary definitions shared by every splitter:
+# - sentence: after . ! ? (plus one closing quote/bracket) followed by whitespace or end
+# - paragraph: after each blank-line newline pair ("\n\n")
+# - word: at a whitespace character
+_WHITESPACE = " \t\n\r\f\v"
+_SENTENCE_TERMINATORS = ".!?"
+_SENTENCE_CLOSERS = "\"')\u201d\u2019"
+_SENTENCE_END_RE = re.compile(
+    f"[{re.escape(_SENTENCE_TERMINATORS)}][{re.escape(_SENTENCE_CLOSERS)}]?(?=[{_WHITESPACE}]|\\Z)"
+)
+_PARAGRAPH_END_RE = re.compile(r"\n(?=\n)")
+_WHITESPACE_RE = re.compile(f"[{_WHITESPACE}]")
+
+# Texts at least this long are indexed with NumPy (when installed)
+NUMPY_INDEX_MIN_CHARS = 200_000
+
+
+class BoundaryIndex:
+    """Sorted sentence, paragraph and word boundary offsets of a text.
+
+    Built in one pass over the text; every split/truncate decision is then a
+    bisect lookup instead of a backwards scan. Offsets are character indices
+    at which the text may be cut (text[:offset] ends at the boundary).
+    """
+
+    def __init__(self, text: str, use_numpy: Optional[bool] = None):
+        """Index a text.
+
+        Args:
+            text: Text to index
+            use_numpy: Force (True) or avoid (False) the vectorized builder;
+                default uses it for texts of NUMPY_INDEX_MIN_CHARS or more
+        """
+        self.length = len(text)
+        if use_numpy is None:
+            use_numpy = self.length >= NUMPY_INDEX_MIN_CHARS
+        self._text = text
+        self._codes = None
+        self._words = None
+        if use_numpy and np is not None and text:
+            # UTF-32 code points keep offsets in characters
+            self._codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"), dtype=np.uint32)
+            self.sentences, self.paragraphs = self._build_numpy(self._codes)
+        else:
+            self.sentences = [m.end() for m in _SENTENCE_END_RE.finditer(text)]
+            self.paragraphs = [m.end() + 1 for m in _PARAGRAPH_END_RE.finditer(text)]
+
+    @staticmethod
+    def _in(codes, chars: str):
+        mask = codes == ord(chars[0])
+        for c in chars[1:]:
+            mask |= codes == ord(c)
+        return mask
+
+    @classmethod
+    def _build_numpy(cls, codes) -> tuple:
+        """Vectorized equivalent of the regex scan."""
+        space_next = np.ones(len(codes), dtype=bool)
+        space_next[:-1] = cls._in(codes[1:], _WHITESPACE)
+        terminator = cls._in(codes, _SENTENCE_TERMINATORS)
+
+        bare_end = terminator & space_next
+        closed_end = cls._in(codes, _SENTENCE_CLOSERS) & space_next
+        closed_end[0] = False
+        closed_end[1:] &= terminator[:-1]
+        sentences = np.flatnonzero(bare_end | closed_end) + 1
+
+        newline = codes == ord("\n")
+        paragraphs = np.flatnonzero(newline[1:] & newline[:-1]) + 2
+        return sentences, paragraphs
+
+    @property
+    def words(self):
+        """Whitespace positions (built on first use; only fallbacks need them)."""
+        if self._words is None:
+            if self._codes is not None:
+                self._words = np.flatnonzero(self._in(self._codes, _WHITESPACE))
+            else:
+                self._words = [m.start() for m in _WHITESPACE_RE.finditer(self._text)]
+        return self._words
+
+    @staticmethod
+    def _last(offsets, lo: int, hi: int) -> Optional[int]:
+        """Largest offset in (lo, hi], or None."""
+        i = bisect_right(offsets, hi)
+        if i and offsets[i - 1] > lo:
+            return int(offsets[i - 1])
+        return None
+
+    def last_sentence(self, lo: int, hi: int) -> Optional[int]:
+        """Last sentence boundary in (lo, hi]."""
+        return self._last(self.sentences, lo, hi)
+
+    def last_paragraph(self, lo: int, hi: int) -> Optional[int]:
+        """Last paragraph boundary in (lo, hi]."""
+        return self._last(self.paragraphs, lo, hi)
+
+    def last_word(self, lo: int, hi: int) -> Optional[int]:
+        """Last whitespace position in (lo, hi]."""
+        return self._last(self.words, lo, hi)
+
+
+def _last_boundary_before(
+    text: str, max_chars: int, prefer_paragraph: bool = True, index: Optional[BoundaryIndex] = None
+) -> int:
     """Return index to truncate at: full paragraph or full sentence before max_chars."""
     if len(text) <= max_chars:
         return len(text)
-    chunk = text[:max_chars + 1]
-    
-    # Prefer paragraph boundary (\n\n)
+    # Boundaries up to max_chars only depend on the next character
+    index = index or BoundaryIndex(text[:max_chars + 1])
+
+    # Prefer a paragraph boundary in the second half
     if prefer_paragraph:
-        last_pp = chunk.rfind("\n\n")
-        if last_pp > max_chars // 2:
-            return last_pp + 2
-    
-    # Sentence boundary: last . ! ? followed by space or end
-    for sep in (". ", "! ", "? ", ".\n", "!\n", "?\n"):
-        last = chunk.rfind(sep)
-        if last >= 0:
-            return last + len(sep)
-    
-    # Fallback: last space to avoid mid-word
-    last_space = chunk.rfind(" ")
-    if last_space > max_chars // 2:
-        return last_space + 1
+        boundary = index.last_paragraph(max_chars // 2, max_chars)
+        if boundary is not None:
+            return boundary
+
+    boundary = index.last_sentence(0, max_chars)
+    if boundary is not None:
+        return boundary
+
+    # Fallback: last whitespace to avoid mid-word
+    boundary = index.last_word(max_chars // 2, max_chars - 1)
+    if boundary is not None:
+        return boundary + 1
     return max_chars
 
 
+def _segment_end(text: str, start: int, segment_size: int, index: Optional[BoundaryIndex] = None) -> int:
+    """End of the segment starting at start: last sentence end, else last whitespace."""
+    end = min(start + segment_size, len(text))
+    if end < len(text):
+        index = index or BoundaryIndex(text)
+        boundary = index.last_sentence(start, end)
+        if boundary is None:
+            boundary = index.last_word(start, end - 1)
+        if boundary is not None:
+            end = boundary
+    return end
+
+
 def split_into_segments(text: str, segment_size: int = 4000) -> list[str]:
     """Split text into segments at sentence boundaries.
     
@@ -116,27 +389,10 @@ def split_into_segments(text: str, segment_size: int = 4000) -> list[str]:
     segments = []
     start = 0
     text_len = len(text)
+    index = BoundaryIndex(text)
     
     while start < text_len:
-        end = min(start + segment_size, text_len)
-        
-        if end < text_len:
-            segment = text[start:end]
-            # Find last sentence boundary
-            last_period = -1
-            for i in range(len(segment) - 1, -1, -1):
-                if segment[i] == '.':
-                    if i + 1 >= len(segment) or segment[i + 1] in ' \n\t"\'':
-                        last_period = i
-                        break
-            
-            if last_period > 0:
-                end = start + last_period + 1
-            else:
-                last_space = segment.rfind(' ')
-                if last_space > 0:
-                    end = start + last_space
-        
+        end = _segment_end(text, start, segment_size, index)
         segment_text = text[start:end].strip()
         if segment_text:
             segments.append(segment_text)
@@ -145,6 +401,79 @@ def split_into_segments(text: str, segment_size: int = 4000) -> list[str]:
     return segments if segments else [text]
 
 
+def iter_pdf_segments(
+    pdf_path: str,
+    segment_size: int = 4000,
+    max_segments: Optional[int] = None,
+    normalizer: Optional[TextNormalizer] = None,
+) -> Iterator[str]:
+    """Lazily yield the segments of split_into_segments(extract_pdf_text(pdf_path)).
+
+    Segments are cut as pages arrive and the cut stops after max_segments,
+    so a short smoke run on a long book extracts just the first few pages
+    (see iter_pdf_pages for the page store).
+
+    Args:
+        pdf_path: Path to the PDF file
+        segment_size: Target size in characters per segment
+        max_segments: Stop after this many segments (default: all)
+        normalizer: Normalize each page before splitting (an unfitted
+            normalizer is fitted on the first FIT_SAMPLE_PAGES pages)
+
+    Yields:
+        Text segments, identical to the eager split of the whole text
+    """
+    if max_segments is not None and max_segments <= 0:
+        return
+    raw_pages = iter_pdf_pages(pdf_path, ascii_only=False)
+    # Closing the page iterator stores the pages read so far
+    with closing(raw_pages):
+        yield from _segment_pages(raw_pages, segment_size, max_segments, normalizer)
+
+
+def _segment_pages(
+    pages: Iterator[str], segment_size: int, max_segments: Optional[int], normalizer: Optional[TextNormalizer]
+) -> Iterator[str]:
+    """Body of iter_pdf_segments over an iterator of page texts."""
+    if normalizer is not None:
+        # Normalized pages lose their trailing newline; keep pages apart
+        pages = (page.text + "\n" for page in normalizer.iter_normalized(pages))
+    buffer = ""
+    start = 0
+    emitted = 0
+    for page in pages:
+        if not buffer:
+            page = page.lstrip()  # the full text is stripped before splitting
+        buffer = buffer[start:] + page
+        start = 0
+        # With more than a full window of (non-trailing-whitespace) text buffered,
+        # the cut is the same one the eager split makes on the whole text
+        content_end = len(buffer.rstrip())
+        if content_end <= segment_size:
+            continue
+        index = BoundaryIndex(buffer)
+        while content_end - start > segment_size:
+            end = _segment_end(buffer, start, segment_size, index)
+            segment_text = buffer[start:end].strip()
+            start = end
+            if segment_text:
+                yield segment_text
+                emitted += 1
+                if emitted == max_segments:
+                    return
+
+    buffer = buffer[start:].rstrip()
+    if not buffer:
+        if not emitted:
+            yield ""  # split_into_segments("") is [""]: a text-less PDF still has one segment
+        return
+    for segment_text in split_into_segments(buffer, segment_size):
+        yield segment_text
+        emitted += 1
+        if emitted == max_segments:
+            return
+
+
 def split_into_pages(text: str, page_size: int = 10000) -> list[str]:
     """Split text into pages at word boundaries.
     
@@ -157,13 +486,13 @@ def split_into_pages(text: str, page_size: int = 10000) -> list[str]:
     """
     pages = []
     start = 0
+    index = BoundaryIndex(text)
     while start < len(text):
         end = min(start + page_size, len(text))
         if end < len(text):
-            segment = text[start:end]
-            last_space = segment.rfind(' ')
-            if last_space > 0:
-                end = start + last_space
+            boundary = index.last_word(start, end - 1)
+            if boundary is not None:
+                end = boundary
         pages.append(text[start:end])
         start = end
     return pages if pages else [text]
@@ -200,6 +529,129 @@ def estimate_tokens(text: str, chars_per_token: int = 4) -> int:
     return max(1, len(text) // chars_per_token)
 
 
+# ---------------------------------------------------------------------------
+# Page Packing
+# ---------------------------------------------------------------------------
+
+PAGE_SEPARATOR = "\n\n"
+
+
+def pack_pages(pages: list[str], max_tokens: int, chars_per_token: int = 4) -> list[dict]:
+    """Pack consecutive pages into prompt-sized groups.
+
+    Short pages (picture books, the bundled SpaceStory PDFs) are combined until
+    the next page would exceed max_tokens. Order is preserved and a page is never
+    split; a page larger than the budget gets a pack of its own.
+
+    Args:
+        pages: List of page texts
+        max_tokens: Token budget for the text portion of one prompt
+        chars_per_token: Estimated characters per token
+
+    Returns:
+        List of pack dicts with 'text', 'pages' (page indices) and 'offsets'
+        (start offset of each page inside 'text') keys
+    """
+    max_chars = max(1, max_tokens * chars_per_token)
+    packs = []
+    current_pages: list[int] = []
+    current_len = 0
+
+    def flush():
+        texts = [pages[i] for i in current_pages]
+        offsets = []
+        pos = 0
+        for t in texts:
+            offsets.append(pos)
+            pos += len(t) + len(PAGE_SEPARATOR)
+        packs.append({
+            "text": PAGE_SEPARATOR.join(texts),
+            "pages": list(current_pages),
+            "offsets": offsets,
+        })
+
+    for idx, page in enumerate(pages):
+        added = len(page) + (len(PAGE_SEPARATOR) if current_pages else 0)
+        if current_pages and current_len + added > max_chars:
+            flush()
+            current_pages, current_len = [], 0
+            added = len(page)
+        current_pages.append(idx)
+        current_len += added
+
+    if current_pages:
+        flush()
+    return packs
+
+
+def _folded_pages(pack: dict, pages: list[str]) -> list[str]:
+    """Whitespace-collapsed, case-folded page texts of a pack (cached on the pack)."""
+    if "folded" not in pack:
+        pack["folded"] = [" ".join(pages[i].split()).casefold() for i in pack["pages"]]
+    return pack["folded"]
+
+
+def attribute_page(snippet: str, pack: dict, pages: list[str]) -> int:
+    """Return the index of the page in a pack that contains snippet.
+
+    Matching is whitespace-insensitive and uses the start of the snippet so that
+    small LLM edits at the end of a quote still resolve. Falls back to the first
+    page of the pack when the snippet cannot be located.
+    """
+    page_ids = pack["pages"]
+    if len(page_ids) == 1 or not snippet:
+        return page_ids[0]
+    needle = " ".join(snippet.split())[:40].casefold()
+    if needle:
+        for idx, folded in zip(page_ids, _folded_pages(pack, pages)):
+            if needle in folded:
+                return idx
+    return page_ids[0]
+
+
+def _mention_pattern(name: str) -> Optional[re.Pattern]:
+    """Whole-word pattern for any token of name in folded page text, None if it has none.
+
+    Tokens must stand alone: "Al" matches "al said" but not "also".
+    """
+    tokens = [t for t in _alias_key(name)[0] if len(t) > 1]
+    if not tokens:
+        return None
+    alternatives = "|".join(re.escape(t) for t in sorted(tokens, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternatives})(?!\w)")
+
+
+def pages_mentioning(name: str, pack: dict, pages: list[str]) -> list[int]:
+    """Return the pages of a pack that mention any token of name as a whole word.
+
+    Used to keep per-page character maps precise when several pages share one
+    prompt. Falls back to every page of the pack if none match.
+    """
+    page_ids = pack["pages"]
+    pattern = _mention_pattern(name)
+    if len(page_ids) == 1 or pattern is None:
+        return list(page_ids)
+    found = [
+        idx for idx, folded in zip(page_ids, _folded_pages(pack, pages))
+        if pattern.search(folded)
+    ]
+    return found or list(page_ids)
+
+
+def pack_character_names(char_page_map: dict[str, list[int]], pack: dict) -> list[str]:
+    """Characters seen on any page of a pack, ordered by their first page in it.
+
+    Builds the name list of a packed dialog prompt from every page in the
+    pack, not just the pack's first page.
+    """
+    first_page = {}
+    for name, page_ids in char_page_map.items():
+        in_pack = [p for p in page_ids if p in pack["pages"]]
+        if in_pack:
+            first_page[name] = min(in_pack)
+    return sorted(first_page, key=first_page.get)
+
+
 # ---------------------------------------------------------------------------
 # Chapter Detection
 # ---------------------------------------------------------------------------
@@ -299,72 +751,17 @@ def validate_json(json_str: str, required_keys: Optional[list[str]] = None) -> d
 def extract_json_from_text(text: str) -> str:
     """Extract JSON object from text that may contain other content.
 
+    Think blocks, prose and code fences are skipped in one linear pass.
+    Truncated output is cut back to its last complete entry and closed, and a
+    repeated top-level key ends the object (see jsonparse.parse_llm_json).
+
     Args:
         text: Text potentially containing JSON
 
     Returns:
         Extracted JSON string or empty string if not found
     """
-    # Remove thinking tags
-    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-    text = re.sub(r'<think>.*', '', text, flags=re.DOTALL)
-    text = text.replace('/no_think', '').strip()
-
-    # Strip markdown code blocks (```json...``` or ```...```)
-    code_block_match = re.search(r'```(?:json)?\s*([\s\S]*?)```', text)
-    if code_block_match:
-        text = code_block_match.group(1).strip()
-
-    # Find the outermost JSON object by brace matching
-    start_idx = text.find('{')
-    if start_idx == -1:
-        return ""
-
-    # Count braces to find matching closing brace
-    depth = 0
-    in_string = False
-    escape_next = False
-    end_idx = -1
-    last_valid_end = -1  # Track last position where we could close
-
-    for i in range(start_idx, len(text)):
-        char = text[i]
-
-        if escape_next:
-            escape_next = False
-            continue
-
-        if char == '\\' and in_string:
-            escape_next = True
-            continue
-
-        if char == '"' and not escape_next:
-            in_string = not in_string
-            continue
-
-        if not in_string:
-            if char == '{':
-                depth += 1
-            elif char == '}':
-                depth -= 1
-                if depth == 0:
-                    end_idx = i
-                    break
-                elif depth == 1:
-                    # Track last complete character entry
-                    last_valid_end = i
-
-    if end_idx != -1:
-        return text[start_idx:end_idx + 1]
-
-    # If JSON is incomplete (LLM got cut off), try to salvage by closing braces
-    if last_valid_end != -1 and depth > 0:
-        # Extract up to last valid entry and close the JSON
-        partial = text[start_idx:last_valid_end + 1]
-        # Add closing brace for outer object
-        return partial + "\n}"
-
-    return ""
+    return parse_llm_json(text).text
 
 
 # ---------------------------------------------------------------------------
@@ -410,3 +807,240 @@ def parse_characters_from_output(output: str) -> list[str]:
         chars.append("Narrator")
     return chars
 
+
+
+# ---------------------------------------------------------------------------
+# Character Canonicalization
+# ---------------------------------------------------------------------------
+
+# Leading honorifics stripped before comparing names. Gendered titles are kept
+# apart so "Mr Dursley" and "Mrs Dursley" never collapse into one character.
+_MALE_TITLES = {"mr", "mister", "sir", "lord", "king", "prince", "father", "uncle", "master", "brother"}
+_FEMALE_TITLES = {
+    "mrs", "ms", "miss", "madam", "madame", "dame", "lady", "queen", "princess",
+    "mother", "aunt", "mistress", "sister",
+}
+_NEUTRAL_TITLES = {
+    "captain", "capt", "commander", "lieutenant", "lt", "sergeant", "sgt", "colonel",
+    "general", "admiral", "major", "doctor", "dr", "professor", "prof", "officer",
+    "agent", "detective", "chief", "saint", "st",
+}
+_ALL_TITLES = _MALE_TITLES | _FEMALE_TITLES | _NEUTRAL_TITLES
+
+
+def _alias_key(name: str) -> tuple[tuple[str, ...], str, bool]:
+    """Return (name tokens, title gender, had_title) for alias comparison.
+
+    Case-folds, treats underscores as spaces, drops punctuation and strips
+    leading titles. Gender is 'male', 'female' or '' (unknown).
+    """
+    cleaned = re.sub(r"[^\w\s'-]", " ", name.replace("_", " ")).casefold()
+    tokens = cleaned.split()
+    gender = ""
+    had_title = False
+    while len(tokens) > 1 and tokens[0] in _ALL_TITLES:
+        title = tokens.pop(0)
+        had_title = True
+        if title in _MALE_TITLES:
+            gender = "male"
+        elif title in _FEMALE_TITLES:
+            gender = "female"
+    return tuple(tokens), gender, had_title
+
+
+def is_character_name(name) -> bool:
+    """True for a usable character name: a string that is not empty or whitespace."""
+    return isinstance(name, str) and bool(name.strip())
+
+
+def canonicalize_characters(names) -> dict[str, str]:
+    """Group character name variants and map each alias to one canonical name.
+
+    Uses a union-find over the raw names:
+    1. Names with the same case-folded, title-stripped tokens are merged
+       ("Jax", "jax", "Captain Jax").
+    2. A name whose tokens are a strict subset of exactly one longer name is
+       merged into it ("Harry" -> "Harry Potter"). Ambiguous short names
+       ("Potter" with both "Harry Potter" and "Lily Potter") stay separate.
+    Names carrying conflicting gendered titles are never merged.
+
+    Args:
+        names: Iterable of raw character names (order is used for tie-breaks)
+
+    Returns:
+        Dict mapping every input name to its canonical name; blank names (see
+        is_character_name) are dropped, so callers must filter them out too
+    """
+    ordered = list(dict.fromkeys(n for n in names if is_character_name(n)))
+    if not ordered:
+        return {}
+
+    keys = {n: _alias_key(n) for n in ordered}
+    parent = {n: n for n in ordered}
+    genders = {n: {keys[n][1]} - {""} for n in ordered}
+
+    def find(n: str) -> str:
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+
+    def compatible(a: str, b: str) -> bool:
+        return len(genders[a] | genders[b]) <= 1
+
+    def union(a: str, b: str) -> bool:
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            return True
+        if not compatible(ra, rb):
+            return False
+        parent[rb] = ra
+        genders[ra] |= genders[rb]
+        return True
+
+    # Pass 1: identical keys. Ungendered names join only an unambiguous group.
+    by_key: dict[tuple[str, ...], list[str]] = {}
+    for n in ordered:
+        by_key.setdefault(keys[n][0], []).append(n)
+    for members in by_key.values():
+        gendered = {g: [m for m in members if keys[m][1] == g] for g in ("male", "female")}
+        for group in gendered.values():
+            for m in group[1:]:
+                union(group[0], m)
+        neutral = [m for m in members if not keys[m][1]]
+        for m in neutral[1:]:
+            union(neutral[0], m)
+        anchors = [g[0] for g in gendered.values() if g]
+        if neutral and len(anchors) == 1:
+            union(anchors[0], neutral[0])
+
+    # Pass 2: subset matching, longest names first so chains resolve
+    # ("Harry" -> "Harry James Potter" via "Harry Potter"). Titled short forms
+    # ("Mr Dursley") and names already split by gender are left alone.
+    token_index: dict[str, set[str]] = {}
+    for n in ordered:
+        for tok in keys[n][0]:
+            token_index.setdefault(tok, set()).add(n)
+    for n in sorted(ordered, key=lambda x: -len(keys[x][0])):
+        tokens = set(keys[n][0])
+        if not tokens or keys[n][2]:
+            continue
+        if len({find(m) for m in by_key[keys[n][0]]}) > 1:
+            continue
+        supersets = set.intersection(*(token_index[t] for t in tokens))
+        root = find(n)
+        candidates = {
+            find(m) for m in supersets
+            if len(keys[m][0]) > len(tokens) and find(m) != root
+        }
+        candidates = {c for c in candidates if compatible(root, c)}
+        if len(candidates) == 1:
+            union(candidates.pop(), n)
+
+    # Choose a display name per group: fullest name, untitled, capitalized.
+    groups: dict[str, list[str]] = {}
+    for n in ordered:
+        groups.setdefault(find(n), []).append(n)
+    order = {n: i for i, n in enumerate(ordered)}
+    aliases = {}
+    for members in groups.values():
+        canonical = max(
+            members,
+            key=lambda m: (
+                len(keys[m][0]),
+                not keys[m][2],
+                m[:1].isupper(),
+                "_" not in m,
+                -order[m],
+            ),
+        )
+        for m in members:
+            aliases[m] = canonical
+    return aliases
+
+
+def resolve_alias(name: str, aliases: dict[str, str]) -> str:
+    """Resolve a name (e.g. a dialog speaker) to its canonical character name.
+
+    Tries an exact alias hit first, then a case/title-insensitive key match.
+    Unknown names are returned unchanged.
+    """
+    if name in aliases:
+        return aliases[name]
+    tokens, gender, _ = _alias_key(name)
+    if not tokens:
+        return name
+    matches = {
+        canonical for alias, canonical in aliases.items()
+        if _alias_key(alias)[0] == tokens and gender in ("", _alias_key(alias)[1])
+    }
+    return matches.pop() if len(matches) == 1 else name
+
+
+# ---------------------------------------------------------------------------
+# Character Archetypes
+# ---------------------------------------------------------------------------
+
+# Rule-derived voice profiles for characters without enough evidence to justify
+# LLM calls. Same shape and value sets as the pass-3 voice_profile output
+# (prompts.VOICE_PROFILE_FORMAT).
+def _emotion_bias(**overrides: float) -> dict:
+    bias = {
+        "happy": 0.3, "sad": 0.1, "angry": 0.1, "neutral": 0.6, "fear": 0.1,
+        "surprise": 0.2, "excited": 0.2, "disappointed": 0.1, "curious": 0.2, "defiant": 0.1,
+    }
+    bias.update(overrides)
+    return bias
+
+
+ARCHETYPE_VOICE_PROFILES = {
+    "narrator": {"pitch": 1.0, "speed": 1.0, "energy": 0.6, "gender": "neutral", "age": "adult", "tone": "calm storyteller", "accent": "neutral", "emotion_bias": _emotion_bias(neutral=0.8)},
+    "adult_male": {"pitch": 0.9, "speed": 1.0, "energy": 0.7, "gender": "male", "age": "middle-aged", "tone": "neutral", "accent": "neutral", "emotion_bias": _emotion_bias()},
+    "adult_female": {"pitch": 1.1, "speed": 1.0, "energy": 0.7, "gender": "female", "age": "middle-aged", "tone": "neutral", "accent": "neutral", "emotion_bias": _emotion_bias()},
+    "elder": {"pitch": 0.85, "speed": 0.85, "energy": 0.5, "gender": "neutral", "age": "elderly", "tone": "measured", "accent": "neutral", "emotion_bias": _emotion_bias(sad=0.2, excited=0.1)},
+    "commander": {"pitch": 0.9, "speed": 1.05, "energy": 0.9, "gender": "neutral", "age": "middle-aged", "tone": "authoritative", "accent": "neutral", "emotion_bias": _emotion_bias(angry=0.3, defiant=0.4, happy=0.2)},
+    "child": {"pitch": 1.3, "speed": 1.15, "energy": 0.9, "gender": "neutral", "age": "kid", "tone": "lively", "accent": "neutral", "emotion_bias": _emotion_bias(happy=0.5, excited=0.6, curious=0.6, surprise=0.4, neutral=0.3)},
+    "machine": {"pitch": 1.0, "speed": 1.0, "energy": 0.5, "gender": "neutral", "age": "adult", "tone": "flat, synthetic", "accent": "neutral", "emotion_bias": _emotion_bias(neutral=0.9, happy=0.0, sad=0.0, angry=0.0, fear=0.0, excited=0.0, disappointed=0.0)},
+    "neutral": {"pitch": 1.0, "speed": 1.0, "energy": 0.7, "gender": "neutral", "age": "adult", "tone": "neutral", "accent": "neutral", "emotion_bias": _emotion_bias()},
+}
+
+_ELDER_WORDS = {"king", "queen", "lord", "lady", "professor", "prof", "grandfather", "grandmother", "grandpa", "grandma", "elder", "old"}
+_COMMANDER_WORDS = {"captain", "capt", "commander", "general", "admiral", "colonel", "major", "sergeant", "sgt", "lieutenant", "lt", "chief"}
+_CHILD_WORDS = {"little", "young", "kid", "boy", "girl", "baby"}
+_MACHINE_WORDS = {"robot", "bot", "ai", "droid", "android", "computer", "unit", "system"}
+
+
+def character_archetype(name: str) -> str:
+    """Pick an ARCHETYPE_VOICE_PROFILES key for a character from its name alone."""
+    if name.strip().casefold() == "narrator":
+        return "narrator"
+    words = re.sub(r"[^\w\s]", " ", name.replace("_", " ")).casefold().split()
+    word_set = set(words)
+    if word_set & _MACHINE_WORDS:
+        return "machine"
+    if word_set & _CHILD_WORDS:
+        return "child"
+    if word_set & _COMMANDER_WORDS:
+        return "commander"
+    if word_set & _ELDER_WORDS:
+        return "elder"
+    if word_set & _MALE_TITLES:
+        return "adult_male"
+    if word_set & _FEMALE_TITLES:
+        return "adult_female"
+    return "neutral"
+
+
+def default_voice_profile(name: str) -> dict:
+    """Return a copy of the archetype voice profile for a character name."""
+    profile = ARCHETYPE_VOICE_PROFILES[character_archetype(name)]
+    return {**profile, "emotion_bias": dict(profile["emotion_bias"])}
+
+
+def count_mentions(text: str, names) -> int:
+    """Count whole-word, case-insensitive occurrences of any of names in text."""
+    names = sorted({n.replace("_", " ").strip() for n in names if n and n.strip()}, key=len, reverse=True)
+    if not names or not text:
+        return 0
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(n) for n in names) + r")\b", re.IGNORECASE)
+    return sum(1 for _ in pattern.finditer(text))
@@ -5,24 +5,50 @@ Supports:
 - TwoPassWorkflow: Segment-based extraction (chars + dialogs) + voice profiles
 - ThreePassWorkflow: Page-based character extraction + dialog + traits/voice
 - FivePassWorkflow: Full 5-pass analysis (names → traits → dialogs → personality → voice)
+- ChapterWorkflow: Chapters analyzed in parallel with chapter-local caches, then merged
 """
 
 import json
+import threading
 import time
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
-from typing import Optional
-
+from typing import Callable, Optional
+
+from .decode import (
+    CharacterEntry,
+    CharacterNames,
+    CharacterPersonality,
+    CharacterTraits,
+    DialogList,
+    PassRecord,
+    VoiceSuggestion,
+    decode_character_entry,
+)
+from .jsonparse import JSONEvent, StreamingJSONParser, parse_llm_json
+from .merge import PartialResult, tree_merge
 from .models import BaseModel
+from .normalize import NormalizedText, TextNormalizer, normalize_pages
+from .page_store import get_page_store
 from .prompts import PromptBuilder
+from .results import DialogTable, DialogView
 from .utils import (
-    extract_json_from_text,
+    attribute_page,
+    canonicalize_characters,
+    count_mentions,
+    default_voice_profile,
+    detect_chapters_from_pages,
+    estimate_tokens,
     extract_pdf_pages,
-    extract_pdf_text,
+    is_character_name,
+    iter_pdf_segments,
+    pack_character_names,
+    pack_pages,
+    pages_mentioning,
     parse_characters_from_output,
-    split_into_segments,
+    resolve_alias,
     truncate_to_tokens,
-    validate_json,
 )
 
 
@@ -31,33 +57,69 @@ class CharacterResult:
     """Result for a single character."""
     name: str
     traits: list[str] = field(default_factory=list)
-    dialogs: list[dict] = field(default_factory=list)
+    dialogs: DialogView = field(default_factory=DialogView)  # rows of WorkflowResult.dialogs
     personality: list[str] = field(default_factory=list)
     voice_profile: dict = field(default_factory=dict)
 
+    def to_dict(self, dialogs=None) -> dict:
+        """Convert to dictionary (dialogs overrides the materialized dialog list)."""
+        return {
+            "name": self.name,
+            "traits": self.traits,
+            "dialogs": self.dialogs.to_dicts() if dialogs is None else dialogs,
+            "personality": self.personality,
+            "voice_profile": self.voice_profile,
+        }
+
+
+@dataclass
+class EvidenceThresholds:
+    """Minimum evidence before a character gets its own LLM calls.
+
+    A character qualifies when it reaches any one enabled threshold. Characters
+    below all of them get a rule-derived archetype voice profile and no
+    trait/personality/voice calls. A threshold of 0 is disabled; all 0 (the
+    default) analyzes every character.
+    """
+    min_dialogs: int = 0
+    min_mentions: int = 0
+    min_pages: int = 0
+
+    @classmethod
+    def suggested(cls) -> "EvidenceThresholds":
+        """Thresholds that mostly skip walk-on characters (1 dialog, 3 mentions or 2 pages)."""
+        return cls(min_dialogs=1, min_mentions=3, min_pages=2)
+
+    @property
+    def enabled(self) -> bool:
+        return any(t > 0 for t in (self.min_dialogs, self.min_mentions, self.min_pages))
+
+    def is_met(self, dialogs: int, mentions: int, pages: int) -> bool:
+        """Return True if the evidence reaches any enabled threshold."""
+        checks = [
+            (self.min_dialogs, dialogs),
+            (self.min_mentions, mentions),
+            (self.min_pages, pages),
+        ]
+        enabled = [(t, v) for t, v in checks if t > 0]
+        return not enabled or any(v >= t for t, v in enabled)
+
 
 @dataclass
 class WorkflowResult:
     """Result from running a workflow."""
     characters: list[CharacterResult] = field(default_factory=list)
-    dialogs: list[dict] = field(default_factory=list)
+    dialogs: DialogTable = field(default_factory=DialogTable)
     timing: dict = field(default_factory=dict)
     metadata: dict = field(default_factory=dict)
+    aliases: dict[str, str] = field(default_factory=dict)  # alias -> canonical name
 
     def to_dict(self) -> dict:
-        """Convert to dictionary for JSON serialization."""
+        """Convert to dictionary for JSON serialization (dialogs are materialized here)."""
         return {
-            "characters": [
-                {
-                    "name": c.name,
-                    "traits": c.traits,
-                    "dialogs": c.dialogs,
-                    "personality": c.personality,
-                    "voice_profile": c.voice_profile,
-                }
-                for c in self.characters
-            ],
-            "dialogs": self.dialogs,
+            "characters": [c.to_dict() for c in self.characters],
+            "dialogs": self.dialogs.to_dicts(),
+            "aliases": self.aliases,
             "timing": self.timing,
             "metadata": self.metadata,
         }
@@ -66,6 +128,10 @@ class WorkflowResult:
 class BaseWorkflow(ABC):
     """Abstract base class for analysis workflows."""
 
+    # Used to size page packs when the caller doesn't pass context_size
+    DEFAULT_CONTEXT_SIZE = 8192
+    DEFAULT_MAX_OUTPUT_TOKENS = 2048
+
     def __init__(self, model: BaseModel, prompt_builder: PromptBuilder):
         """Initialize workflow.
 
@@ -75,19 +141,244 @@ class BaseWorkflow(ABC):
         """
         self.model = model
         self.prompt_builder = prompt_builder
+        # One entry per model call: stage, token counts, latency (see _generate)
+        self.call_log: list[dict] = []
+        # Keep prompt text in call_log entries (used by the dry-run planner)
+        self.record_prompts = False
+        # Called with each character as soon as it is final (streaming result writers)
+        self.on_character: Optional[Callable[[CharacterResult], None]] = None
+        # Offset maps of the run's normalized pages, until the dialogs are compacted
+        self._page_maps: Optional[list[NormalizedText]] = None
+        self._call_log_lock = threading.Lock()
 
     @abstractmethod
     def run(self, pdf_path: str, **kwargs) -> WorkflowResult:
         """Run the workflow on a PDF file."""
         pass
 
-    def _parse_json_response(self, response: str) -> dict:
-        """Parse JSON from model response."""
-        json_str = extract_json_from_text(response)
-        if not json_str:
-            return {}
-        result = validate_json(json_str)
-        return result.get("data", {}) if result["valid"] else {}
+    def _generate(self, prompt: str, stage: str) -> str:
+        """Generate with the model and record the call in call_log.
+
+        Token counts come from the backend when it reports usage and fall back
+        to character-based estimates otherwise.
+        """
+        t0 = time.perf_counter()
+        response = self.model.generate(prompt)
+        self._log_call(stage, prompt, response, time.perf_counter() - t0)
+        return response
+
+    def _generate_streaming(
+        self,
+        prompt: str,
+        stage: str,
+        parser: StreamingJSONParser,
+        on_event: Optional[Callable[[JSONEvent], None]] = None,
+    ) -> str:
+        """Stream a generation through an incremental JSON parser.
+
+        on_event is called for every entry/element as soon as it closes, while
+        decoding continues. Generation is abandoned once the parser is done
+        (root closed, or a repeated key showed the model is looping).
+
+        Returns:
+            The raw text received
+        """
+        t0 = time.perf_counter()
+        chunks = []
+        stream = self.model.generate_stream(prompt)
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                for event in parser.feed(chunk):
+                    if on_event:
+                        on_event(event)
+                if parser.done:
+                    break
+        finally:
+            stream.close()
+        for event in parser.finish():
+            if on_event:
+                on_event(event)
+        response = "".join(chunks)
+        self._log_call(stage, prompt, response, time.perf_counter() - t0)
+        return response
+
+    def _log_call(self, stage: str, prompt: str, response: str, seconds: float) -> None:
+        """Append one model call to call_log."""
+        usage = self.model.pop_usage() or {}
+        entry = {
+            "stage": stage,
+            "prompt_tokens": usage.get("prompt_tokens") or estimate_tokens(prompt),
+            "output_tokens": usage.get("completion_tokens") or estimate_tokens(response),
+            "measured_tokens": bool(usage),
+            "seconds": seconds,
+        }
+        if self.record_prompts:
+            entry["prompt"] = prompt
+        with self._call_log_lock:
+            self.call_log.append(entry)
+
+    def call_summary(self) -> dict:
+        """Aggregate call_log per stage: calls, prompt/output tokens, seconds."""
+        summary: dict[str, dict] = {}
+        for entry in self.call_log:
+            stage = summary.setdefault(
+                entry["stage"], {"calls": 0, "prompt_tokens": 0, "output_tokens": 0, "seconds": 0.0}
+            )
+            stage["calls"] += 1
+            stage["prompt_tokens"] += entry["prompt_tokens"]
+            stage["output_tokens"] += entry["output_tokens"]
+            stage["seconds"] += entry["seconds"]
+        return summary
+
+    def _parse_pass(self, response: str, schema: type[PassRecord]) -> PassRecord:
+        """Parse a model response straight into the typed record of its pass schema."""
+        return schema.decode(parse_llm_json(response).data)
+
+    def _pack_token_budget(self, templates: list[str], max_chars: int, **kwargs) -> int:
+        """Token budget for the page text of one packed prompt.
+
+        The budget is what the pass can really carry: the builder's text cap
+        (max_chars), bounded by the context window minus the template overhead
+        and the output reservation. An explicit pack_tokens kwarg wins; 0 keeps
+        one page per prompt.
+        """
+        pack_tokens = kwargs.get("pack_tokens")
+        if pack_tokens is not None:
+            return pack_tokens
+        context_size = kwargs.get("context_size") or self.DEFAULT_CONTEXT_SIZE
+        overhead = max(estimate_tokens(t) for t in templates)
+        available = context_size - overhead - self.DEFAULT_MAX_OUTPUT_TOKENS
+        return max(0, min(max_chars // 4, available))
+
+    def _extract_pages(
+        self, pdf_path: str, max_pages: int, result: WorkflowResult, normalize: bool = False, **kwargs
+    ) -> list[str]:
+        """Page texts for the run, layout-normalized when normalize=True (see normalize.py)."""
+        pages = extract_pdf_pages(pdf_path, max_pages=max_pages)
+        self._page_maps = None
+        if not normalize:
+            return pages
+        normalizer = TextNormalizer()
+        self._page_maps = normalize_pages(pages, normalizer)
+        result.metadata["normalization"] = normalizer.stats.to_dict()
+        return [page.text for page in self._page_maps]
+
+    def _extract_segments(
+        self,
+        pdf_path: str,
+        segment_size: int,
+        max_segments: int,
+        result: WorkflowResult,
+        normalize: bool = False,
+        **kwargs,
+    ) -> list[str]:
+        """Text segments for the run, split from layout-normalized pages when normalize=True."""
+        normalizer = TextNormalizer() if normalize else None
+        segments = list(iter_pdf_segments(pdf_path, segment_size, max_segments, normalizer=normalizer))
+        if normalizer:
+            result.metadata["normalization"] = normalizer.stats.to_dict()
+        return segments
+
+    def _pack_pages(self, pages: list[str], **kwargs) -> list[dict]:
+        """Pack pages for the pass-1 and dialog prompts (both cap text at 10000 chars)."""
+        templates = [
+            self.prompt_builder.build_pass1_prompt(""),
+            # Dialog prompts also carry character names, up to 10 per packed page
+            # (_pack_names); the extra pages' names are a few dozen tokens each
+            self.prompt_builder.build_pass2_5_dialog_prompt("", ["Character Name"] * 10),
+        ]
+        return pack_pages(pages, self._pack_token_budget(templates, max_chars=10000, **kwargs))
+
+    @staticmethod
+    def _pack_names(pack: dict) -> int:
+        """Character names a packed dialog prompt may list: 10 per page of the pack."""
+        return 10 * len(pack["pages"])
+
+    def _has_evidence(
+        self,
+        result: WorkflowResult,
+        name: str,
+        dialogs: int,
+        texts: list[str],
+        aliases: list[str],
+        skipped_passes: list[str],
+        pages: Optional[int] = None,
+        **kwargs,
+    ) -> bool:
+        """Check a character against the evidence thresholds.
+
+        Mentions of aliases are counted in texts (pages or segments) only when
+        a threshold is enabled; with the default thresholds every character
+        qualifies without a scan. pages defaults to the number of texts that
+        mention the character.
+
+        Characters below the thresholds are recorded in
+        result.metadata["skipped_calls"] together with the passes whose calls
+        were skipped for them.
+        """
+        thresholds = kwargs.get("evidence") or EvidenceThresholds()
+        if not thresholds.enabled:
+            return True
+        mentions = [count_mentions(text, aliases) for text in texts]
+        if pages is None:
+            pages = sum(1 for m in mentions if m)
+        if thresholds.is_met(dialogs, sum(mentions), pages):
+            return True
+        skipped = result.metadata.setdefault(
+            "skipped_calls", {"total": 0, "by_pass": {}, "characters": []}
+        )
+        for pass_name in skipped_passes:
+            skipped["by_pass"][pass_name] = skipped["by_pass"].get(pass_name, 0) + 1
+            skipped["total"] += 1
+        skipped["characters"].append(name)
+        return False
+
+    @staticmethod
+    def _alias_groups(aliases: dict[str, str]) -> dict[str, list[str]]:
+        """Invert an alias map into canonical name -> all of its aliases."""
+        groups: dict[str, list[str]] = {}
+        for alias, canonical in aliases.items():
+            groups.setdefault(canonical, []).append(alias)
+        return groups
+
+    def _add_character(self, result: WorkflowResult, char_result: CharacterResult) -> None:
+        """Append a finished character to the result and hand it to on_character."""
+        result.characters.append(char_result)
+        if self.on_character:
+            self.on_character(char_result)
+
+    def _apply_aliases(self, dialogs: DialogTable, aliases: dict[str, str]) -> None:
+        """Rewrite dialog speakers in place to their canonical character names."""
+        dialogs.map_speakers(lambda speaker: resolve_alias(speaker, aliases))
+
+    def _record_page_spans(self, dialogs: DialogTable) -> None:
+        """Record each dialog's "span" in the original page text.
+
+        Spans are mapped back through the normalization offset maps when the
+        pages were normalized. Paged workflows call this before the first
+        character goes to on_character, so streamed characters carry the
+        same dialog rows as result.to_dict().
+        """
+        dialogs.record_page_spans(self._page_maps)
+
+    def _compact_dialogs(self, dialogs: DialogTable, pdf_path: str, paged: bool) -> None:
+        """Detach a finished dialog table from the run's page texts.
+
+        Page spans (see _record_page_spans) are rebound to the page store's
+        memory-mapped copy of the book when it holds those same pages;
+        otherwise (normalized pages, segment spans) the texts are packed into
+        the table.
+        """
+        store = None
+        if paged:
+            store = get_page_store() if self._page_maps is None else None
+        self._page_maps = None
+        cached = store.get(pdf_path, ascii_only=True) if store else None
+        if cached is not None and len(cached) < len(dialogs.sources):
+            cached.close()
+            cached = None
+        dialogs.compact(cached)
 
 
 class TwoPassWorkflow(BaseWorkflow):
@@ -114,61 +405,75 @@ class TwoPassWorkflow(BaseWorkflow):
         timing = {}
 
         # Extract text and split into segments
-        t0 = time.time()
-        text = extract_pdf_text(pdf_path)
-        segments = split_into_segments(text, segment_size)[:max_segments]
-        timing["extraction"] = time.time() - t0
+        t0 = time.perf_counter()
+        segments = self._extract_segments(pdf_path, segment_size, max_segments, result, **kwargs)
+        timing["extraction"] = time.perf_counter() - t0
         result.metadata["num_segments"] = len(segments)
 
         # Pass 1: Extract characters and dialogs from each segment
-        t0 = time.time()
+        t0 = time.perf_counter()
         all_characters = set()
-        all_dialogs = []
+        all_dialogs = DialogTable(segments)
 
         for i, segment in enumerate(segments):
             # Get characters
             prompt = self.prompt_builder.build_pass1_prompt(segment)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            chars = data.get("characters", [])
+            response = self._generate(prompt, "pass1")
+            data = self._parse_pass(response, CharacterNames)
+            chars = data.characters
             all_characters.update(chars)
 
             # Get dialogs
             prompt = self.prompt_builder.build_pass2_5_dialog_prompt(segment, list(chars))
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            dialogs = data.get("dialogs", [])
-            all_dialogs.extend(dialogs)
+            response = self._generate(prompt, "pass1")
+            data = self._parse_pass(response, DialogList)
+            all_dialogs.extend(data.dialogs, source=i)
 
-        timing["pass1"] = time.time() - t0
+        timing["pass1"] = time.perf_counter() - t0
 
         # Ensure Narrator is included
         all_characters.add("Narrator")
 
+        # Merge name variants so each character gets one voice-profile call
+        result.aliases = canonicalize_characters(all_characters)
+        all_characters = set(result.aliases.values())
+        self._apply_aliases(all_dialogs, result.aliases)
+
         # Pass 2: Generate voice profiles
-        t0 = time.time()
+        t0 = time.perf_counter()
+        alias_groups = self._alias_groups(result.aliases)
+        dialogs_by_speaker = all_dialogs.by_speaker()
         for char_name in all_characters:
             char_result = CharacterResult(name=char_name)
 
             # Collect dialogs for this character
-            char_dialogs = [d for d in all_dialogs if d.get("speaker") == char_name]
+            char_dialogs = dialogs_by_speaker.get(char_name) or DialogView(all_dialogs)
             char_result.dialogs = char_dialogs
 
+            # Minor characters get an archetype profile instead of an LLM call
+            if not self._has_evidence(
+                result, char_name, len(char_dialogs), segments, alias_groups[char_name], ["pass2"], **kwargs,
+            ):
+                char_result.voice_profile = default_voice_profile(char_name)
+                self._add_character(result, char_result)
+                continue
+
             # Build context from dialogs
-            context = " ".join(d.get("text", "") for d in char_dialogs[:20])
+            context = " ".join(char_dialogs[:20].texts())
             if not context:
                 context = f"Character named {char_name}"
 
             # Generate voice profile
             prompt = self.prompt_builder.build_pass3_with_context_prompt(char_name, context)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            char_result.traits = data.get("traits", [])
-            char_result.voice_profile = data.get("voice_profile", {})
+            response = self._generate(prompt, "pass2")
+            data = self._parse_pass(response, VoiceSuggestion)
+            char_result.traits = data.traits
+            char_result.voice_profile = data.voice_profile
 
-            result.characters.append(char_result)
+            self._add_character(result, char_result)
 
-        timing["pass2"] = time.time() - t0
+        timing["pass2"] = time.perf_counter() - t0
+        self._compact_dialogs(all_dialogs, pdf_path, paged=False)
         result.dialogs = all_dialogs
         result.timing = timing
         return result
@@ -196,47 +501,64 @@ class ThreePassWorkflow(BaseWorkflow):
         result = WorkflowResult()
         timing = {}
 
-        # Extract pages
-        t0 = time.time()
-        pages = extract_pdf_pages(pdf_path)[:max_pages]
-        timing["extraction"] = time.time() - t0
+        # Extract pages and pack short ones into shared prompts
+        t0 = time.perf_counter()
+        pages = self._extract_pages(pdf_path, max_pages, result, **kwargs)
+        packs = self._pack_pages(pages, **kwargs)
+        timing["extraction"] = time.perf_counter() - t0
         result.metadata["num_pages"] = len(pages)
+        result.metadata["num_packs"] = len(packs)
 
-        # Pass 1: Extract characters from each page
-        t0 = time.time()
+        # Pass 1: Extract characters from each pack
+        t0 = time.perf_counter()
         char_page_map: dict[str, list[int]] = {}  # char -> pages where they appear
 
-        for page_idx, page_text in enumerate(pages):
-            prompt = self.prompt_builder.build_pass1_prompt(page_text)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            chars = data.get("characters", [])
+        for pack in packs:
+            prompt = self.prompt_builder.build_pass1_prompt(pack["text"])
+            response = self._generate(prompt, "pass1")
+            data = self._parse_pass(response, CharacterNames)
+            chars = [c for c in data.characters if is_character_name(c)]
 
             for char in chars:
                 if char not in char_page_map:
                     char_page_map[char] = []
-                char_page_map[char].append(page_idx)
+                for page_idx in pages_mentioning(char, pack, pages):
+                    if page_idx not in char_page_map[char]:
+                        char_page_map[char].append(page_idx)
 
-        timing["pass1"] = time.time() - t0
+        timing["pass1"] = time.perf_counter() - t0
         char_page_map["Narrator"] = list(range(len(pages)))
 
+        # Merge name variants, combining the pages each alias appeared on
+        result.aliases = canonicalize_characters(char_page_map)
+        merged_page_map: dict[str, list[int]] = {}
+        for alias, page_indices in char_page_map.items():
+            merged = merged_page_map.setdefault(result.aliases[alias], [])
+            merged.extend(p for p in page_indices if p not in merged)
+        char_page_map = {c: sorted(p) for c, p in merged_page_map.items()}
+
         # Pass 2: Extract dialogs
-        t0 = time.time()
-        all_dialogs = []
-        for page_idx, page_text in enumerate(pages):
-            page_chars = [c for c, p in char_page_map.items() if page_idx in p]
-            prompt = self.prompt_builder.build_pass2_5_dialog_prompt(page_text, page_chars)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            dialogs = data.get("dialogs", [])
-            for d in dialogs:
-                d["page"] = page_idx
-            all_dialogs.extend(dialogs)
-
-        timing["pass2"] = time.time() - t0
+        t0 = time.perf_counter()
+        all_dialogs = DialogTable(pages)
+        for pack in packs:
+            prompt = self.prompt_builder.build_pass2_5_dialog_prompt(
+                pack["text"], pack_character_names(char_page_map, pack), max_names=self._pack_names(pack)
+            )
+            response = self._generate(prompt, "pass2")
+            data = self._parse_pass(response, DialogList)
+            for d in data.dialogs:
+                if isinstance(d, dict):
+                    page = attribute_page(d.get("text", ""), pack, pages)
+                    all_dialogs.append(d, page=page, source=page)
+
+        self._apply_aliases(all_dialogs, result.aliases)
+        timing["pass2"] = time.perf_counter() - t0
+        self._record_page_spans(all_dialogs)
 
         # Pass 3: Generate traits and voice profiles
-        t0 = time.time()
+        t0 = time.perf_counter()
+        alias_groups = self._alias_groups(result.aliases)
+        dialogs_by_speaker = all_dialogs.by_speaker()
         for char_name, page_indices in char_page_map.items():
             char_result = CharacterResult(name=char_name)
 
@@ -247,18 +569,28 @@ class ThreePassWorkflow(BaseWorkflow):
             context = truncate_to_tokens("\n\n".join(context_parts), max_tokens=2000)
 
             # Get dialogs for this character
-            char_result.dialogs = [d for d in all_dialogs if d.get("speaker") == char_name]
+            char_result.dialogs = dialogs_by_speaker.get(char_name) or DialogView(all_dialogs)
+
+            # Minor characters get an archetype profile instead of an LLM call
+            if not self._has_evidence(
+                result, char_name, len(char_result.dialogs), [pages[p] for p in page_indices],
+                alias_groups[char_name], ["pass3"], pages=len(page_indices), **kwargs,
+            ):
+                char_result.voice_profile = default_voice_profile(char_name)
+                self._add_character(result, char_result)
+                continue
 
             # Generate traits + voice profile
             prompt = self.prompt_builder.build_pass3_with_context_prompt(char_name, context)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            char_result.traits = data.get("traits", [])
-            char_result.voice_profile = data.get("voice_profile", {})
+            response = self._generate(prompt, "pass3")
+            data = self._parse_pass(response, VoiceSuggestion)
+            char_result.traits = data.traits
+            char_result.voice_profile = data.voice_profile
 
-            result.characters.append(char_result)
+            self._add_character(result, char_result)
 
-        timing["pass3"] = time.time() - t0
+        timing["pass3"] = time.perf_counter() - t0
+        self._compact_dialogs(all_dialogs, pdf_path, paged=True)
         result.dialogs = all_dialogs
         result.timing = timing
         return result
@@ -288,67 +620,82 @@ class BatchedWorkflow(BaseWorkflow):
         timing = {}
 
         # Extract text and split into segments
-        t0 = time.time()
-        text = extract_pdf_text(pdf_path)
-        segments = split_into_segments(text, segment_size)[:max_segments]
-        timing["extraction"] = time.time() - t0
+        t0 = time.perf_counter()
+        segments = self._extract_segments(pdf_path, segment_size, max_segments, result, **kwargs)
+        timing["extraction"] = time.perf_counter() - t0
         result.metadata["num_segments"] = len(segments)
 
         # Process each segment with batched analysis
-        t0 = time.time()
+        t0 = time.perf_counter()
         all_characters: dict[str, CharacterResult] = {}
-        all_dialogs = []
+        all_dialogs = DialogTable(segments)
         raw_outputs: list[str] = []  # Collect raw LLM outputs
 
         verbose = kwargs.get("verbose", False)
         raw_output_file = kwargs.get("raw_output_file", None)
 
+        stream_stats = {"truncated": 0, "stopped_on_duplicate": 0}
+
         for i, segment in enumerate(segments):
             prompt = self.prompt_builder.build_batched_analysis_prompt(segment)
-            response = self.model.generate(prompt)
-
-            # Collect raw output
-            raw_outputs.append(f"=== Segment {i+1}/{len(segments)} ===\n{response}\n")
-
-            if verbose:
-                print(f"\n[BatchedWorkflow] Segment {i+1}/{len(segments)} response ({len(response)} chars):")
-                print(response[:2000] + ("..." if len(response) > 2000 else ""))
-
-            data = self._parse_batched_response(response, verbose=verbose)
 
-            if verbose:
-                print(f"[BatchedWorkflow] Parsed {len(data)} characters: {list(data.keys())}")
-
-            # Process each character from the batched response
-            for char_name, char_data in data.items():
+            def add_character(event: JSONEvent, segment_index: int = i) -> None:
+                """Merge one character entry as soon as the model closes it."""
+                if event.kind != "entry":
+                    return
+                char_data: CharacterEntry = event.value
+                char_name = event.key
+                if not is_character_name(char_name):
+                    # A blank key names no character; keep its lines as unattributed
+                    for dialog_text in char_data.dialogs:
+                        all_dialogs.append(
+                            {"speaker": "Unknown", "text": dialog_text},
+                            segment=segment_index,
+                            source=segment_index,
+                        )
+                    return
                 if char_name not in all_characters:
                     all_characters[char_name] = CharacterResult(name=char_name)
 
                 char_result = all_characters[char_name]
 
-                # Extract dialogs (D key)
-                dialogs = char_data.get("dialogs", [])
-                for dialog_text in dialogs:
-                    dialog_entry = {
-                        "speaker": char_name,
-                        "text": dialog_text,
-                        "segment": i,
-                    }
-                    char_result.dialogs.append(dialog_entry)
-                    all_dialogs.append(dialog_entry)
+                # Extract dialogs (D key); grouped per character once aliases are merged
+                for dialog_text in char_data.dialogs:
+                    all_dialogs.append(
+                        {"speaker": char_name, "text": dialog_text},
+                        segment=segment_index,
+                        source=segment_index,
+                    )
 
                 # Extract traits (T key)
-                traits = char_data.get("traits", [])
-                for trait in traits:
+                for trait in char_data.traits:
                     if trait not in char_result.traits:
                         char_result.traits.append(trait)
 
                 # Extract voice profile (V key)
-                voice_str = char_data.get("voice", "")
+                voice_str = char_data.voice
                 if voice_str and not char_result.voice_profile:
                     char_result.voice_profile = self._parse_voice_string(voice_str)
 
-        timing["batched_analysis"] = time.time() - t0
+            parser = StreamingJSONParser(decode_entry=decode_character_entry)
+            response = self._generate_streaming(prompt, "batched_analysis", parser, add_character)
+            stream_stats["truncated"] += parser.truncated
+            stream_stats["stopped_on_duplicate"] += parser.stopped_on_duplicate
+
+            # Collect raw output
+            raw_outputs.append(f"=== Segment {i+1}/{len(segments)} ===\n{response}\n")
+
+            if verbose:
+                print(f"\n[BatchedWorkflow] Segment {i+1}/{len(segments)} response ({len(response)} chars):")
+                print(response[:2000] + ("..." if len(response) > 2000 else ""))
+                print(f"[BatchedWorkflow] Parsed {len(parser.entries)} characters: {list(parser.entries.keys())}")
+                if parser.truncated:
+                    print("[BatchedWorkflow] Response truncated, kept completed entries")
+                if parser.stopped_on_duplicate:
+                    print(f"[BatchedWorkflow] Stopped at repeated key {parser.duplicate_keys[0]!r}")
+
+        timing["batched_analysis"] = time.perf_counter() - t0
+        result.metadata["stream"] = stream_stats
 
         # Save raw outputs to file if requested
         if raw_output_file:
@@ -361,62 +708,43 @@ class BatchedWorkflow(BaseWorkflow):
         if "Narrator" not in all_characters:
             all_characters["Narrator"] = CharacterResult(name="Narrator")
 
-        result.characters = list(all_characters.values())
+        # Merge name variants seen across segments ("Mr Dursley" / "Mr_Dursley")
+        result.aliases = canonicalize_characters(all_characters)
+        merged: dict[str, CharacterResult] = {}
+        for alias, char_result in all_characters.items():
+            canonical = result.aliases[alias]
+            if canonical not in merged:
+                merged[canonical] = CharacterResult(name=canonical)
+            target = merged[canonical]
+            target.traits.extend(t for t in char_result.traits if t not in target.traits)
+            if not target.voice_profile:
+                target.voice_profile = char_result.voice_profile
+        self._apply_aliases(all_dialogs, result.aliases)
+        for name, dialogs in all_dialogs.by_speaker().items():
+            if name in merged:
+                merged[name].dialogs = dialogs
+        all_characters = merged
+
+        for char_result in all_characters.values():
+            self._add_character(result, char_result)
+        self._compact_dialogs(all_dialogs, pdf_path, paged=False)
         result.dialogs = all_dialogs
         result.timing = timing
         return result
 
-    def _parse_batched_response(self, response: str, verbose: bool = False) -> dict[str, dict]:
+    def _parse_batched_response(self, response: str, verbose: bool = False) -> dict[str, CharacterEntry]:
         """Parse batched analysis response.
 
         Expected format:
         {"CharacterName": {"D": ["dialog1"], "T": ["trait1"], "V": "male,young,neutral,1.0,1.0"}}
 
         Returns:
-            Dict mapping character names to normalized data with keys: dialogs, traits, voice
+            Dict mapping character names to CharacterEntry records (dialogs, traits, voice)
         """
-        json_str = extract_json_from_text(response)
-        if not json_str:
-            if verbose:
-                print("[BatchedWorkflow] extract_json_from_text returned empty")
-            return {}
-
-        if verbose:
-            print(f"[BatchedWorkflow] Extracted JSON ({len(json_str)} chars): {json_str[:500]}...")
-
-        result = validate_json(json_str)
-        if not result["valid"]:
-            if verbose:
-                print(f"[BatchedWorkflow] validate_json failed: {result.get('error', 'unknown')}")
-            return {}
-
-        data = result["data"]
-        normalized = {}
-
-        for name, char_data in data.items():
-            if not isinstance(char_data, dict):
-                continue
-
-            normalized[name] = {
-                "dialogs": [],
-                "traits": [],
-                "voice": ""
-            }
-
-            # Handle different key formats (D/d/dialogs, T/t/traits, V/v/voice)
-            for key, value in char_data.items():
-                key_lower = key.lower()
-                if key_lower in ('d', 'dialogs', 'dialogue', 'dialogues'):
-                    if isinstance(value, list):
-                        normalized[name]["dialogs"] = value
-                elif key_lower in ('t', 'traits', 'trait'):
-                    if isinstance(value, list):
-                        normalized[name]["traits"] = value
-                elif key_lower in ('v', 'voice', 'voice_profile'):
-                    if isinstance(value, str):
-                        normalized[name]["voice"] = value
-
-        return normalized
+        parser = StreamingJSONParser.parse(response, decode_entry=decode_character_entry)
+        if verbose and parser.root_type is None:
+            print("[BatchedWorkflow] No JSON object found in response")
+        return parser.entries
 
     def _parse_voice_string(self, voice_str: str) -> dict:
         """Parse voice profile string into structured dict.
@@ -464,6 +792,9 @@ class FivePassWorkflow(BaseWorkflow):
         Pass 4: Infer personality from traits
         Pass 5: Generate voice profiles from personality
 
+        Pass 3 runs right after pass 1 so that dialog counts are available when
+        deciding which characters have enough evidence for passes 2, 4 and 5.
+
         Args:
             pdf_path: Path to PDF file
             max_pages: Maximum pages to process
@@ -472,82 +803,288 @@ class FivePassWorkflow(BaseWorkflow):
         timing = {}
 
         # Extract pages
-        t0 = time.time()
-        pages = extract_pdf_pages(pdf_path)[:max_pages]
+        t0 = time.perf_counter()
+        pages = self._extract_pages(pdf_path, max_pages, result, **kwargs)
         full_text = "\n\n".join(pages)
-        timing["extraction"] = time.time() - t0
+        packs = self._pack_pages(pages, **kwargs)
+        timing["extraction"] = time.perf_counter() - t0
         result.metadata["num_pages"] = len(pages)
+        result.metadata["num_packs"] = len(packs)
 
         # Pass 1: Extract all character names
-        t0 = time.time()
+        t0 = time.perf_counter()
         all_characters = set()
-        for page_text in pages:
-            prompt = self.prompt_builder.build_pass1_prompt(page_text)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            chars = data.get("characters", [])
+        pack_chars: list[list[str]] = []  # names pass 1 found in each pack
+        for pack in packs:
+            prompt = self.prompt_builder.build_pass1_prompt(pack["text"])
+            response = self._generate(prompt, "pass1")
+            data = self._parse_pass(response, CharacterNames)
+            chars = [c for c in data.characters if is_character_name(c)]
             all_characters.update(chars)
+            pack_chars.append(chars)
 
         all_characters.add("Narrator")
-        timing["pass1"] = time.time() - t0
+        result.aliases = canonicalize_characters(all_characters)
+        all_characters = set(result.aliases.values())
+        timing["pass1"] = time.perf_counter() - t0
+
+        # Pass 3: Extract dialogs
+        t0 = time.perf_counter()
+        all_dialogs = DialogTable(pages)
+        others = sorted(all_characters)
+        for pack, chars in zip(packs, pack_chars):
+            # Every known character, those pass 1 found in this pack first: a
+            # speaker may be named on another page
+            names = list(dict.fromkeys([result.aliases[c] for c in chars] + ["Narrator"] + others))
+            prompt = self.prompt_builder.build_pass2_5_dialog_prompt(
+                pack["text"], names, max_names=self._pack_names(pack)
+            )
+            response = self._generate(prompt, "pass3")
+            data = self._parse_pass(response, DialogList)
+            for d in data.dialogs:
+                if isinstance(d, dict):
+                    page = attribute_page(d.get("text", ""), pack, pages)
+                    all_dialogs.append(d, page=page, source=page)
+
+        self._apply_aliases(all_dialogs, result.aliases)
+        timing["pass3"] = time.perf_counter() - t0
+        self._record_page_spans(all_dialogs)
+
+        # Evidence gate: minor characters skip passes 2, 4 and 5
+        dialogs_by_speaker = all_dialogs.by_speaker()
+        char_dialogs = {c: dialogs_by_speaker.get(c) or DialogView(all_dialogs) for c in all_characters}
+        alias_groups = self._alias_groups(result.aliases)
+        analyzed = set()
+        for char_name in all_characters:
+            if self._has_evidence(
+                result, char_name, len(char_dialogs[char_name]), pages, alias_groups[char_name],
+                ["pass2", "pass4", "pass5"], **kwargs,
+            ):
+                analyzed.add(char_name)
 
         # Pass 2: Extract traits for each character
-        t0 = time.time()
+        t0 = time.perf_counter()
         char_traits: dict[str, list[str]] = {}
         text_for_traits = truncate_to_tokens(full_text, max_tokens=1500)
 
-        for char_name in all_characters:
+        for char_name in analyzed:
             prompt = self.prompt_builder.build_pass2_trait_prompt(char_name, text_for_traits)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            char_traits[char_name] = data.get("traits", [])
+            response = self._generate(prompt, "pass2")
+            data = self._parse_pass(response, CharacterTraits)
+            char_traits[char_name] = data.traits
 
-        timing["pass2"] = time.time() - t0
-
-        # Pass 3: Extract dialogs
-        t0 = time.time()
-        all_dialogs = []
-        for page_idx, page_text in enumerate(pages):
-            prompt = self.prompt_builder.build_pass2_5_dialog_prompt(page_text, list(all_characters))
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            dialogs = data.get("dialogs", [])
-            for d in dialogs:
-                d["page"] = page_idx
-            all_dialogs.extend(dialogs)
-
-        timing["pass3"] = time.time() - t0
+        timing["pass2"] = time.perf_counter() - t0
 
         # Pass 4: Infer personality from traits
-        t0 = time.time()
+        t0 = time.perf_counter()
         char_personality: dict[str, list[str]] = {}
         for char_name, traits in char_traits.items():
             prompt = self.prompt_builder.build_pass3_personality_prompt(char_name, traits)
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            char_personality[char_name] = data.get("personality", [])
+            response = self._generate(prompt, "pass4")
+            data = self._parse_pass(response, CharacterPersonality)
+            char_personality[char_name] = data.personality
 
-        timing["pass4"] = time.time() - t0
+        timing["pass4"] = time.perf_counter() - t0
 
         # Pass 5: Generate voice profiles
-        t0 = time.time()
+        t0 = time.perf_counter()
         for char_name in all_characters:
             char_result = CharacterResult(name=char_name)
             char_result.traits = char_traits.get(char_name, [])
             char_result.personality = char_personality.get(char_name, [])
-            char_result.dialogs = [d for d in all_dialogs if d.get("speaker") == char_name]
+            char_result.dialogs = char_dialogs[char_name]
+
+            if char_name not in analyzed:
+                char_result.voice_profile = default_voice_profile(char_name)
+                self._add_character(result, char_result)
+                continue
 
             prompt = self.prompt_builder.build_pass4_voice_prompt(
                 char_name, char_result.personality
             )
-            response = self.model.generate(prompt)
-            data = self._parse_json_response(response)
-            char_result.voice_profile = data.get("voice_profile", {})
+            response = self._generate(prompt, "pass5")
+            data = self._parse_pass(response, VoiceSuggestion)
+            char_result.voice_profile = data.voice_profile
 
-            result.characters.append(char_result)
+            self._add_character(result, char_result)
 
-        timing["pass5"] = time.time() - t0
+        timing["pass5"] = time.perf_counter() - t0
+        self._compact_dialogs(all_dialogs, pdf_path, paged=True)
         result.dialogs = all_dialogs
         result.timing = timing
         return result
 
+
+class ChapterWorkflow(BaseWorkflow):
+    """Chapter-sharded workflow: each chapter is an independent unit of work.
+
+    Chapters from detect_chapters_from_pages() run pass 1 (names) and pass 2
+    (dialogs) in parallel, each keeping its own character and context cache.
+    The caches become PartialResults that are reduced by pairwise tree merges
+    (see merge.py), and pass 3 (traits + voice) runs once per canonical
+    character, with context sampled from every chapter it appears in.
+    """
+
+    # Per-chapter context kept for each character, and the final pass-3 budget
+    CHAPTER_CONTEXT_TOKENS = 600
+    CONTEXT_TOKENS = 2000
+
+    def run(
+        self,
+        pdf_path: str,
+        max_pages: int = 50,
+        max_workers: int = 4,
+        **kwargs,
+    ) -> WorkflowResult:
+        """Run chapter-sharded workflow.
+
+        Pass 1+2 (per chapter, parallel): character names and dialogs
+        Pass 3 (per character): traits and voice profile from merged context
+
+        Args:
+            pdf_path: Path to PDF file
+            max_pages: Maximum pages to process
+            max_workers: Chapters analyzed concurrently
+            merge_processes: Worker processes for the tree merge (kwarg, default 0)
+        """
+        result = WorkflowResult()
+        timing = {}
+
+        # Extract pages and detect chapters
+        t0 = time.perf_counter()
+        pages = self._extract_pages(pdf_path, max_pages, result, **kwargs)
+        chapters = detect_chapters_from_pages(pages)
+        first_page = 0
+        for chapter in chapters:
+            chapter["first_page"] = first_page
+            first_page += len(chapter["pages"])
+        timing["extraction"] = time.perf_counter() - t0
+        result.metadata["num_pages"] = len(pages)
+        result.metadata["num_chapters"] = len(chapters)
+
+        # Pass 1+2: analyze chapters as independent units
+        t0 = time.perf_counter()
+        workers = max(1, min(max_workers, len(chapters)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chapter_results = list(pool.map(lambda c: self._analyze_chapter(c, **kwargs), chapters))
+        timing["chapters"] = time.perf_counter() - t0
+        result.metadata["chapters"] = [
+            {
+                "title": chapter["title"],
+                "pages": [cr["pages"][0], cr["pages"][-1]] if cr["pages"] else [],
+                "characters": len(cr["characters"]),
+                "dialogs": len(cr["dialogs"]),
+                "seconds": round(cr["seconds"], 3),
+            }
+            for chapter, cr in zip(chapters, chapter_results)
+        ]
+
+        # Merge chapter partials with pairwise tree merges
+        partials = [
+            PartialResult.from_unit(cr["characters"], cr["dialogs"], cr["context"])
+            for cr in chapter_results
+        ]
+        partials.append(PartialResult.from_unit({"Narrator": list(range(len(pages)))}, []))
+        merged, merge_timing = tree_merge(partials, processes=kwargs.get("merge_processes") or 0)
+        timing["merge"] = merge_timing.pop("merge_total")
+        timing.update(merge_timing)
+        result.aliases = merged.aliases
+        result.metadata["duplicate_dialogs_dropped"] = merged.duplicates_dropped
+        all_dialogs = DialogTable(pages)
+        for d in merged.flat_dialogs():
+            page = d.get("page")
+            all_dialogs.append(d, source=page if isinstance(page, int) else None)
+        merged.dialogs.clear()
+        merged.dialog_seq.clear()
+        self._record_page_spans(all_dialogs)
+        dialogs_by_speaker = all_dialogs.by_speaker()
+
+        # Pass 3: traits + voice profile per canonical character
+        t0 = time.perf_counter()
+        alias_groups = self._alias_groups(result.aliases)
+        for char_name, info in merged.characters.items():
+            char_result = CharacterResult(name=char_name)
+            char_result.dialogs = dialogs_by_speaker.get(char_name) or DialogView(all_dialogs)
+            contexts = info["context"]
+
+            # Minor characters get an archetype profile instead of an LLM call
+            if not self._has_evidence(
+                result, char_name, len(char_result.dialogs), [pages[p] for p in info["pages"]],
+                alias_groups.get(char_name, [char_name]), ["pass3"], pages=len(info["pages"]), **kwargs,
+            ):
+                char_result.voice_profile = default_voice_profile(char_name)
+                self._add_character(result, char_result)
+                continue
+
+            if char_name == "Narrator" and not contexts:
+                contexts = [cr["context_sample"] for cr in chapter_results]
+            context = truncate_to_tokens("\n\n".join(contexts), max_tokens=self.CONTEXT_TOKENS)
+
+            prompt = self.prompt_builder.build_pass3_with_context_prompt(char_name, context)
+            response = self._generate(prompt, "pass3")
+            data = self._parse_pass(response, VoiceSuggestion)
+            char_result.traits = data.traits
+            char_result.voice_profile = data.voice_profile
+
+            self._add_character(result, char_result)
+
+        timing["pass3"] = time.perf_counter() - t0
+        self._compact_dialogs(all_dialogs, pdf_path, paged=True)
+        result.dialogs = all_dialogs
+        result.timing = timing
+        return result
+
+    def _analyze_chapter(self, chapter: dict, **kwargs) -> dict:
+        """Run pass 1 and pass 2 over one chapter using only chapter-local state.
+
+        Returns:
+            Dict with 'pages' (global page ids), 'characters' (name -> global
+            page ids), 'dialogs', 'context' (name -> context excerpt),
+            'context_sample' and 'seconds' keys
+        """
+        t0 = time.perf_counter()
+        pages = chapter["pages"]
+        offset = chapter["first_page"]
+        packs = self._pack_pages(pages, **kwargs)
+
+        char_page_map: dict[str, list[int]] = {}  # local page ids
+        for pack in packs:
+            prompt = self.prompt_builder.build_pass1_prompt(pack["text"])
+            response = self._generate(prompt, "pass1")
+            data = self._parse_pass(response, CharacterNames)
+            for char in data.characters:
+                if not is_character_name(char):
+                    continue
+                seen = char_page_map.setdefault(char, [])
+                seen.extend(p for p in pages_mentioning(char, pack, pages) if p not in seen)
+
+        dialogs = []
+        for pack in packs:
+            prompt = self.prompt_builder.build_pass2_5_dialog_prompt(
+                pack["text"], pack_character_names(char_page_map, pack), max_names=self._pack_names(pack)
+            )
+            response = self._generate(prompt, "pass2")
+            data = self._parse_pass(response, DialogList)
+            for d in data.dialogs:
+                if not isinstance(d, dict):
+                    continue
+                d["page"] = offset + attribute_page(d.get("text", ""), pack, pages)
+                d["chapter"] = chapter["title"]
+                dialogs.append(d)
+
+        # Chapter-local context cache: a short excerpt of the pages each character is on
+        context = {
+            name: truncate_to_tokens(
+                "\n\n".join(pages[p] for p in sorted(page_ids)[:3]),
+                max_tokens=self.CHAPTER_CONTEXT_TOKENS,
+            )
+            for name, page_ids in char_page_map.items()
+        }
+        return {
+            "pages": list(range(offset, offset + len(pages))),
+            "characters": {n: [offset + p for p in ids] for n, ids in char_page_map.items()},
+            "dialogs": dialogs,
+            "context": context,
+            "context_sample": truncate_to_tokens(pages[0], max_tokens=self.CHAPTER_CONTEXT_TOKENS) if pages else "",
+            "seconds": time.perf_counter() - t0,
+        }
@@ -0,0 +1,155 @@
+"""
+Streaming output of workflow results.
+
+ResultWriter writes a result without ever building it as one dict or one
+string. Characters are written as soon as the workflow finishes them
+(BaseWorkflow.on_character); dialogs, aliases, timing and metadata follow
+when the run ends, and dialog dicts are materialized one row at a time.
+
+Formats:
+- "json": the same document WorkflowResult.to_dict() + json.dumps(indent=2)
+  produce, byte for byte plus a final newline, written in chunks
+  (JSONEncoder.iterencode). Paged workflows record dialog spans before the
+  first character is streamed, so streamed characters match too;
+- "jsonl": one record per line, {"type": "character" | "dialog" | "aliases" |
+  "timing" | "metadata", ...}. Character records carry a dialog_count;
+  their dialogs are the dialog records with the same speaker.
+
+Usage:
+    with ResultWriter.to_file("out.jsonl", fmt="jsonl") as writer:
+        workflow.on_character = writer.add_character
+        result = workflow.run(pdf)
+        writer.finish(result)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import TextIO
+
+from .workflows import CharacterResult, WorkflowResult
+
+FORMATS = ("json", "jsonl")
+
+_INDENT = "  "
+
+
+class _LazyRows(list):
+    """List stand-in the json encoder iterates row by row (rows are built on demand)."""
+
+    def __init__(self, rows):
+        super().__init__()
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class ResultWriter:
+    """Writes characters as they arrive and the rest of a result on finish()."""
+
+    def __init__(self, stream: TextIO, fmt: str = "json"):
+        """Create a writer on an open text stream.
+
+        Args:
+            stream: Destination (a file or sys.stdout)
+            fmt: "json" (single document) or "jsonl" (JSON Lines)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format: {fmt} (expected one of {', '.join(FORMATS)})")
+        self.stream = stream
+        self.fmt = fmt
+        self._encoder = json.JSONEncoder(indent=2 if fmt == "json" else None, ensure_ascii=False)
+        self._written: set[int] = set()  # id() of characters already streamed
+        self._path = None
+        self._tmp_path = None
+        self.finished = False
+
+    @classmethod
+    def to_file(cls, path: str, fmt: str = "json") -> "ResultWriter":
+        """Writer on a file; output goes to a temp file renamed into place by finish()."""
+        final = Path(path)
+        tmp = final.with_name(final.name + ".tmp")
+        writer = cls(open(tmp, "w", encoding="utf-8"), fmt)
+        writer._path, writer._tmp_path = final, tmp
+        return writer
+
+    def add_character(self, character: CharacterResult) -> None:
+        """Write one finished character."""
+        if self.fmt == "jsonl":
+            record = character.to_dict(dialogs=[])
+            del record["dialogs"]
+            self._write_line({"type": "character", **record, "dialog_count": len(character.dialogs)})
+        else:
+            self.stream.write('{\n  "characters": [\n    ' if not self._written else ",\n    ")
+            self._write_value(character.to_dict(dialogs=_LazyRows(character.dialogs)), level=2)
+        self._written.add(id(character))
+
+    def finish(self, result: WorkflowResult) -> None:
+        """Write the characters not streamed yet and everything else, then close a file writer."""
+        for character in result.characters:
+            if id(character) not in self._written:
+                self.add_character(character)
+
+        if self.fmt == "jsonl":
+            for dialog in result.dialogs:
+                self._write_line({"type": "dialog", **dialog})
+            self._write_line({"type": "aliases", "aliases": result.aliases})
+            self._write_line({"type": "timing", **result.timing})
+            self._write_line({"type": "metadata", **result.metadata})
+        else:
+            self.stream.write("\n  ]" if self._written else '{\n  "characters": []')
+            for key, value in (
+                ("dialogs", _LazyRows(result.dialogs)),
+                ("aliases", result.aliases),
+                ("timing", result.timing),
+                ("metadata", result.metadata),
+            ):
+                self.stream.write(f",\n  {json.dumps(key)}: ")
+                self._write_value(value, level=1)
+            self.stream.write("\n}")
+            if self._path is None:
+                self.stream.write("\n")
+        self.finished = True
+        self.close()
+
+    def close(self) -> None:
+        """Close a file writer; an unfinished output file is discarded."""
+        if self._path is None:
+            self.stream.flush()
+            return
+        if self._tmp_path is None:
+            return  # already closed
+        self.stream.close()
+        if self.finished:
+            os.replace(self._tmp_path, self._path)
+        else:
+            self._tmp_path.unlink(missing_ok=True)
+        self._tmp_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def _write_line(self, record: dict) -> None:
+        self.stream.write(self._encoder.encode(record))
+        self.stream.write("\n")
+
+    def _write_value(self, value, level: int) -> None:
+        """Encode value as if nested level deep in an indent=2 document."""
+        # JSON strings never contain a raw newline, so re-indenting chunks is safe
+        newline = "\n" + _INDENT * level
+        for chunk in self._encoder.iterencode(value):
+            self.stream.write(chunk.replace("\n", newline))
+
+
+def write_result(result: WorkflowResult, path: str, fmt: str = "json") -> None:
+    """Write a finished result to path in one streaming pass."""
+    with ResultWriter.to_file(path, fmt) as writer:
+        writer.finish(result)
@@ -8,6 +8,7 @@ for character and dialog extraction.
 from .prompt_tester import (
     PromptTester,
     PromptDefinitions,
+    CompactPromptDefinitions,
     LLMEngine,
     PDFExtractor,
     JSONParser,
@@ -20,6 +21,7 @@ from .prompt_tester import (
 __all__ = [
     "PromptTester",
     "PromptDefinitions",
+    "CompactPromptDefinitions",
     "LLMEngine",
     "PDFExtractor",
     "JSONParser",
@@ -23,7 +23,9 @@ import logging
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
@@ -40,6 +42,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Shared helpers from the benchmark package next to this directory (scripts/benchmark).
+# The tester is not installable on its own; README.md lists the modules it relies on.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from benchmark.decode import CharacterEntry, CharacterNames, DialogList, decode_character_entry  # noqa: E402
+from benchmark.dialog_match import DialogMatcher, normalize_dialog  # noqa: E402
+from benchmark.gate import (  # noqa: E402
+    DEFAULT_GATE_RUNS, DEFAULT_GATE_TOLERANCE, check_regressions, config_fingerprint, format_gate, run_perf,
+)
+from benchmark.history import DEFAULT_HISTORY_DB, HistoryStore, migrate_json_history  # noqa: E402
+from benchmark.jsonparse import StreamingJSONParser, iter_json_roots, parse_llm_json  # noqa: E402
+from benchmark.models import GGUFModel, LlamaServerModel  # noqa: E402
+from benchmark.prompt_diet import compare_templates, format_overhead  # noqa: E402
+from benchmark.prompts import PromptBuilder  # noqa: E402
+from benchmark.utils import (  # noqa: E402
+    canonicalize_characters, estimate_tokens, extract_pdf_pages, resolve_alias, split_into_segments,
+)
+
 
 # =============================================================================
 # Data Classes
@@ -88,9 +107,13 @@ class EvaluationMetrics:
     true_positives: int = 0
     false_positives: int = 0
     false_negatives: int = 0
+    speaker_accuracy: Optional[float] = None  # dialogs only: matched dialogs with the right speaker
 
     def __str__(self) -> str:
-        return f"P={self.precision:.2%}, R={self.recall:.2%}, F1={self.f1:.2%}"
+        text = f"P={self.precision:.2%}, R={self.recall:.2%}, F1={self.f1:.2%}"
+        if self.speaker_accuracy is not None:
+            text += f", speaker={self.speaker_accuracy:.2%}"
+        return text
 
 
 @dataclass
@@ -107,6 +130,13 @@ class BenchmarkResult:
     expected_dialogs: list[tuple[str, str]]
     timing_ms: dict[str, float] = field(default_factory=dict)
     raw_llm_responses: list[str] = field(default_factory=list)
+    mode: str = "batched"
+    temperature: Optional[float] = None  # None: the prompt set's own temperatures
+    tokens: dict[str, int] = field(default_factory=dict)  # prompt/completion tokens, calls, cached calls
+    pdf: str = ""
+    perf: dict = field(default_factory=dict)  # benchmark.gate.run_perf() record
+    segments: list[dict] = field(default_factory=list)  # per-segment stats of a segmented run
+    config: dict = field(default_factory=dict)  # PromptTester.run_config(); its fingerprint keys the gate baseline
 
     def to_dict(self) -> dict:
         """Convert to dictionary for JSON serialization."""
@@ -114,6 +144,9 @@ class BenchmarkResult:
             "timestamp": self.timestamp,
             "model_name": self.model_name,
             "prompt_version": self.prompt_version,
+            "mode": self.mode,
+            "pdf": self.pdf,
+            "temperature": self.temperature,
             "character_metrics": {
                 "precision": self.character_metrics.precision,
                 "recall": self.character_metrics.recall,
@@ -126,10 +159,16 @@ class BenchmarkResult:
                 "precision": self.dialog_metrics.precision,
                 "recall": self.dialog_metrics.recall,
                 "f1": self.dialog_metrics.f1,
+                "speaker_accuracy": self.dialog_metrics.speaker_accuracy,
             },
             "extracted_characters": self.extracted_characters,
             "expected_characters": self.expected_characters,
             "timing_ms": self.timing_ms,
+            "tokens": self.tokens,
+            "perf": self.perf,
+            "segments": self.segments,
+            "config": self.config,
+            "config_hash": config_fingerprint(self.config),
         }
 
 
@@ -186,10 +225,10 @@ Pitch (of voice) within the range: 0.5-1.5
 Speed (speed of speaking) within the range: 0.5-2.0
 
 OUTPUT FORMAT:
-{
-  "CharacterName1": {"D": ["this character's first dialog", "their next dialog"], "T": ["trait", "another trait"], "V": "Gender,Age,Accent,Pitch,Speed"},
-  "CharacterName2": {"D": ["this character's first dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}
-}
+{{
+  "CharacterName1": {{"D": ["this character's first dialog", "their next dialog"], "T": ["trait", "another trait"], "V": "Gender,Age,Accent,Pitch,Speed"}},
+  "CharacterName2": {{"D": ["this character's first dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}}
+}}
 
 Story Excerpt:
 {text}
@@ -241,6 +280,61 @@ TEXT:
 JSON:'''
 
 
+class CompactPromptDefinitions(PromptDefinitions):
+    """Token-lean variants of the prompts: rules and output format stated once.
+
+    Output keys and formats are unchanged, so parsing and evaluation are shared.
+    Run both with --ab-compact to check that extraction F1 holds.
+    """
+
+    VERSION = PromptDefinitions.VERSION + "-compact"
+
+    BATCHED_SYSTEM_PROMPT = """You are a Story analysis engine. Output one complete, valid JSON object."""
+
+    @classmethod
+    def build_batched_analysis_prompt(cls, text: str) -> str:
+        """Build the compact batched analysis prompt."""
+        return f'''List each Character with quoted dialogs in the Story excerpt exactly once (not locations, objects or creatures that don't speak):
+D: their exact quoted dialogs, attributed by name and pronouns; each dialog belongs to one Character
+T: traits the Narrator states
+V: "Gender,Age,Accent,Pitch,Speed" with Gender from pronouns male|female, Age child|young|young-adult|middle-aged|elderly, Accent from dialogs neutral|british|american|asian, Pitch 0.5-1.5, Speed 0.5-2.0, inferred from the traits
+OUTPUT: {{"Name1": {{"D": ["dialog", "next dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}}, "Name2": {{"D": ["dialog"], "T": ["trait"], "V": "Gender,Age,Accent,Pitch,Speed"}}}}
+
+Story Excerpt:
+{text}
+
+JSON:'''
+
+    DIALOG_SYSTEM_PROMPT = """You are a dialog extraction engine. Resolve pronouns (he/she/they) to character names."""
+
+    @classmethod
+    def build_dialog_extraction_prompt(cls, text: str, character_names: list[str]) -> str:
+        """Build the compact dialog extraction prompt (character list given once)."""
+        chars_str = ", ".join(character_names)
+        return f'''CHARACTERS: {chars_str}
+RULES: extract every quoted dialog, in order, exactly once. speaker: from "X said/asked/shouted" or the character a pronoun refers to.
+OUTPUT: [{{"speaker": "CharacterName", "text": "exact dialog text"}}]
+
+TEXT:
+{text}
+
+JSON:'''
+
+
+# Prompt sets selectable by version (--variants); add new PromptDefinitions subclasses here
+PROMPT_VARIANTS = {prompts.VERSION: prompts for prompts in (PromptDefinitions, CompactPromptDefinitions)}
+
+
+def prompt_templates(prompts: type) -> dict[str, str]:
+    """Every prompt of a prompt set as sent (ChatML, like LLMEngine) with empty slots."""
+    chat = PromptBuilder("chatml").build_chat_prompt
+    return {
+        "batched": chat(prompts.BATCHED_SYSTEM_PROMPT, prompts.build_batched_analysis_prompt("")),
+        "characters": chat(prompts.CHARACTER_SYSTEM_PROMPT, prompts.build_character_extraction_prompt("")),
+        "dialogs": chat(prompts.DIALOG_SYSTEM_PROMPT, prompts.build_dialog_extraction_prompt("", [])),
+    }
+
+
 
 # =============================================================================
 # LLM Engine (supports llama-server HTTP API or llama-cpp-python)
@@ -270,6 +364,10 @@ class LLMEngine:
         self.n_gpu_layers = n_gpu_layers
         self._llm = None
         self._session = None
+        self._llm_lock = threading.Lock()  # llama-cpp contexts are not thread-safe
+        # (prompt, temperature, max_tokens) -> Future of (text, usage); None disables caching
+        self._response_cache: Optional[dict[tuple, Future]] = None
+        self._cache_lock = threading.Lock()
 
         # Determine backend
         if server_url:
@@ -306,6 +404,10 @@ class LLMEngine:
                 "  2. Use llama-server: --server http://127.0.0.1:8080"
             )
 
+    def enable_response_cache(self) -> None:
+        """Share responses between identical requests (also ones still in flight)."""
+        self._response_cache = {}
+
     def _build_prompt(self, system_prompt: str, user_prompt: str) -> str:
         """Build ChatML format prompt."""
         prompt = f"<|im_start|>system\n{system_prompt}<|im_end|>\n"
@@ -318,7 +420,8 @@ class LLMEngine:
         system_prompt: str,
         user_prompt: str,
         temperature: float = 0.1,
-        max_tokens: int = 2048
+        max_tokens: int = 2048,
+        usage: Optional[dict] = None,
     ) -> str:
         """Generate text using the LLM.
 
@@ -327,6 +430,9 @@ class LLMEngine:
             user_prompt: User message
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            usage: If given, prompt_tokens / completion_tokens / seconds of the
+                call are added to it (a cached response counts what the
+                original call cost, plus one cached_calls)
 
         Returns:
             Generated text
@@ -334,12 +440,52 @@ class LLMEngine:
         prompt = self._build_prompt(system_prompt, user_prompt)
         logger.debug(f"Prompt length: {len(prompt)} chars")
 
+        if self._response_cache is None:
+            text, call_usage = self._generate_uncached(prompt, temperature, max_tokens)
+            cached = False
+        else:
+            key = (prompt, temperature, max_tokens)
+            with self._cache_lock:
+                future = self._response_cache.get(key)
+                cached = future is not None
+                if not cached:
+                    future = self._response_cache[key] = Future()
+            if not cached:
+                try:
+                    future.set_result(self._generate_uncached(prompt, temperature, max_tokens))
+                except BaseException as e:
+                    # Requests already waiting share the error; later ones retry
+                    with self._cache_lock:
+                        if self._response_cache.get(key) is future:
+                            del self._response_cache[key]
+                    future.set_exception(e)
+                    raise
+            text, call_usage = future.result()
+
+        if usage is not None:
+            for key, value in call_usage.items():
+                usage[key] = usage.get(key, 0) + value
+            usage["calls"] = usage.get("calls", 0) + 1
+            usage["cached_calls"] = usage.get("cached_calls", 0) + int(cached)
+        return text
+
+    def _generate_uncached(self, prompt: str, temperature: float, max_tokens: int) -> tuple[str, dict]:
+        """Run one request; returns (text, usage)."""
+        start_time = time.time()
         if self.backend == "server":
-            return self._generate_server(prompt, temperature, max_tokens)
+            text, counts = self._generate_server(prompt, temperature, max_tokens)
         else:
-            return self._generate_llama_cpp(prompt, temperature, max_tokens)
+            with self._llm_lock:
+                text, counts = self._generate_llama_cpp(prompt, temperature, max_tokens)
+        prompt_tokens, completion_tokens = counts
+        return text, {
+            # Backends that don't report usage fall back to the chars/4 estimate
+            "prompt_tokens": prompt_tokens if prompt_tokens is not None else estimate_tokens(prompt),
+            "completion_tokens": completion_tokens if completion_tokens is not None else estimate_tokens(text),
+            "seconds": time.time() - start_time,
+        }
 
-    def _generate_server(self, prompt: str, temperature: float, max_tokens: int) -> str:
+    def _generate_server(self, prompt: str, temperature: float, max_tokens: int) -> tuple[str, tuple]:
         """Generate using llama-server HTTP API."""
         import requests
 
@@ -361,14 +507,15 @@ class LLMEngine:
                 timeout=300,
             )
             resp.raise_for_status()
-            response = resp.json().get("content", "").strip()
+            data = resp.json()
+            response = data.get("content", "").strip()
             logger.debug(f"Response length: {len(response)} chars")
-            return response
+            return response, (data.get("tokens_evaluated"), data.get("tokens_predicted"))
         except requests.RequestException as e:
             logger.error(f"Server request failed: {e}")
-            return ""
+            return "", (None, 0)
 
-    def _generate_llama_cpp(self, prompt: str, temperature: float, max_tokens: int) -> str:
+    def _generate_llama_cpp(self, prompt: str, temperature: float, max_tokens: int) -> tuple[str, tuple]:
         """Generate using llama-cpp-python."""
         self._load_model()
 
@@ -381,7 +528,8 @@ class LLMEngine:
 
         response = output["choices"][0]["text"].strip()
         logger.debug(f"Response length: {len(response)} chars")
-        return response
+        counts = output.get("usage") or {}
+        return response, (counts.get("prompt_tokens"), counts.get("completion_tokens"))
 
     def health_check(self) -> bool:
         """Check if the backend is ready."""
@@ -412,64 +560,45 @@ class LLMEngine:
 # =============================================================================
 
 class PDFExtractor:
-    """Extract text from PDF files using PyMuPDF."""
+    """Extract text from PDF files using PyMuPDF.
+
+    Page ranges of large PDFs are extracted in parallel worker processes and
+    results are cached by PDF content hash, so repeat runs skip PDF parsing
+    (shared with the benchmark package, see benchmark.utils.extract_pdf_pages
+    and benchmark.page_store).
+    """
 
     @staticmethod
-    def extract_text(pdf_path: str) -> str:
+    def extract_text(pdf_path: str, workers: Optional[int] = None) -> str:
         """Extract full text from PDF.
 
         Args:
             pdf_path: Path to the PDF file
+            workers: Extraction processes for large PDFs (default: CPU count)
 
         Returns:
             Extracted text as a single string
         """
-        try:
-            import fitz  # PyMuPDF
-        except ImportError:
-            raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
-
-        path = Path(pdf_path)
-        if not path.is_file():
-            raise FileNotFoundError(f"PDF not found: {pdf_path}")
-
         logger.info(f"Extracting text from: {pdf_path}")
-        doc = fitz.open(pdf_path)
-        try:
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            logger.info(f"Extracted {len(text)} characters from {doc.page_count} pages")
-            return text.strip()
-        finally:
-            doc.close()
+        pages = extract_pdf_pages(pdf_path, ascii_only=False, workers=workers)
+        text = "".join(pages)
+        logger.info(f"Extracted {len(text)} characters from {len(pages)} pages")
+        return text.strip()
 
     @staticmethod
-    def extract_pages(pdf_path: str) -> list[str]:
+    def extract_pages(pdf_path: str, workers: Optional[int] = None) -> list[str]:
         """Extract text from each page separately.
 
         Args:
             pdf_path: Path to the PDF file
+            workers: Extraction processes for large PDFs (default: CPU count)
 
         Returns:
             List of page texts
         """
-        try:
-            import fitz
-        except ImportError:
-            raise RuntimeError("PyMuPDF not installed. Run: pip install pymupdf")
-
-        path = Path(pdf_path)
-        if not path.is_file():
-            raise FileNotFoundError(f"PDF not found: {pdf_path}")
-
-        doc = fitz.open(pdf_path)
-        try:
-            pages = [page.get_text().strip() for page in doc]
-            logger.info(f"Extracted {len(pages)} pages")
-            return pages
-        finally:
-            doc.close()
+        pages = [page.strip() for page in extract_pdf_pages(pdf_path, ascii_only=False, workers=workers)]
+        logger.info(f"Extracted {len(pages)} pages")
+        return pages
 
 
 
@@ -478,340 +607,73 @@ class PDFExtractor:
 # =============================================================================
 
 class JSONParser:
-    """Robust JSON parser matching BatchedAnalysisPrompt.kt logic."""
+    """Robust JSON parser matching BatchedAnalysisPrompt.kt logic.
 
-    @staticmethod
-    def extract_json_from_response(response: str) -> Optional[str]:
-        """Extract JSON from LLM response, handling markdown code blocks."""
-        text = response.strip()
-
-        # Remove markdown code blocks
-        code_block_pattern = r'```(?:json)?\s*([\s\S]*?)```'
-        match = re.search(code_block_pattern, text)
-        if match:
-            text = match.group(1).strip()
-
-        # Find JSON object or array
-        # Try to find object first
-        obj_start = text.find('{')
-        arr_start = text.find('[')
-
-        if obj_start == -1 and arr_start == -1:
-            return None
-
-        if obj_start != -1 and (arr_start == -1 or obj_start < arr_start):
-            # Find matching brace
-            return JSONParser._extract_balanced(text, obj_start, '{', '}')
-        else:
-            # Find matching bracket
-            return JSONParser._extract_balanced(text, arr_start, '[', ']')
+    Extraction, think/code-fence stripping, truncation repair and duplicate-key
+    handling all run in one linear pass of the shared engine
+    (benchmark.jsonparse.parse_llm_json).
+    """
 
     @staticmethod
-    def _extract_balanced(text: str, start: int, open_char: str, close_char: str) -> Optional[str]:
-        """Extract balanced brackets/braces."""
-        depth = 0
-        in_string = False
-        escape_next = False
-
-        for i in range(start, len(text)):
-            char = text[i]
-
-            if escape_next:
-                escape_next = False
-                continue
-
-            if char == '\\':
-                escape_next = True
-                continue
-
-            if char == '"':
-                in_string = not in_string
-                continue
-
-            if in_string:
-                continue
-
-            if char == open_char:
-                depth += 1
-            elif char == close_char:
-                depth -= 1
-                if depth == 0:
-                    return text[start:i+1]
-
-        # If unbalanced (truncated), try to repair by finding last complete entry
-        if open_char == '{' and depth > 0:
-            return JSONParser._repair_truncated_json(text[start:])
-        return None
-
-    @staticmethod
-    def _repair_truncated_json(json_str: str) -> Optional[str]:
-        """Attempt to repair truncated JSON by removing incomplete trailing entries."""
-        # Find the last complete key-value pair by finding last complete nested object
-        # Look for pattern: "Name": {...}, and truncate after last complete one
-
-        # Find all complete character entries: "Name": {"D": [...], "T": [...], "V": "..."}
-        # We'll do this by finding the last }, that's followed by potential whitespace/comma
-
-        last_good_pos = -1
-        depth = 0
-        in_string = False
-        escape_next = False
-
-        for i, char in enumerate(json_str):
-            if escape_next:
-                escape_next = False
-                continue
-            if char == '\\':
-                escape_next = True
-                continue
-            if char == '"':
-                in_string = not in_string
-                continue
-            if in_string:
-                continue
-
-            if char == '{':
-                depth += 1
-            elif char == '}':
-                depth -= 1
-                if depth == 1:  # Just closed a nested object (character entry)
-                    last_good_pos = i
-
-        if last_good_pos > 0:
-            # Truncate at last complete entry and close the outer object
-            repaired = json_str[:last_good_pos + 1]
-            # Remove trailing comma if present
-            repaired = repaired.rstrip().rstrip(',')
-            repaired += '}'
-            logger.debug(f"Repaired truncated JSON, length: {len(repaired)}")
-            return repaired
-
-        return None
-
-    @staticmethod
-    def _truncate_at_duplicate_key(json_str: str) -> str:
-        """Truncate JSON at first duplicate key (matching Android's truncateAtDuplicateKey).
-
-        This handles LLM repetition by cutting off at the first repeated character name.
-        """
-        seen_keys = set()
-        depth = 0
-        in_string = False
-        escape_next = False
-        key_start = -1
-        current_key = None
-        last_valid_end = -1
-
-        for i, c in enumerate(json_str):
-            if escape_next:
-                escape_next = False
-                continue
-            if c == '\\':
-                escape_next = True
-                continue
-
-            if c == '"':
-                if not in_string:
-                    in_string = True
-                    if depth == 1:
-                        key_start = i + 1  # Start of key (after quote)
-                else:
-                    in_string = False
-                    if depth == 1 and key_start >= 0:
-                        # End of a top-level key
-                        current_key = json_str[key_start:i]
-                        key_start = -1
-                continue
-
-            if in_string:
-                continue
-
-            if c == '{':
-                depth += 1
-                if depth == 2 and current_key:
-                    # Starting a character object - check for duplicate
-                    if current_key.lower() in seen_keys:
-                        logger.warning(f"Found duplicate key '{current_key}' at position {i}, truncating")
-                        # Truncate just before this key
-                        truncate_pos = JSONParser._find_truncate_position(json_str, i, current_key)
-                        truncated = json_str[:truncate_pos] + "}"
-                        return truncated
-                    seen_keys.add(current_key.lower())
-            elif c == '}':
-                if depth == 2:
-                    # End of a character object - this is a valid point
-                    last_valid_end = i
-                depth -= 1
-
-        # If JSON doesn't end properly but we have a valid position, truncate there
-        if last_valid_end > 0 and not json_str.rstrip().endswith('}'):
-            return json_str[:last_valid_end + 1] + "}"
-
-        return json_str
-
-    @staticmethod
-    def _find_truncate_position(json_str: str, current_pos: int, duplicate_key: str) -> int:
-        """Find position to truncate before a duplicate key."""
-        pos = current_pos
-        depth = 0
-        while pos > 0:
-            pos -= 1
-            c = json_str[pos]
-            if c == '}':
-                depth += 1
-            elif c == '{':
-                if depth == 0:
-                    # Continue searching for comma
-                    pass
-                depth -= 1
-            elif c == ',' and depth == 0:
-                # Found the comma before the duplicate entry
-                return pos
-        return current_pos
-
-    @staticmethod
-    def _parse_json_with_duplicates(json_str: str) -> dict[str, dict]:
-        """Parse JSON that may have duplicate keys, keeping first occurrence of each."""
-        # First, truncate at duplicate keys (matching Android behavior)
-        json_str = JSONParser._truncate_at_duplicate_key(json_str)
-
-        result = {}
-        # Use a custom decoder that tracks seen keys
-        try:
-            # First try normal parsing
-            data = json.loads(json_str)
-            return data if isinstance(data, dict) else {}
-        except json.JSONDecodeError:
-            pass
-
-        # Manual extraction for duplicate key handling
-        # Pattern: "CharName": {...}
-        pattern = r'"([^"]+)":\s*(\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\})'
-        seen = set()
-        for match in re.finditer(pattern, json_str):
-            name = match.group(1)
-            if name.lower() not in seen:
-                seen.add(name.lower())
-                try:
-                    obj = json.loads(match.group(2))
-                    result[name] = obj
-                except json.JSONDecodeError:
-                    continue
-        return result
+    def extract_json_from_response(response: str) -> Optional[str]:
+        """Extract the first JSON object or array from an LLM response (repaired if truncated)."""
+        return parse_llm_json(response, roots="{[").text or None
 
     @staticmethod
-    def parse_batched_response(response: str) -> dict[str, dict]:
+    def parse_batched_response(response: str) -> dict[str, CharacterEntry]:
         """Parse batched analysis response.
 
         Handles multiple formats:
         - Single JSON object
         - JSONL (multiple JSON objects on separate lines)
-        - Duplicate keys (keeps first occurrence)
-        - Truncated JSON (repairs by removing incomplete entries)
+        - Duplicate keys (keeps first occurrence, stops at the repetition)
+        - Truncated JSON (keeps complete entries)
 
         Returns:
-            Dictionary mapping character names to their data
+            Dictionary mapping character names to CharacterEntry records
+            (D/T/V aliases resolved while decoding)
         """
-        json_str = JSONParser.extract_json_from_response(response)
-        if not json_str:
+        parser = StreamingJSONParser.parse(response, multiple_roots=True, decode_entry=decode_character_entry)
+        if not parser.entries:
             logger.warning("No JSON found in response")
-            # Try direct repair on raw response
-            json_str = JSONParser._repair_truncated_json(response)
-            if not json_str:
-                return {}
-
-        # Try to parse, handling duplicates
-        data = JSONParser._parse_json_with_duplicates(json_str)
-        if data:
-            return JSONParser._normalize_character_data(data)
-
-        # Try to extract multiple JSON objects and merge
-        objects = JSONParser._extract_multiple_json_objects(response)
-        if objects:
-            merged = {}
-            for obj in objects:
-                merged.update(obj)
-            return JSONParser._normalize_character_data(merged)
-
-        return {}
-
-    @staticmethod
-    def _extract_multiple_json_objects(text: str) -> list[dict]:
-        """Extract multiple JSON objects from text (JSONL format)."""
-        objects = []
-        pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-
-        for match in re.finditer(pattern, text):
-            try:
-                obj = json.loads(match.group())
-                objects.append(obj)
-            except json.JSONDecodeError:
-                continue
-
-        return objects
-
-    @staticmethod
-    def _normalize_character_data(data: dict) -> dict[str, dict]:
-        """Normalize character data to standard format."""
-        result = {}
-        for name, char_data in data.items():
-            if not isinstance(char_data, dict):
-                continue
-
-            normalized = {
-                "dialogs": [],
-                "traits": [],
-                "voice": ""
-            }
-
-            # Handle different key formats (D/d/dialogs, T/t/traits, V/v/voice)
-            for key, value in char_data.items():
-                key_lower = key.lower()
-                if key_lower in ('d', 'dialogs', 'dialogue', 'dialogues'):
-                    if isinstance(value, list):
-                        normalized["dialogs"] = value
-                elif key_lower in ('t', 'traits', 'trait'):
-                    if isinstance(value, list):
-                        normalized["traits"] = value
-                elif key_lower in ('v', 'voice', 'voice_profile'):
-                    if isinstance(value, str):
-                        normalized["voice"] = value
-
-            result[name] = normalized
-
-        return result
+            return {}
+        if parser.duplicate_keys:
+            logger.warning(f"Found duplicate key '{parser.duplicate_keys[0]}', truncating")
+        if parser.truncated:
+            logger.debug("Repaired truncated JSON, kept complete entries")
+        return parser.entries
 
     @staticmethod
     def parse_character_list(response: str) -> list[str]:
         """Parse character extraction response."""
-        json_str = JSONParser.extract_json_from_response(response)
-        if not json_str:
-            return []
-
-        try:
-            data = json.loads(json_str)
-            if isinstance(data, dict):
-                return data.get("characters", [])
-            elif isinstance(data, list):
-                return data
-        except json.JSONDecodeError:
-            pass
-
+        data = parse_llm_json(response, roots="{[").data
+        if isinstance(data, dict):
+            return CharacterNames.decode(data).characters
+        elif isinstance(data, list):
+            return data
         return []
 
     @staticmethod
     def parse_dialog_list(response: str) -> list[dict]:
         """Parse dialog extraction response with deduplication and truncation handling."""
-        # Try to extract individual dialog objects using regex (handles truncated arrays)
-        # Pattern: {"speaker": "Name", "text": "Dialog"}
-        pattern = r'\{\s*"speaker"\s*:\s*"([^"]+)"\s*,\s*"text"\s*:\s*"([^"]+)"\s*\}'
+        # Models sometimes print several arrays/objects (one per scene): keep the
+        # dialogs of every root. Complete dialog objects survive truncation of
+        # the surrounding array.
+        data = []
+        for root in iter_json_roots(response, roots="{["):
+            if isinstance(root, dict):
+                # {"dialogs": [...]} (any key alias), else a lone dialog object
+                root = DialogList.decode(root).dialogs or [root]
+            if isinstance(root, list):
+                data.extend(root)
 
         dialogs = []
         seen = set()
-
-        for match in re.finditer(pattern, response):
-            speaker = match.group(1)
-            text = match.group(2)
+        for dialog in data:
+            if not isinstance(dialog, dict) or not dialog.get("speaker") or not dialog.get("text"):
+                continue
+            speaker = str(dialog["speaker"])
+            text = str(dialog["text"])
 
             # Create a key for deduplication
             key = (speaker.lower(), text.lower()[:50])  # Use first 50 chars for matching
@@ -820,26 +682,52 @@ class JSONParser:
                 seen.add(key)
                 dialogs.append({"speaker": speaker, "text": text})
 
-        if dialogs:
-            logger.debug(f"Extracted {len(dialogs)} unique dialogs using regex")
-            return dialogs
-
-        # Fallback to standard JSON parsing
-        json_str = JSONParser.extract_json_from_response(response)
-        if not json_str:
-            return []
+        logger.debug(f"Extracted {len(dialogs)} unique dialogs")
+        return dialogs
 
-        try:
-            data = json.loads(json_str)
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict):
-                return data.get("dialogs", [])
 
-        except json.JSONDecodeError:
-            pass
+# =============================================================================
+# Segmented (full-book) analysis
+# =============================================================================
 
-        return []
+# Segments analyzed at once by default (match llama-server --parallel)
+DEFAULT_SEGMENT_WORKERS = 4
+
+
+def merge_segment_results(
+    results: list[dict],
+) -> tuple[list[str], list[tuple[str, str]], int]:
+    """Merge per-segment names and dialogs into one book-level result.
+
+    Name variants found in different segments ("Zara", "Captain Zara") are
+    folded into one character and dialog speakers are resolved to it. A
+    dialog repeated with the same speaker inside a segment (a model loop) or
+    right across a segment boundary is kept once.
+
+    Args:
+        results: Per-segment {"names": [...], "dialogs": [(speaker, text), ...]}, in book order
+
+    Returns:
+        (characters, (speaker, text) dialogs, duplicates dropped)
+    """
+    aliases = canonicalize_characters(name for r in results for name in r["names"])
+    characters = list(dict.fromkeys(aliases.get(name, name) for r in results for name in r["names"]))
+
+    dialogs: list[tuple[str, str]] = []
+    duplicates = 0
+    previous: set[tuple[str, str]] = set()
+    for r in results:
+        current: set[tuple[str, str]] = set()
+        for speaker, text in r["dialogs"]:
+            speaker = resolve_alias(speaker, aliases)
+            key = (speaker, normalize_dialog(text))
+            if key in current or key in previous:
+                duplicates += 1
+                continue
+            current.add(key)
+            dialogs.append((speaker, text))
+        previous = current
+    return characters, dialogs, duplicates
 
 
 # =============================================================================
@@ -891,71 +779,31 @@ class Evaluator:
     ) -> EvaluationMetrics:
         """Evaluate dialog extraction results with fuzzy matching.
 
+        A dialog matches if the normalized texts are equal, one contains the
+        other, or they share their first 5 words. Candidates come from
+        benchmark.dialog_match's indexes rather than an all-pairs scan, and
+        each expected dialog is matched at most once, best pairs first.
+
         Args:
             extracted: List of (speaker, text) tuples
             expected: List of (speaker, text) tuples
 
         Returns:
-            Evaluation metrics
+            Evaluation metrics; speaker_accuracy is the share of matched
+            dialogs also attributed to the right speaker
         """
-        # Normalize dialog texts for comparison
-        def normalize_dialog(text: str) -> str:
-            # Remove punctuation and extra whitespace, lowercase
-            import re
-            text = text.lower().strip()
-            text = re.sub(r'[^\w\s]', '', text)  # Remove punctuation
-            text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-            return text
-
-        def dialogs_match(ext_text: str, exp_text: str) -> bool:
-            """Check if two dialogs match (exact or fuzzy)."""
-            ext_norm = normalize_dialog(ext_text)
-            exp_norm = normalize_dialog(exp_text)
-
-            # Exact match
-            if ext_norm == exp_norm:
-                return True
-
-            # Substring match (either contains the other)
-            if ext_norm in exp_norm or exp_norm in ext_norm:
-                return True
-
-            # First N words match (handles truncation)
-            ext_words = ext_norm.split()[:5]  # First 5 words
-            exp_words = exp_norm.split()[:5]
-            if ext_words == exp_words and len(ext_words) >= 3:
-                return True
-
-            return False
-
-        # Find matches using fuzzy matching
-        matched_expected = set()
-        matched_extracted = set()
-
-        for i, (ext_speaker, ext_text) in enumerate(extracted):
-            for j, (exp_speaker, exp_text) in enumerate(expected):
-                if j in matched_expected:
-                    continue
-                # Check if dialog text matches (ignore speaker for now since that's error-prone)
-                if dialogs_match(ext_text, exp_text):
-                    matched_expected.add(j)
-                    matched_extracted.add(i)
-                    logger.debug(f"Matched dialog: '{ext_text[:50]}...' <-> '{exp_text[:50]}...'")
-                    break
-
-        matches = len(matched_expected)
-
-        precision = matches / len(extracted) if extracted else 0.0
-        recall = matches / len(expected) if expected else 0.0
-        f1 = 2 * precision * recall / (precision + recall) if (precision + recall) > 0 else 0.0
+        match = DialogMatcher(expected).match(extracted)
+        for i, j in match.pairs:
+            logger.debug(f"Matched dialog: '{extracted[i][1][:50]}...' <-> '{expected[j][1][:50]}...'")
 
         return EvaluationMetrics(
-            precision=precision,
-            recall=recall,
-            f1=f1,
-            true_positives=matches,
-            false_positives=len(extracted) - matches,
-            false_negatives=len(expected) - matches
+            precision=match.precision,
+            recall=match.recall,
+            f1=match.f1,
+            true_positives=match.matches,
+            false_positives=len(extracted) - match.matches,
+            false_negatives=len(expected) - match.matches,
+            speaker_accuracy=match.speaker_accuracy,
         )
 
     @staticmethod
@@ -982,6 +830,10 @@ class Evaluator:
 # Main Prompt Tester
 # =============================================================================
 
+def _mean_f1(result: BenchmarkResult) -> float:
+    return (result.character_metrics.f1 + result.dialog_metrics.f1) / 2
+
+
 class PromptTester:
     """Main class for testing and evaluating extraction prompts."""
 
@@ -992,7 +844,9 @@ class PromptTester:
         model_path: str = None,
         server_url: str = None,
         n_ctx: int = 4096,
-        n_gpu_layers: int = -1
+        n_gpu_layers: int = -1,
+        prompts: type = PromptDefinitions,
+        history_db: str = DEFAULT_HISTORY_DB,
     ):
         """Initialize the prompt tester.
 
@@ -1003,11 +857,16 @@ class PromptTester:
             server_url: URL of llama-server (e.g., http://127.0.0.1:8080)
             n_ctx: Context window size
             n_gpu_layers: GPU layers (-1 = all)
+            prompts: Prompt set (PromptDefinitions or CompactPromptDefinitions)
+            history_db: SQLite results history (see benchmark.history)
         """
         self.model_path = model_path
         self.server_url = server_url
         self.pdf_path = pdf_path
         self.expected_json_path = expected_json_path
+        self.prompts = prompts
+        # Runs of the same PDF share a gate baseline however the path was given
+        self.pdf_key = str(Path(pdf_path).resolve())
 
         self.llm = LLMEngine(
             model_path=model_path,
@@ -1017,61 +876,99 @@ class PromptTester:
         )
         self.expected = ExpectedData.from_json(expected_json_path)
         self.results_history: list[BenchmarkResult] = []
+        self._text: Optional[str] = None  # extracted once, shared by every run
+        self._text_lock = threading.Lock()
 
-        # Load results history if exists
-        self.history_file = Path("benchmark_history.json")
+        # Results history (the JSON file of older versions is imported once)
+        self.history = HistoryStore(history_db)
         self._load_history()
 
     def _load_history(self):
-        """Load previous results history."""
-        if self.history_file.exists():
-            try:
-                with open(self.history_file, 'r') as f:
-                    data = json.load(f)
-                    # Just keep track of count for now
-                    logger.info(f"Loaded {len(data)} previous results")
-            except Exception as e:
-                logger.warning(f"Could not load history: {e}")
+        """Import a legacy benchmark_history.json and report the history size."""
+        try:
+            migrated = migrate_json_history(self.history, "benchmark_history.json")
+            if migrated:
+                logger.info(f"Imported {migrated} results from benchmark_history.json")
+        except Exception as e:
+            logger.warning(f"Could not import benchmark_history.json: {e}")
+        logger.info(f"Loaded {self.history.count()} previous results")
 
     def _save_result(self, result: BenchmarkResult):
         """Save result to history."""
-        history = []
-        if self.history_file.exists():
-            try:
-                with open(self.history_file, 'r') as f:
-                    history = json.load(f)
-            except Exception:
-                pass
+        self.history.append(result.to_dict())
 
-        history.append(result.to_dict())
+    def run_config(
+        self,
+        prompts: Optional[type] = None,
+        temperature: Optional[float] = None,
+        segmented: bool = False,
+        segment_chars: Optional[int] = None,
+        segment_workers: int = DEFAULT_SEGMENT_WORKERS,
+    ) -> dict:
+        """Settings a run's performance depends on besides model, PDF and mode."""
+        prompts = prompts or self.prompts
+        config = {
+            "prompt_version": prompts.VERSION,
+            "temperature": temperature,
+            "backend": self.llm.backend,
+            "n_ctx": self.llm.n_ctx,
+            "n_gpu_layers": self.llm.n_gpu_layers,
+        }
+        if segmented:
+            config["segment_chars"] = segment_chars or prompts.ANALYSIS_MAX_INPUT_CHARS
+            config["segment_workers"] = segment_workers
+        return config
+
+    def baseline_runs(self, mode: str, config: dict, runs: int = DEFAULT_GATE_RUNS) -> list[dict]:
+        """History records of the last runs with this model, PDF, mode and settings (the gate baseline)."""
+        return self.history.query(
+            model=self.llm.model_name, pdf=self.pdf_key, mode=mode,
+            config_hash=config_fingerprint(config), limit=runs, full=True,
+        )
 
-        with open(self.history_file, 'w') as f:
-            json.dump(history, f, indent=2)
+    def _book_text(self) -> str:
+        """PDF text, extracted on first use and reused by later (or concurrent) runs."""
+        with self._text_lock:
+            if self._text is None:
+                self._text = PDFExtractor.extract_text(self.pdf_path)
+            return self._text
 
-    def run_batched_analysis(self, text: str) -> dict[str, dict]:
+    def run_batched_analysis(
+        self,
+        text: str,
+        prompts: Optional[type] = None,
+        temperature: Optional[float] = None,
+        usage: Optional[dict] = None,
+    ) -> tuple[dict[str, CharacterEntry], str]:
         """Run batched analysis (combined character+dialog extraction).
 
         Args:
             text: Text to analyze
+            prompts: Prompt set (default: self.prompts)
+            temperature: Override the prompt set's temperature
+            usage: Token/latency accumulator passed to LLMEngine.generate
 
         Returns:
-            Dictionary mapping character names to their data
+            (character name -> CharacterEntry, raw response)
         """
+        prompts = prompts or self.prompts
+
         # Truncate text to fit within token budget
-        max_chars = PromptDefinitions.ANALYSIS_MAX_INPUT_CHARS
+        max_chars = prompts.ANALYSIS_MAX_INPUT_CHARS
         if len(text) > max_chars:
             logger.info(f"Truncating text from {len(text)} to {max_chars} chars")
             text = text[:max_chars]
 
-        user_prompt = PromptDefinitions.build_batched_analysis_prompt(text)
+        user_prompt = prompts.build_batched_analysis_prompt(text)
 
         logger.info("Running batched analysis...")
         start_time = time.time()
         response = self.llm.generate(
-            PromptDefinitions.BATCHED_SYSTEM_PROMPT,
+            prompts.BATCHED_SYSTEM_PROMPT,
             user_prompt,
-            temperature=PromptDefinitions.BATCHED_ANALYSIS_TEMPERATURE,
-            max_tokens=PromptDefinitions.ANALYSIS_OUTPUT_TOKENS
+            temperature=prompts.BATCHED_ANALYSIS_TEMPERATURE if temperature is None else temperature,
+            max_tokens=prompts.ANALYSIS_OUTPUT_TOKENS,
+            usage=usage,
         )
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Batched analysis completed in {elapsed:.0f}ms")
@@ -1079,29 +976,44 @@ class PromptTester:
 
         return JSONParser.parse_batched_response(response), response
 
-    def run_two_pass_analysis(self, text: str) -> tuple[list[str], list[dict], list[str]]:
+    def run_two_pass_analysis(
+        self,
+        text: str,
+        prompts: Optional[type] = None,
+        temperature: Optional[float] = None,
+        usage: Optional[dict] = None,
+        timing: Optional[dict] = None,
+    ) -> tuple[list[str], list[dict], list[str]]:
         """Run two-pass analysis (character extraction + dialog extraction).
 
         Args:
             text: Text to analyze
+            prompts: Prompt set (default: self.prompts)
+            temperature: Override the prompt set's temperatures for both passes
+            usage: Token/latency accumulator passed to LLMEngine.generate
+            timing: If given, receives each pass's time in ms (pass1_characters, pass2_dialogs)
 
         Returns:
             Tuple of (characters, dialogs, raw_responses)
         """
+        prompts = prompts or self.prompts
         raw_responses = []
 
         # Pass 1: Character extraction
         logger.info("=== PASS 1: Character Extraction ===")
-        user_prompt = PromptDefinitions.build_character_extraction_prompt(text)
+        user_prompt = prompts.build_character_extraction_prompt(text)
 
         start_time = time.time()
         response = self.llm.generate(
-            PromptDefinitions.CHARACTER_SYSTEM_PROMPT,
+            prompts.CHARACTER_SYSTEM_PROMPT,
             user_prompt,
-            temperature=PromptDefinitions.CHARACTER_EXTRACTION_TEMPERATURE
+            temperature=prompts.CHARACTER_EXTRACTION_TEMPERATURE if temperature is None else temperature,
+            usage=usage,
         )
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Pass 1 completed in {elapsed:.0f}ms")
+        if timing is not None:
+            timing["pass1_characters"] = elapsed
         logger.debug(f"Raw response:\n{response}")
         raw_responses.append(response)
 
@@ -1110,16 +1022,19 @@ class PromptTester:
 
         # Pass 2: Dialog extraction
         logger.info("=== PASS 2: Dialog Extraction ===")
-        user_prompt = PromptDefinitions.build_dialog_extraction_prompt(text, characters)
+        user_prompt = prompts.build_dialog_extraction_prompt(text, characters)
 
         start_time = time.time()
         response = self.llm.generate(
-            PromptDefinitions.DIALOG_SYSTEM_PROMPT,
+            prompts.DIALOG_SYSTEM_PROMPT,
             user_prompt,
-            temperature=PromptDefinitions.DIALOG_EXTRACTION_TEMPERATURE
+            temperature=prompts.DIALOG_EXTRACTION_TEMPERATURE if temperature is None else temperature,
+            usage=usage,
         )
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Pass 2 completed in {elapsed:.0f}ms")
+        if timing is not None:
+            timing["pass2_dialogs"] = elapsed
         logger.debug(f"Raw response:\n{response}")
         raw_responses.append(response)
 
@@ -1129,17 +1044,121 @@ class PromptTester:
         return characters, dialogs, raw_responses
 
 
-    def run_benchmark(self, mode: str = "batched") -> BenchmarkResult:
+    def run_segmented_analysis(
+        self,
+        text: str,
+        mode: str = "batched",
+        prompts: Optional[type] = None,
+        temperature: Optional[float] = None,
+        usage: Optional[dict] = None,
+        timing: Optional[dict] = None,
+        segment_chars: Optional[int] = None,
+        max_workers: int = DEFAULT_SEGMENT_WORKERS,
+    ) -> tuple[list[str], list[tuple[str, str]], list[str], list[dict]]:
+        """Analyze the whole text in sentence-aligned segments, several at a time.
+
+        The batched and two-pass analyses only see what fits one prompt. Here
+        the text is split at sentence boundaries into segments within the
+        prompt set's input budget, each segment runs the chosen analysis, and
+        the results are merged (merge_segment_results).
+
+        Args:
+            text: Text to analyze
+            mode: Analysis per segment, "batched" or "two_pass"
+            prompts: Prompt set (default: self.prompts)
+            temperature: Override the prompt set's temperatures
+            usage: Token/latency accumulator, summed over segments
+            timing: If given, receives each pass's time in ms summed over segments
+            segment_chars: Segment size (default: prompts.ANALYSIS_MAX_INPUT_CHARS)
+            max_workers: Segments analyzed concurrently
+
+        Returns:
+            Tuple of (characters, (speaker, text) dialogs, raw_responses, per-segment stats)
+        """
+        prompts = prompts or self.prompts
+        segments = split_into_segments(text, segment_chars or prompts.ANALYSIS_MAX_INPUT_CHARS)
+        logger.info(f"Analyzing {len(text)} chars in {len(segments)} segments ({max_workers} at a time)")
+
+        def analyze(segment: str) -> dict:
+            # Per-segment accumulators: concurrent segments must not share one dict
+            seg_usage: dict = {}
+            seg_timing: dict = {}
+            start_time = time.time()
+            if mode == "batched":
+                char_data, response = self.run_batched_analysis(segment, prompts, temperature, seg_usage)
+                names = list(char_data)
+                dialogs = [(name, dialog) for name, entry in char_data.items() for dialog in entry.dialogs]
+                responses = [response]
+                seg_timing["batched"] = (time.time() - start_time) * 1000
+            else:
+                names, dialog_list, responses = self.run_two_pass_analysis(
+                    segment, prompts, temperature, seg_usage, seg_timing
+                )
+                dialogs = [(d.get("speaker", "Unknown"), d.get("text", "")) for d in dialog_list]
+            return {
+                "names": names, "dialogs": dialogs, "responses": responses,
+                "seconds": time.time() - start_time, "usage": seg_usage, "timing": seg_timing,
+            }
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(analyze, segments))
+
+        stats = []
+        for index, (segment, r) in enumerate(zip(segments, results)):
+            for key, value in r["usage"].items():
+                if usage is not None:
+                    usage[key] = usage.get(key, 0) + value
+            for key, value in r["timing"].items():
+                if timing is not None:
+                    timing[key] = timing.get(key, 0.0) + value
+            stats.append({
+                "segment": index,
+                "chars": len(segment),
+                "seconds": round(r["seconds"], 3),
+                "calls": r["usage"].get("calls", 0),
+                "prompt_tokens": r["usage"].get("prompt_tokens", 0),
+                "completion_tokens": r["usage"].get("completion_tokens", 0),
+                "characters": len(r["names"]),
+                "dialogs": len(r["dialogs"]),
+            })
+
+        characters, dialogs, duplicates = merge_segment_results(results)
+        logger.info(
+            f"Merged {len(segments)} segments: {len(characters)} characters, "
+            f"{len(dialogs)} dialogs ({duplicates} duplicates dropped)"
+        )
+        raw_responses = [response for r in results for response in r["responses"]]
+        return characters, dialogs, raw_responses, stats
+
+    def run_benchmark(
+        self,
+        mode: str = "batched",
+        prompts: Optional[type] = None,
+        temperature: Optional[float] = None,
+        report: bool = True,
+        segmented: bool = False,
+        segment_chars: Optional[int] = None,
+        segment_workers: int = DEFAULT_SEGMENT_WORKERS,
+    ) -> BenchmarkResult:
         """Run a complete benchmark.
 
         Args:
             mode: "batched" for combined analysis, "two_pass" for separate passes
+            prompts: Prompt set (default: self.prompts)
+            temperature: Override the prompt set's temperatures
+            report: Save the result to the history database and print the summary
+            segmented: Analyze the whole book in segments (run_segmented_analysis);
+                recorded as mode "<mode>-segmented"
+            segment_chars: Segment size for segmented runs
+            segment_workers: Segments analyzed concurrently
 
         Returns:
             Benchmark result with metrics
         """
+        prompts = prompts or self.prompts
+        usage: dict = {}
         logger.info("=" * 60)
-        logger.info(f"Starting benchmark (mode={mode})")
+        logger.info(f"Starting benchmark (mode={mode}, prompts={prompts.VERSION})")
         logger.info(f"Model: {self.model_path}")
         logger.info(f"PDF: {self.pdf_path}")
         logger.info("=" * 60)
@@ -1151,14 +1170,22 @@ class PromptTester:
         # Extract PDF text
         logger.info("Extracting PDF text...")
         start_time = time.time()
-        text = PDFExtractor.extract_text(self.pdf_path)
+        text = self._book_text()
         timing["pdf_extraction"] = (time.time() - start_time) * 1000
         logger.info(f"Extracted {len(text)} characters in {timing['pdf_extraction']:.0f}ms")
 
         # Run analysis
-        if mode == "batched":
+        segments: list[dict] = []
+        if segmented:
+            start_time = time.time()
+            extracted_characters, extracted_dialogs, responses, segments = self.run_segmented_analysis(
+                text, mode, prompts, temperature, usage, timing, segment_chars, segment_workers
+            )
+            timing["analysis"] = (time.time() - start_time) * 1000
+            raw_responses.extend(responses)
+        elif mode == "batched":
             start_time = time.time()
-            char_data, response = self.run_batched_analysis(text)
+            char_data, response = self.run_batched_analysis(text, prompts, temperature, usage)
             timing["analysis"] = (time.time() - start_time) * 1000
             raw_responses.append(response)
 
@@ -1166,11 +1193,13 @@ class PromptTester:
             extracted_characters = list(char_data.keys())
             extracted_dialogs = []
             for name, data in char_data.items():
-                for dialog in data.get("dialogs", []):
+                for dialog in data.dialogs:
                     extracted_dialogs.append((name, dialog))
         else:
             start_time = time.time()
-            extracted_characters, dialog_list, responses = self.run_two_pass_analysis(text)
+            extracted_characters, dialog_list, responses = self.run_two_pass_analysis(
+                text, prompts, temperature, usage, timing
+            )
             timing["analysis"] = (time.time() - start_time) * 1000
             raw_responses.extend(responses)
 
@@ -1180,6 +1209,22 @@ class PromptTester:
             ]
 
         timing["total"] = (time.time() - overall_start) * 1000
+        # Model time as if every call had run (cached responses count their original latency)
+        timing["llm"] = usage.pop("seconds", 0.0) * 1000
+        if segmented:
+            # Per-pass times are summed over concurrent segments; the gated latency is the wall time
+            pass_ms = {"analysis": timing["analysis"]}
+        elif mode == "batched":
+            pass_ms = {"batched": timing["analysis"]}
+        else:
+            pass_ms = {key: timing[key] for key in ("pass1_characters", "pass2_dialogs")}
+        perf = run_perf(
+            total_s=timing["total"] / 1000,
+            passes={key: ms / 1000 for key, ms in pass_ms.items()},
+            calls=usage.get("calls", 0),
+            output_tokens=usage.get("completion_tokens", 0),
+            llm_seconds=timing["llm"] / 1000,
+        )
 
         # Evaluate results
         logger.info("=" * 60)
@@ -1205,7 +1250,7 @@ class PromptTester:
         result = BenchmarkResult(
             timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             model_name=self.llm.model_name,
-            prompt_version=PromptDefinitions.VERSION,
+            prompt_version=prompts.VERSION,
             character_metrics=char_metrics,
             dialog_metrics=dialog_metrics,
             extracted_characters=extracted_characters,
@@ -1213,18 +1258,78 @@ class PromptTester:
             extracted_dialogs=extracted_dialogs,
             expected_dialogs=expected_dialogs,
             timing_ms=timing,
-            raw_llm_responses=raw_responses
+            raw_llm_responses=raw_responses,
+            mode=f"{mode}-segmented" if segmented else mode,
+            temperature=temperature,
+            tokens=usage,
+            pdf=self.pdf_key,
+            perf=perf,
+            segments=segments,
+            config=self.run_config(prompts, temperature, segmented, segment_chars, segment_workers),
         )
 
-        # Save result
-        self._save_result(result)
-        self.results_history.append(result)
-
-        # Print summary
-        self._print_summary(result)
+        if report:
+            self._save_result(result)
+            self.results_history.append(result)
+            self._print_summary(result)
 
         return result
 
+    def run_matrix(
+        self,
+        variants: list[type],
+        modes: list[str],
+        temperatures: list[Optional[float]],
+        max_workers: Optional[int] = None,
+    ) -> list[BenchmarkResult]:
+        """Run every prompt variant x mode x temperature combination concurrently.
+
+        The PDF is extracted once and identical requests (e.g. a pass whose
+        prompt two variants share) reach the backend once. Every result is
+        saved to the history database.
+
+        Args:
+            variants: Prompt sets (PromptDefinitions subclasses)
+            modes: "batched" and/or "two_pass"
+            temperatures: Temperature overrides (None: each prompt set's own)
+            max_workers: Concurrent runs (default: all at once)
+
+        Returns:
+            Results ranked by mean character/dialog F1, then model latency
+        """
+        cells = [(p, m, t) for p in variants for m in modes for t in temperatures]
+        self.llm.enable_response_cache()
+        self._book_text()  # extract before the runs start so none of them times it
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(cells)) as pool:
+            futures = [
+                pool.submit(self.run_benchmark, mode, prompts, temperature, False)
+                for prompts, mode, temperature in cells
+            ]
+            results = [f.result() for f in futures]
+
+        self.history.extend([result.to_dict() for result in results])
+        self.results_history.extend(results)
+        return sorted(results, key=lambda r: (-_mean_f1(r), r.timing_ms.get("llm", 0.0)))
+
+    @staticmethod
+    def format_matrix(results: list[BenchmarkResult]) -> str:
+        """Ranked matrix results as a text table."""
+        lines = [
+            f"{'#':>2} {'prompts':<16} {'mode':<9} {'temp':>5} {'char F1':>8} {'dialog F1':>10}"
+            f" {'speaker':>8} {'llm s':>7} {'prompt tok':>11} {'output tok':>11} {'cached':>7}",
+        ]
+        for rank, r in enumerate(results, 1):
+            temp = "auto" if r.temperature is None else f"{r.temperature:g}"
+            lines.append(
+                f"{rank:>2} {r.prompt_version:<16} {r.mode:<9} {temp:>5}"
+                f" {r.character_metrics.f1:>8.1%} {r.dialog_metrics.f1:>10.1%}"
+                f" {r.dialog_metrics.speaker_accuracy or 0.0:>8.1%} {r.timing_ms.get('llm', 0.0) / 1000:>7.1f}"
+                f" {r.tokens.get('prompt_tokens', 0):>11} {r.tokens.get('completion_tokens', 0):>11}"
+                f" {r.tokens.get('cached_calls', 0):>7}"
+            )
+        return "\n".join(lines)
+
     def _print_summary(self, result: BenchmarkResult):
         """Print a summary of the benchmark result."""
         print("\n" + "=" * 60)
@@ -1244,11 +1349,19 @@ class PromptTester:
         print(f"  Precision: {result.dialog_metrics.precision:.1%}")
         print(f"  Recall:    {result.dialog_metrics.recall:.1%}")
         print(f"  F1 Score:  {result.dialog_metrics.f1:.1%}")
+        print(f"  Speaker:   {result.dialog_metrics.speaker_accuracy:.1%} of matched dialogs")
         print(f"  Extracted: {len(result.extracted_dialogs)} | Expected: {len(result.expected_dialogs)}")
         print("-" * 60)
         print("TIMING:")
         for key, value in result.timing_ms.items():
             print(f"  {key}: {value:.0f}ms")
+        if result.segments:
+            latencies = sorted(s["seconds"] for s in result.segments)
+            slowest = max(result.segments, key=lambda s: s["seconds"])
+            print(f"  segments: {len(latencies)}, median {latencies[len(latencies) // 2]:.1f}s, "
+                  f"slowest {slowest['seconds']:.1f}s (segment {slowest['segment']}, {slowest['chars']} chars)")
+            for s in result.segments:
+                logger.debug(f"Segment {s['segment']}: {s}")
         print("=" * 60)
 
         # Check if target accuracy achieved
@@ -1265,6 +1378,7 @@ class PromptTester:
     def close(self):
         """Release resources."""
         self.llm.close()
+        self.history.close()
 
 
 
@@ -1288,8 +1402,25 @@ Examples:
   # Run two-pass analysis
   python prompt_tester.py --server http://127.0.0.1:8080 --mode two_pass
 
+  # Whole book in segments, 4 at a time (start llama-server with --parallel 4)
+  python prompt_tester.py --server http://127.0.0.1:8080 --segmented --concurrency 4
+
   # Run with debug logging
   python prompt_tester.py --server http://127.0.0.1:8080 --debug
+
+  # Template tokens of the full vs compact prompts, then compare their F1
+  python prompt_tester.py --server http://127.0.0.1:8080 --prompt-overhead
+  python prompt_tester.py --server http://127.0.0.1:8080 --ab-compact
+
+  # Every prompt set x mode x temperature at once, ranked by F1 then latency
+  python prompt_tester.py --server http://127.0.0.1:8080 --matrix --temperatures default,0,0.3
+
+  # Fail if this run is significantly slower than the median of the last 5
+  python prompt_tester.py --server http://127.0.0.1:8080 --gate
+
+  # Past runs (stored in benchmark_history.db)
+  python -m benchmark.history list --mode two_pass
+  python -m benchmark.history best --metric dialog_f1
 """
     )
 
@@ -1343,6 +1474,86 @@ Examples:
         default=-1,
         help="Number of GPU layers (-1 = all, 0 = CPU only)"
     )
+    parser.add_argument(
+        "--compact-prompts",
+        action="store_true",
+        help="Use the token-lean prompt variants (CompactPromptDefinitions)"
+    )
+    parser.add_argument(
+        "--prompt-overhead",
+        action="store_true",
+        help="Print template tokens of the full and compact prompts and exit"
+    )
+    parser.add_argument(
+        "--ab-compact",
+        action="store_true",
+        help="Run the full and the compact prompts; exit 1 if compact F1 is lower"
+    )
+    parser.add_argument(
+        "--segmented",
+        action="store_true",
+        help="Analyze the whole book in sentence-aligned segments (--concurrency at a time) "
+             "instead of one truncated prompt"
+    )
+    parser.add_argument(
+        "--segment-chars",
+        type=int,
+        default=None,
+        help="Segment size for --segmented (default: the prompt set's input budget, 14,800 chars)"
+    )
+    parser.add_argument(
+        "--matrix",
+        action="store_true",
+        help="Run every --variants x --modes x --temperatures combination and rank them"
+    )
+    parser.add_argument(
+        "--variants",
+        type=str,
+        default=",".join(PROMPT_VARIANTS),
+        help=f"Comma-separated prompt versions for --matrix (default: {','.join(PROMPT_VARIANTS)})"
+    )
+    parser.add_argument(
+        "--modes",
+        type=str,
+        default="batched,two_pass",
+        help="Comma-separated analysis modes for --matrix (default: batched,two_pass)"
+    )
+    parser.add_argument(
+        "--temperatures",
+        type=str,
+        default="default",
+        help="Comma-separated temperatures for --matrix; 'default' keeps each prompt's own"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help=f"Concurrent --matrix runs (default: all) or --segmented segments "
+             f"(default: {DEFAULT_SEGMENT_WORKERS}); match llama-server --parallel"
+    )
+    parser.add_argument(
+        "--history-db",
+        type=str,
+        default=DEFAULT_HISTORY_DB,
+        help=f"Results history database (default: {DEFAULT_HISTORY_DB})"
+    )
+    parser.add_argument(
+        "--gate",
+        action="store_true",
+        help="Also fail on latency/throughput/calls/memory regressions against recent history"
+    )
+    parser.add_argument(
+        "--gate-runs",
+        type=int,
+        default=DEFAULT_GATE_RUNS,
+        help=f"Earlier runs (same model, PDF, mode and settings) whose median is the baseline (default: {DEFAULT_GATE_RUNS})"
+    )
+    parser.add_argument(
+        "--gate-tolerance",
+        type=float,
+        default=DEFAULT_GATE_TOLERANCE,
+        help=f"Allowed slowdown vs the baseline median, relative (default: {DEFAULT_GATE_TOLERANCE})"
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -1355,6 +1566,29 @@ Examples:
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
 
+    if args.prompt_overhead:
+        # Exact counts with the backend tokenizer when one is given, estimates otherwise
+        if args.server:
+            tokenizer = LlamaServerModel(base_url=args.server)
+        elif args.model:
+            tokenizer = GGUFModel(model_path=args.model)
+        else:
+            tokenizer = None
+        count_tokens = tokenizer.count_tokens if tokenizer else estimate_tokens
+        variants = {"full": prompt_templates(PromptDefinitions), "compact": prompt_templates(CompactPromptDefinitions)}
+        print(format_overhead(compare_templates(count_tokens, variants)))
+        sys.exit(0)
+
+    if args.matrix:
+        try:
+            variants = [PROMPT_VARIANTS[v] for v in args.variants.split(",")]
+            temperatures = [None if t == "default" else float(t) for t in args.temperatures.split(",")]
+        except (KeyError, ValueError) as e:
+            parser.error(f"bad --variants/--temperatures value: {e}")
+        modes = args.modes.split(",")
+        if not set(modes) <= {"batched", "two_pass"}:
+            parser.error(f"bad --modes value: {args.modes}")
+
     # Validate backend
     if not args.model and not args.server:
         # Default to server if neither specified
@@ -1379,14 +1613,53 @@ Examples:
             model_path=args.model,
             server_url=args.server,
             n_ctx=args.n_ctx,
-            n_gpu_layers=args.n_gpu_layers
+            n_gpu_layers=args.n_gpu_layers,
+            prompts=CompactPromptDefinitions if args.compact_prompts else PromptDefinitions,
+            history_db=args.history_db,
         )
 
-        result = tester.run_benchmark(mode=args.mode)
+        if args.matrix:
+            results = tester.run_matrix(variants, modes, temperatures, args.concurrency)
+            print(PromptTester.format_matrix(results))
+            sys.exit(0)
+
+        if args.ab_compact:
+            results = {}
+            for prompts in (PromptDefinitions, CompactPromptDefinitions):
+                results[prompts.VERSION] = tester.run_benchmark(mode=args.mode, prompts=prompts)
+            full, compact = results.values()
+            print(f"\n{'prompts':<16} {'char F1':>8} {'dialog F1':>10}")
+            for version, r in results.items():
+                print(f"{version:<16} {r.character_metrics.f1:>8.1%} {r.dialog_metrics.f1:>10.1%}")
+            kept = (compact.character_metrics.f1 >= full.character_metrics.f1
+                    and compact.dialog_metrics.f1 >= full.dialog_metrics.f1)
+            print("PASS: compact prompts keep F1" if kept else "FAIL: compact prompts lower F1")
+            sys.exit(0 if kept else 1)
+
+        # Baseline taken before the run, which is then saved to the same history
+        recorded_mode = f"{args.mode}-segmented" if args.segmented else args.mode
+        config = tester.run_config(
+            segmented=args.segmented,
+            segment_chars=args.segment_chars,
+            segment_workers=args.concurrency or DEFAULT_SEGMENT_WORKERS,
+        )
+        baseline = tester.baseline_runs(recorded_mode, config, args.gate_runs) if args.gate else None
+        result = tester.run_benchmark(
+            mode=args.mode,
+            segmented=args.segmented,
+            segment_chars=args.segment_chars,
+            segment_workers=args.concurrency or DEFAULT_SEGMENT_WORKERS,
+        )
+
+        gate_passed = True
+        if baseline is not None:
+            gate = check_regressions(result.perf, baseline, tolerance=args.gate_tolerance)
+            print(format_gate(gate))
+            gate_passed = gate.passed
 
         # Return exit code based on results
         target = 0.9
-        if result.character_metrics.f1 >= target and result.dialog_metrics.f1 >= target:
+        if gate_passed and result.character_metrics.f1 >= target and result.dialog_metrics.f1 >= target:
             sys.exit(0)  # Success
         else:
             sys.exit(1)  # Needs improvement